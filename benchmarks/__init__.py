@@ -0,0 +1,5 @@
+"""
+Benchmarks for the local stack and tooling. Run a module directly, e.g.
+
+    python -m benchmarks.relay
+"""
@@ -0,0 +1,124 @@
+"""
+Hedging benchmark: tail latency of every stage with plain vs hedged requests.
+
+Starts the local stack with injected backend tail latency (a small fraction of requests
+stall, like the external httpbin backend does), then drives each stage's `GET /hello` with
+the closed-loop load generator, first with plain requests and then with hedged,
+retry-aware ones. For every stage it reports p99/p99.9 and the extra upstream load the hedges
+and retries cost.
+
+With stage throttling on, plain requests get their 429s back immediately and keep
+hammering the stage, while hedged ones back off. Compare the 429 counts there, not the
+latencies.
+
+    python -m benchmarks.hedging --tail-ms 200 --tail-fraction 0.01 --duration 10
+    python -m benchmarks.hedging --rate-limit 200 --burst-limit 50   # 429s back off, not hedge
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from local_gateway.loadgen import run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def start_stack(args, manifest_path):
+    command = [sys.executable, "-m", "local_gateway", "--host", args.host, "--alb-port", str(args.alb_port),
+               "--stage-base-port", str(args.alb_port + 1), "--backend-port", str(args.alb_port + 10),
+               "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+               "--tail-ms", str(args.tail_ms), "--tail-fraction", str(args.tail_fraction),
+               "--metrics-port", "0", "--manifest-out", manifest_path]
+    if args.rate_limit:
+        command += ["--rate-limit", str(args.rate_limit), "--burst-limit", str(args.burst_limit)]
+    else:
+        command.append("--no-throttle")
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        _wait_for_port(args.host, args.alb_port)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        for stage in manifest["stages"].values():
+            port = int(stage["api_endpoint"].rsplit(":", 1)[1])
+            _wait_for_port(args.host, port)
+    except BaseException:
+        process.terminate()
+        raise
+    return process, manifest
+
+
+def run_stage(name, url, args):
+    hedging = {"quantile": args.hedge_quantile, "retry_budget": args.retry_budget}
+    plain = run_load(url, connections=args.connections, duration=args.duration)
+    hedged = run_load(url, connections=args.connections, duration=args.duration, hedging=hedging)
+    before, after = plain["latency_ms"]["p99.9"], hedged["latency_ms"]["p99.9"]
+    return {
+        "stage": name,
+        "plain": plain,
+        "hedged": hedged,
+        "p99.9_change": after / before - 1 if before else 0.0,
+        "extra_load": hedged["hedging"]["extra_load"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.hedging", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--alb-port", type=int, default=18080,
+                        help="Stack ports start here: stages on the next ports, backend at +10")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--tail-ms", type=float, default=200.0)
+    parser.add_argument("--tail-fraction", type=float, default=0.01)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Stage throttling_rate_limit (0: no throttling)")
+    parser.add_argument("--burst-limit", type=int, default=100)
+    parser.add_argument("-c", "--connections", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds per run (default: 10)")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95)
+    parser.add_argument("--retry-budget", type=float, default=0.1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        process, manifest = start_stack(args, os.path.join(directory, "manifest.json"))
+        try:
+            results = [run_stage(name, stage["hello_url"], args) for name, stage in manifest["stages"].items()]
+        finally:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'stage':<8} {'mode':<7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'429s':>7} "
+          f"{'extra load':>11}")
+    for r in results:
+        for mode in ("plain", "hedged"):
+            run = r[mode]
+            extra = f"{run['hedging']['extra_load']:>10.1%}" if "hedging" in run else f"{'':>10}"
+            print(f"{r['stage']:<8} {mode:<7} {run['rps']:>9.0f} {run['latency_ms']['p50']:>8.1f} "
+                  f"{run['latency_ms']['p99']:>8.1f} {run['latency_ms']['p99.9']:>9.1f} "
+                  f"{run['status'].get('429', 0):>7} {extra:>11}")
+        print(f"{r['stage']:<8} p99.9 {r['p99.9_change']:+.0%} for {r['extra_load']:.1%} extra upstream load")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Body relay benchmark: naive buffered proxy vs pooled-buffer relay vs splice relay.
+
+A backend stand-in serves a payload file, one API Gateway stage stand-in proxies to it and
+a raw-socket client pulls the responses through the stage. For every mode it reports
+throughput (bytes/sec, requests/sec) and, in a separate tracemalloc pass, the peak Python
+memory allocated per request -- a direct measure of how many payload copies are made.
+
+    python -m benchmarks.relay --payload-mb 8 --requests 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+import tracemalloc
+
+from local_gateway.apigw import ApiGateway, StageConfig
+from local_gateway.backend import Backend, make_payload_file
+from local_gateway.http import HttpClient, serve
+from local_gateway.relay import HAS_SPLICE, ProxyClient
+
+MODES = ("naive", "copy", "splice")
+
+
+def _client(mode):
+    if mode == "naive":
+        return HttpClient()
+    return ProxyClient(use_splice=mode == "splice")
+
+
+async def _fetch(loop, sock, request, buffer):
+    """GET through a raw socket, discarding the body into a reused buffer; returns body size."""
+    view = memoryview(buffer)
+    await loop.sock_sendall(sock, request)
+    filled = 0
+    while True:
+        filled += await loop.sock_recv_into(sock, view[filled:])
+        end = buffer.find(b"\r\n\r\n", 0, filled)
+        if end >= 0:
+            break
+    head = bytes(view[:end]).lower()
+    at = head.index(b"content-length:")
+    length = int(head[at + 15:].split(b"\r\n", 1)[0])
+    remaining = length - (filled - end - 4)
+    while remaining > 0:
+        n = await loop.sock_recv_into(sock, view[:min(remaining, len(view))])
+        if not n:
+            raise ConnectionError("server closed mid-body")
+        remaining -= n
+    return length
+
+
+async def run_mode(mode, payload_path, requests, concurrency, trace_requests):
+    loop = asyncio.get_running_loop()
+    backend = Backend(payload_path=payload_path)
+    backend_server = await serve(backend.handle, "127.0.0.1", 0)
+    backend_port = backend_server.sockets[0].getsockname()[1]
+
+    client = _client(mode)
+    stage = StageConfig("uat1", 0, f"http://127.0.0.1:{backend_port}/anything")
+    apigw = ApiGateway([stage], client, throttle=False)
+    (stage_server,) = await apigw.start("127.0.0.1")
+    stage_port = stage_server.sockets[0].getsockname()[1]
+    request = f"GET /hello HTTP/1.1\r\nHost: 127.0.0.1:{stage_port}\r\n\r\n".encode()
+
+    async def worker(count, buffer=None):
+        sock = socket.socket()
+        sock.setblocking(False)
+        await loop.sock_connect(sock, ("127.0.0.1", stage_port))
+        buffer = buffer or bytearray(1024 * 1024)
+        total = 0
+        try:
+            for _ in range(count):
+                total += await _fetch(loop, sock, request, buffer)
+        finally:
+            sock.close()
+        return total
+
+    try:
+        await worker(2)  # warm up connection pools and buffers
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        start = time.perf_counter()
+        received = sum(await asyncio.gather(*(worker(n) for n in shares if n)))
+        elapsed = time.perf_counter() - start
+
+        # The client's own receive buffer is allocated up front so only the proxy path is measured
+        client_buffer = bytearray(1024 * 1024)
+        tracemalloc.start()
+        peaks = []
+        for _ in range(trace_requests):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await worker(1, client_buffer)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+    finally:
+        stage_server.close()
+        backend_server.close()
+        client.close()
+
+    return {
+        "mode": mode,
+        "requests": requests,
+        "bytes": received,
+        "seconds": elapsed,
+        "mb_per_sec": received / elapsed / 1e6,
+        "requests_per_sec": requests / elapsed,
+        "peak_alloc_bytes_per_request": sorted(peaks)[len(peaks) // 2] if peaks else 0,
+    }
+
+
+async def run_all(payload_bytes, requests, concurrency, trace_requests, modes):
+    payload_path = make_payload_file(payload_bytes)
+    try:
+        return [await run_mode(mode, payload_path, requests, concurrency, trace_requests) for mode in modes]
+    finally:
+        os.unlink(payload_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.relay", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payload-mb", type=float, default=8.0)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--trace-requests", type=int, default=5, help="Requests in the tracemalloc pass")
+    parser.add_argument("--mode", action="append", choices=MODES, help="Modes to run (default: all available)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    modes = args.mode or [m for m in MODES if m != "splice" or HAS_SPLICE]
+    results = asyncio.run(run_all(int(args.payload_mb * 1024 * 1024), args.requests, args.concurrency,
+                                  args.trace_requests, modes))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<8} {'MB/s':>10} {'req/s':>10} {'peak alloc/req':>16}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['mb_per_sec']:>10.1f} {r['requests_per_sec']:>10.1f} "
+              f"{r['peak_alloc_bytes_per_request'] / 1024:>13.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+"""
+Benchmark suite with JSON history, baseline comparison and a regression gate.
+
+Benchmarks:
+
+- `rule_eval.*`: ALB listener rule evaluation for the `header_routes` in main.tf (ns/match)
+- `e2e.redirect` / `e2e.forward`: one request through the local ALB -> stage -> httpbin
+  stand-ins, following the redirect or letting the ALB forward (us/request)
+- `throttle.*`: stage token bucket throughput, in-process and shared-memory (ops/s), and
+  429 rejections through a stage listener (req/s)
+- `diagram.*`: wall time of each diagram generator script (s)
+
+Every benchmark is run for several rounds and keeps one value per round. A run is compared
+with a baseline run: a benchmark regresses when its median is worse by more than
+`--max-regression` percent and a Mann-Whitney U test says the rounds differ (p < `--alpha`),
+so a single noisy round cannot fail the gate. Every round is preceded by a short fixed
+calibration loop. Interpreter-bound benchmarks (rule evaluation, token buckets) are compared
+in units of that loop, so a baseline recorded on a faster machine, or CPU steal on a shared
+runner, does not show up as a change in every benchmark; socket-bound benchmarks do not
+scale with it and are compared raw (`--no-normalize` compares everything raw).
+
+    python -m benchmarks.suite --save                       # run, append to the history
+    python -m benchmarks.suite --save --update-baseline     # ... and make it the baseline
+    python -m benchmarks.suite --max-regression 15          # exit 1 on a >15% regression
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import glob
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from local_gateway.alb import Alb
+from local_gateway.apigw import ApiGateway, StageConfig, TokenBucket
+from local_gateway.backend import Backend
+from local_gateway.http import HttpClient, serve
+from local_gateway.manifest import DEFAULT_HEADER_ROUTES, DEFAULT_ROUTE_KEY, local_manifest
+from local_gateway.relay import ProxyClient
+from local_gateway.rules import RuleTable
+from local_gateway.tfconfig import ConfigError, load_routing_config
+from local_gateway.workers import SharedThrottle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_DIR = os.path.join(ROOT, "benchmarks", "history")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def calibration_round(iterations=20_000):
+    """ns per iteration of a fixed interpreter-bound loop, timed right before each round."""
+    table = {}
+    start = time.perf_counter_ns()
+    for i in range(iterations):
+        table[i & 1023] = table.get(i & 1023, 0) + len(str(i & 7))
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def measure(rounds, run_round):
+    """Run `run_round()` `rounds` times; return (values, calibration before each round)."""
+    samples, calibration = [], []
+    for _ in range(rounds):
+        calibration.append(calibration_round())
+        samples.append(run_round())
+    return samples, calibration
+
+
+class Result:
+    """Per-round values of one benchmark; `better` is "lower" or "higher"."""
+
+    def __init__(self, name, unit, better, samples, calibration=(), skipped=None, normalize=True):
+        self.name = name
+        self.unit = unit
+        self.better = better
+        self.samples = samples
+        self.calibration = list(calibration)
+        self.skipped = skipped
+        self.normalize = normalize
+
+    def as_dict(self):
+        if self.skipped:
+            return {"unit": self.unit, "better": self.better, "skipped": self.skipped}
+        return {
+            "unit": self.unit,
+            "better": self.better,
+            "median": statistics.median(self.samples),
+            "mean": statistics.fmean(self.samples),
+            "stdev": statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0,
+            "min": min(self.samples),
+            "max": max(self.samples),
+            "samples": self.samples,
+            "calibration_ns": self.calibration,
+            "normalize": self.normalize,
+        }
+
+
+# --- rule evaluation ---------------------------------------------------------------------
+
+def _routing_config():
+    """The header_routes in main.tf, or the built-in copy of them."""
+    try:
+        return load_routing_config(ROOT)
+    except (ConfigError, OSError):
+        return {"header_routes": DEFAULT_HEADER_ROUTES, "default_route_key": DEFAULT_ROUTE_KEY}
+
+
+def _last_header_route(config):
+    """The lowest-priority route with its own header rule (the default route has none)."""
+    routes = [k for k, v in sorted(config["header_routes"].items(), key=lambda kv: kv[1]["priority"])
+              if k != config["default_route_key"]]
+    return routes[-1] if routes else config["default_route_key"]
+
+
+def bench_rule_eval(rounds, scale):
+    config = _routing_config()
+    ports = {name: 8081 + i for i, name in enumerate(config["header_routes"])}
+    table = RuleTable.from_manifest(local_manifest("127.0.0.1", 8080, ports, **config))
+    route = _last_header_route(config)
+    cases = {
+        # Last header rule, so every higher-priority rule is tried first
+        "header": ("/hello", {"x-env": config["header_routes"][route]["header_values"][0]}),
+        "path": (f"/{route}/hello", {}),
+        "default": ("/hello", {"x-env": "no-such-env"}),
+    }
+    iterations = max(1000, int(20_000 * scale))
+    match = table.match
+    results = []
+    for case, (path, headers) in cases.items():
+        def run_round():
+            start = time.perf_counter_ns()
+            for _ in range(iterations):
+                match(path, headers)
+            return (time.perf_counter_ns() - start) / iterations
+
+        results.append(Result(f"rule_eval.{case}", "ns/match", "lower", *measure(rounds, run_round)))
+    return results
+
+
+# --- end to end through the stand-ins ----------------------------------------------------
+
+async def _request(reader, writer, request):
+    """Send one keep-alive request and return (status, headers block)."""
+    writer.write(request)
+    head = await reader.readuntil(b"\r\n\r\n")
+    lower = head.lower()
+    at = lower.find(b"\r\ncontent-length:")
+    if at >= 0:
+        length = int(lower[at + 17:lower.index(b"\r\n", at + 2)])
+        if length:
+            await reader.readexactly(length)
+    return int(head[9:12]), head
+
+
+def _location(head):
+    for line in head.decode("latin-1").split("\r\n"):
+        name, _, value = line.partition(":")
+        if name.lower() == "location":
+            return value.strip()
+    raise ValueError("redirect without Location")
+
+
+async def _e2e(mode, rounds, per_round):
+    config = _routing_config()
+    stage_name = _last_header_route(config)
+    backend = Backend()
+    servers = [await serve(backend.handle, "127.0.0.1", 0)]
+    backend_port = servers[0].sockets[0].getsockname()[1]
+    stage = StageConfig(stage_name, 0, f"http://127.0.0.1:{backend_port}/anything")
+    client = ProxyClient()
+    apigw = ApiGateway([stage], client, throttle=False)
+    servers.extend(await apigw.start("127.0.0.1"))
+    stage_port = servers[-1].sockets[0].getsockname()[1]
+    table = RuleTable.from_manifest(local_manifest("127.0.0.1", 0, {stage_name: stage_port}, **config))
+    alb = Alb(table, 0, mode=mode, client=client)
+    servers.append(await serve(alb.handle, "127.0.0.1", 0))
+    alb_port = servers[-1].sockets[0].getsockname()[1]
+
+    header = config["header_routes"][stage_name]
+    alb_request = (f"GET /hello HTTP/1.1\r\nHost: 127.0.0.1:{alb_port}\r\n"
+                   f"{header['header_name']}: {header['header_values'][0]}\r\n\r\n").encode()
+    alb_conn = await asyncio.open_connection("127.0.0.1", alb_port)
+    stage_conn = await asyncio.open_connection("127.0.0.1", stage_port)
+    stage_request = None
+
+    async def one():
+        nonlocal stage_request
+        status, head = await _request(*alb_conn, alb_request)
+        if mode == "forward":
+            return status
+        if stage_request is None:
+            target = _location(head).split("/", 3)[3]
+            stage_request = f"GET /{target} HTTP/1.1\r\nHost: 127.0.0.1:{stage_port}\r\n\r\n".encode()
+        status, _ = await _request(*stage_conn, stage_request)
+        return status
+
+    try:
+        for _ in range(20):
+            await one()  # warm up pools
+        samples, calibration = [], []
+        for _ in range(rounds):
+            calibration.append(calibration_round())
+            start = time.perf_counter()
+            for _ in range(per_round):
+                if await one() != 200:
+                    raise RuntimeError(f"e2e.{mode}: unexpected status")
+            samples.append(1e6 * (time.perf_counter() - start) / per_round)
+    finally:
+        for _, writer in (alb_conn, stage_conn):
+            writer.close()
+        for server in servers:
+            server.close()
+        client.close()
+    return Result(f"e2e.{mode}", "us/request", "lower", samples, calibration, normalize=False)
+
+
+def bench_e2e(rounds, scale):
+    per_round = max(20, int(300 * scale))
+    return [asyncio.run(_e2e(mode, rounds, per_round)) for mode in ("redirect", "forward")]
+
+
+# --- throttling --------------------------------------------------------------------------
+
+def _allow_rate(bucket, iterations):
+    allow = bucket.allow
+    start = time.perf_counter()
+    for _ in range(iterations):
+        allow()
+    return iterations / (time.perf_counter() - start)
+
+
+async def _stage_rejections(rounds, per_round):
+    # Burst of 1 and a negligible rate: after the first request every request is a 429
+    stage = StageConfig("uat1", 0, "http://127.0.0.1:9/anything", throttling_rate_limit=1e-9,
+                        throttling_burst_limit=1)
+    client = HttpClient()
+    apigw = ApiGateway([stage], client)
+    (server,) = await apigw.start("127.0.0.1")
+    port = server.sockets[0].getsockname()[1]
+    apigw.buckets["uat1"].tokens = 0.0
+    request = f"GET /hello HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode()
+    conn = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        samples, calibration = [], []
+        for _ in range(rounds):
+            calibration.append(calibration_round())
+            start = time.perf_counter()
+            for _ in range(per_round):
+                await _request(*conn, request)
+            samples.append(per_round / (time.perf_counter() - start))
+    finally:
+        conn[1].close()
+        server.close()
+        client.close()
+    return samples, calibration
+
+
+def bench_throttle(rounds, scale):
+    iterations = max(10_000, int(200_000 * scale))
+    shared = SharedThrottle({"uat1": (50.0, 100)}).buckets()["uat1"]
+    return [
+        Result("throttle.token_bucket", "ops/s", "higher",
+               *measure(rounds, lambda: _allow_rate(TokenBucket(50.0, 100), iterations))),
+        Result("throttle.shared_token_bucket", "ops/s", "higher",
+               *measure(rounds, lambda: _allow_rate(shared, iterations))),
+        Result("throttle.stage_rejections", "req/s", "higher",
+               *asyncio.run(_stage_rejections(rounds, max(50, int(1000 * scale)))), normalize=False),
+    ]
+
+
+# --- diagram generators ------------------------------------------------------------------
+
+def diagram_scripts():
+    scripts = sorted(glob.glob(os.path.join(ROOT, "generate_*.py")))
+    scripts += sorted(glob.glob(os.path.join(ROOT, "diagrams", "*.py")))
+    return scripts
+
+
+def _run_generator(script, workdir):
+    """Run a generator in a scratch copy of the diagrams/ inputs; return (seconds, error)."""
+    inputs = os.path.join(workdir, "diagrams")
+    shutil.rmtree(inputs, ignore_errors=True)
+    os.makedirs(inputs)
+    for dot in glob.glob(os.path.join(ROOT, "diagrams", "*.dot")):
+        shutil.copy(dot, inputs)
+    before = set(os.listdir(inputs)) | set(os.listdir(workdir))
+    # Scripts under diagrams/ write next to the working directory, the others into diagrams/
+    cwd = inputs if os.path.dirname(script).endswith("diagrams") else workdir
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, script], cwd=cwd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    produced = (set(os.listdir(inputs)) | set(os.listdir(workdir))) - before
+    if proc.returncode != 0:
+        lines = (proc.stderr or proc.stdout).strip().splitlines()
+        return elapsed, lines[-1] if lines else f"exit status {proc.returncode}"
+    if not produced:
+        lines = proc.stdout.strip().splitlines()
+        return elapsed, lines[-1] if lines else "no output produced"
+    return elapsed, None
+
+
+def bench_diagrams(rounds, scale):
+    results = []
+    diagram_rounds = max(2, min(rounds, 5))
+    with tempfile.TemporaryDirectory(prefix="diagram-bench-") as workdir:
+        for script in diagram_scripts():
+            name = "diagram." + os.path.relpath(script, ROOT)[:-3].replace(os.sep, ".")
+            samples, calibration = [], []
+            for _ in range(diagram_rounds):
+                calibration.append(calibration_round())
+                elapsed, error = _run_generator(script, workdir)
+                if error:
+                    results.append(Result(name, "s", "lower", [], skipped=error))
+                    break
+                samples.append(elapsed)
+            else:
+                results.append(Result(name, "s", "lower", samples, calibration, normalize=False))
+    return results
+
+
+BENCHMARKS = {
+    "rule_eval": bench_rule_eval,
+    "e2e": bench_e2e,
+    "throttle": bench_throttle,
+    "diagram": bench_diagrams,
+}
+
+
+# --- statistics and comparison ------------------------------------------------------------
+
+def mann_whitney_p(a, b):
+    """Two-sided Mann-Whitney U p-value (normal approximation with tie correction)."""
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return 1.0
+    ranked = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    r1 = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / sigma
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def relative_mad(samples):
+    """Median absolute deviation as a fraction of the median: the run-to-run noise level."""
+    median = statistics.median(samples)
+    if not median:
+        return 0.0
+    return statistics.median(abs(v - median) for v in samples) / abs(median)
+
+
+def normalized(result):
+    """Per-round values in units of the calibration loop run just before each round."""
+    calibration = result.get("calibration_ns")
+    if not result.get("normalize") or not calibration or len(calibration) != len(result["samples"]):
+        return None
+    if result["better"] == "lower":
+        return [v / c for v, c in zip(result["samples"], calibration)]
+    return [v * c for v, c in zip(result["samples"], calibration)]
+
+
+def compare(current, baseline, max_regression, alpha, normalize=True):
+    """Return {name: comparison} for every benchmark present and not skipped in both runs."""
+    report = {}
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if cur.get("skipped"):
+            report[name] = {"status": "skipped", "reason": cur["skipped"]}
+            continue
+        if not base or base.get("skipped"):
+            report[name] = {"status": "new"}
+            continue
+        cur_samples, base_samples = cur["samples"], base["samples"]
+        is_normalized = False
+        if normalize and normalized(cur) and normalized(base):
+            cur_samples, base_samples = normalized(cur), normalized(base)
+            is_normalized = True
+        change = statistics.median(cur_samples) / statistics.median(base_samples) - 1
+        worse = change if cur["better"] == "lower" else -change
+        p = mann_whitney_p(cur_samples, base_samples)
+        significant = p < alpha
+        if significant and worse > max_regression:
+            status = "regression"
+        elif significant and worse < -max_regression:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        report[name] = {
+            "status": status,
+            "change": change,
+            "p_value": p,
+            "noise": max(relative_mad(cur_samples), relative_mad(base_samples)),
+            "normalized": is_normalized,
+            "baseline_median": base["median"],
+            "median": cur["median"],
+        }
+    return report
+
+
+# --- running and storage -----------------------------------------------------------------
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(patterns, rounds, scale, log=print):
+    results = {}
+    for group, bench in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(group, p.split(".")[0]) for p in patterns):
+            continue
+        log(f"Running {group} ...")
+        for result in bench(rounds, scale):
+            if patterns and not any(fnmatch.fnmatch(result.name, p) or fnmatch.fnmatch(group, p)
+                                    for p in patterns):
+                continue
+            results[result.name] = result.as_dict()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "rounds": rounds,
+        "scale": scale,
+        "results": results,
+    }
+
+
+def save_run(run, history_dir):
+    os.makedirs(history_dir, exist_ok=True)
+    stamp = run["timestamp"].replace(":", "").replace("+0000", "Z")
+    path = os.path.join(history_dir, f"{stamp}-{run['commit'] or 'nocommit'}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    return path
+
+
+def load_run(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _format_value(value, unit):
+    if unit == "ops/s" or unit == "req/s":
+        return f"{value:,.0f} {unit}"
+    return f"{value:,.3f} {unit}" if value < 100 else f"{value:,.1f} {unit}"
+
+
+def print_report(run, comparison):
+    print(f"{'benchmark':<42} {'median':>20} {'vs baseline':>12} {'p':>7} {'noise':>7}  status")
+    for name, result in run["results"].items():
+        row = comparison.get(name, {"status": "-"})
+        if result.get("skipped"):
+            print(f"{name:<42} {'-':>20} {'':>12} {'':>7} {'':>7}  skipped: {result['skipped']}")
+            continue
+        median = _format_value(result["median"], result["unit"])
+        if "change" in row:
+            print(f"{name:<42} {median:>20} {row['change']:>+11.1%} {row['p_value']:>7.3f} "
+                  f"{row['noise']:>6.1%}  {row['status']}")
+        else:
+            print(f"{name:<42} {median:>20} {'':>12} {'':>7} {'':>7}  {row['status']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", action="append", default=[], metavar="PATTERN",
+                        help="Run benchmarks matching a glob, e.g. 'rule_eval.*' or 'e2e' (repeatable)")
+    parser.add_argument("--rounds", type=int, default=10, help="Rounds per benchmark (default: 10)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the work per round (default: 1.0)")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline run to compare against")
+    parser.add_argument("--history-dir", default=HISTORY_DIR)
+    parser.add_argument("--save", action="store_true", help="Store this run in the history directory")
+    parser.add_argument("--update-baseline", action="store_true", help="Make this run the new baseline")
+    parser.add_argument("--max-regression", type=float, default=10.0,
+                        help="Fail when a benchmark is this many percent worse, significantly (default: 10)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level (default: 0.05)")
+    parser.add_argument("--no-normalize", action="store_true",
+                        help="Compare raw numbers instead of scaling by the calibration loop")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE_RUN", "RUN"),
+                        help="Compare two stored runs instead of running the suite")
+    parser.add_argument("--json", action="store_true", help="Print the run and comparison as JSON")
+    args = parser.parse_args(argv)
+    if args.rounds < 2:
+        parser.error("--rounds must be at least 2")
+
+    if args.compare:
+        baseline, run = load_run(args.compare[0]), load_run(args.compare[1])
+    else:
+        run = run_suite(args.only, args.rounds, args.scale, log=(lambda _: None) if args.json else print)
+        baseline = load_run(args.baseline) if os.path.exists(args.baseline) else None
+        if args.save:
+            print(f"Saved {save_run(run, args.history_dir)}", file=sys.stderr)
+        if args.update_baseline:
+            with open(args.baseline, "w") as f:
+                json.dump(run, f, indent=2)
+            print(f"Updated baseline {args.baseline}", file=sys.stderr)
+
+    comparison = {}
+    if baseline:
+        comparison = compare(run["results"], baseline["results"], args.max_regression / 100, args.alpha,
+                             normalize=not args.no_normalize)
+    if args.json:
+        print(json.dumps({"run": run, "comparison": comparison}, indent=2))
+    else:
+        if baseline:
+            print(f"Baseline: {baseline.get('commit')} at {baseline.get('timestamp')}")
+        print_report(run, comparison)
+
+    regressions = sorted(name for name, row in comparison.items() if row["status"] == "regression")
+    if regressions:
+        print(f"Regressions over {args.max_regression:g}%: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Script to clean up the AWS resources created by this project when `terraform destroy` gets stuck.
+
+Resources are discovered by the project tags (see `var.tags` in variables.tf) and deleted in
+dependency order. Everything within one level is deleted concurrently, describe calls are
+paginated and transient/dependency errors are retried with exponential backoff.
+
+Pass --endpoint-url to run against a local moto server (`moto_server -p 5000`).
+"""
+
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Tags shared by every resource in the stack. `Environment` is left out on purpose: the API
+# Gateway module overrides it with the stage name (uat1/uat2).
+DEFAULT_TAGS = {
+    "Project": "API-Gateway-LB",
+    "Terraform": "true",
+}
+
+# Error codes worth retrying: throttling plus "still in use" errors that clear once the
+# previous dependency level has finished deleting.
+RETRYABLE_ERRORS = {
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "ResourceInUse",
+    "DependencyViolation",
+    "ConflictException",
+}
+
+# Error codes meaning the resource is already gone.
+NOT_FOUND_ERRORS = {
+    "RuleNotFound",
+    "ListenerNotFound",
+    "LoadBalancerNotFound",
+    "TargetGroupNotFound",
+    "InvalidVpcEndpointId.NotFound",
+    "InvalidVpcEndpoint.NotFound",
+    "NotFoundException",
+}
+
+
+def parse_tags(values):
+    """Turn a list of Key=Value strings into a dict."""
+    tags = {}
+    for value in values:
+        key, sep, tag_value = value.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Tag '{value}' must be in Key=Value form")
+        tags[key] = tag_value
+    return tags
+
+
+def tags_match(resource_tags, wanted):
+    """Return True if every wanted tag is present with the same value."""
+    return all(resource_tags.get(k) == v for k, v in wanted.items())
+
+
+def with_backoff(func, attempts=6, base_delay=0.5, max_delay=8.0):
+    """Call func(), retrying retryable ClientErrors with jittered exponential backoff."""
+    for attempt in range(attempts):
+        try:
+            return func()
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code", "")
+            if code in NOT_FOUND_ERRORS:
+                return None
+            if code not in RETRYABLE_ERRORS or attempt == attempts - 1:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(random.uniform(delay / 2, delay))
+
+
+def paginate(client, operation, result_key, **kwargs):
+    """Yield every item of result_key, using a paginator when the operation has one."""
+    if client.can_paginate(operation):
+        for page in client.get_paginator(operation).paginate(**kwargs):
+            yield from page.get(result_key, [])
+        return
+
+    # apigatewayv2 operations are NextToken based but not every botocore version ships paginators
+    method = getattr(client, operation)
+    token = None
+    while True:
+        page = method(**kwargs, **({"NextToken": token} if token else {}))
+        yield from page.get(result_key, [])
+        token = page.get("NextToken")
+        if not token:
+            break
+
+
+class ResourceCleaner:
+    """Discovers tagged project resources and deletes them level by level."""
+
+    def __init__(self, region, tags, endpoint_url=None, workers=16, dry_run=False):
+        config = Config(retries={"max_attempts": 10, "mode": "adaptive"},
+                        max_pool_connections=max(workers, 10))
+        session = boto3.session.Session(region_name=region)
+        # Clients are thread safe, sessions are not: create them all up front
+        self.elbv2 = session.client("elbv2", endpoint_url=endpoint_url, config=config)
+        self.ec2 = session.client("ec2", endpoint_url=endpoint_url, config=config)
+        self.apigw = session.client("apigatewayv2", endpoint_url=endpoint_url, config=config)
+        self.tags = tags
+        self.workers = workers
+        self.dry_run = dry_run
+
+    # Discovery
+
+    def _elbv2_tagged(self, arns):
+        """Return the subset of ELBv2 ARNs carrying the project tags (DescribeTags takes 20 at a time)."""
+        arns = list(arns)
+        batches = [arns[i:i + 20] for i in range(0, len(arns), 20)]
+
+        def describe(batch):
+            response = with_backoff(lambda: self.elbv2.describe_tags(ResourceArns=batch))
+            if response is None:
+                # One ARN in the batch vanished mid-cleanup, which fails the whole call; ask per ARN
+                return [arn for single in batch if len(batch) > 1 for arn in describe([single])]
+            return [
+                d["ResourceArn"] for d in response["TagDescriptions"]
+                if tags_match({t["Key"]: t["Value"] for t in d.get("Tags", [])}, self.tags)
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return {arn for result in pool.map(describe, batches) for arn in result}
+
+    def discover_load_balancer_resources(self):
+        """Return (listener rules, listeners, target groups) belonging to tagged load balancers."""
+        lb_arns = self._elbv2_tagged(
+            lb["LoadBalancerArn"] for lb in paginate(self.elbv2, "describe_load_balancers", "LoadBalancers")
+        )
+        target_groups = list(paginate(self.elbv2, "describe_target_groups", "TargetGroups"))
+        tg_arns = self._elbv2_tagged(tg["TargetGroupArn"] for tg in target_groups)
+        tg_arns.update(
+            tg["TargetGroupArn"] for tg in target_groups
+            if lb_arns.intersection(tg.get("LoadBalancerArns", []))
+        )
+
+        # Load balancers and listeners can vanish between discovery steps (None from with_backoff)
+        def listeners_for(lb_arn):
+            listeners = with_backoff(lambda: list(paginate(self.elbv2, "describe_listeners", "Listeners",
+                                                           LoadBalancerArn=lb_arn)))
+            return [l["ListenerArn"] for l in listeners or []]
+
+        def rules_for(listener_arn):
+            rules = with_backoff(lambda: list(paginate(self.elbv2, "describe_rules", "Rules",
+                                                       ListenerArn=listener_arn)))
+            return [r["RuleArn"] for r in rules or [] if not r.get("IsDefault")]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            listener_arns = [arn for arns in pool.map(listeners_for, lb_arns) for arn in arns]
+            rule_arns = [arn for arns in pool.map(rules_for, listener_arns) for arn in arns]
+
+        return rule_arns, listener_arns, sorted(tg_arns)
+
+    def discover_vpc_endpoints(self):
+        """Return the IDs of tagged VPC endpoints that are not already being deleted."""
+        filters = [{"Name": f"tag:{k}", "Values": [v]} for k, v in self.tags.items()]
+        return [
+            ep["VpcEndpointId"]
+            for ep in paginate(self.ec2, "describe_vpc_endpoints", "VpcEndpoints", Filters=filters)
+            if ep.get("State", "").lower() not in ("deleting", "deleted")
+        ]
+
+    def discover_api_resources(self):
+        """Return (api ids, stages, routes, integrations) for tagged HTTP APIs."""
+        api_ids = [api["ApiId"] for api in paginate(self.apigw, "get_apis", "Items")
+                   if tags_match(api.get("Tags", {}), self.tags)]
+
+        def children(api_id):
+            stages = [(api_id, s["StageName"]) for s in paginate(self.apigw, "get_stages", "Items", ApiId=api_id)]
+            routes = [(api_id, r["RouteId"]) for r in paginate(self.apigw, "get_routes", "Items", ApiId=api_id)]
+            integrations = [(api_id, i["IntegrationId"])
+                            for i in paginate(self.apigw, "get_integrations", "Items", ApiId=api_id)]
+            return stages, routes, integrations
+
+        stages, routes, integrations = [], [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for s, r, i in pool.map(children, api_ids):
+                stages.extend(s)
+                routes.extend(r)
+                integrations.extend(i)
+        return api_ids, stages, routes, integrations
+
+    def plan(self):
+        """Discover everything and group the delete calls into dependency levels."""
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            lb_future = pool.submit(self.discover_load_balancer_resources)
+            ep_future = pool.submit(self.discover_vpc_endpoints)
+            api_future = pool.submit(self.discover_api_resources)
+            rule_arns, listener_arns, tg_arns = lb_future.result()
+            endpoint_ids = ep_future.result()
+            api_ids, stages, routes, integrations = api_future.result()
+
+        elbv2, apigw = self.elbv2, self.apigw
+        return [
+            # Level 0: nothing depends on these
+            [(f"listener rule {arn}", lambda arn=arn: elbv2.delete_rule(RuleArn=arn)) for arn in rule_arns]
+            + [(f"route {api}/{rid}", lambda api=api, rid=rid: apigw.delete_route(ApiId=api, RouteId=rid))
+               for api, rid in routes]
+            + [(f"stage {api}/{name}", lambda api=api, name=name: apigw.delete_stage(ApiId=api, StageName=name))
+               for api, name in stages],
+            # Level 1: referenced by level 0
+            [(f"listener {arn}", lambda arn=arn: elbv2.delete_listener(ListenerArn=arn)) for arn in listener_arns]
+            + [(f"integration {api}/{iid}",
+                lambda api=api, iid=iid: apigw.delete_integration(ApiId=api, IntegrationId=iid))
+               for api, iid in integrations],
+            # Level 2: referenced by level 1
+            [(f"target group {arn}", lambda arn=arn: elbv2.delete_target_group(TargetGroupArn=arn))
+             for arn in tg_arns]
+            + [(f"api {api}", lambda api=api: apigw.delete_api(ApiId=api)) for api in api_ids]
+            + [(f"vpc endpoint {ep}", lambda ep=ep: self._delete_vpc_endpoint(ep)) for ep in endpoint_ids],
+        ]
+
+    # Deletion
+
+    def _delete_vpc_endpoint(self, endpoint_id):
+        """DeleteVpcEndpoints reports failures in `Unsuccessful` instead of raising; raise them."""
+        response = self.ec2.delete_vpc_endpoints(VpcEndpointIds=[endpoint_id])
+        for item in response.get("Unsuccessful", []):
+            raise ClientError({"Error": item.get("Error", {"Code": "Unknown", "Message": "delete failed"})},
+                              "DeleteVpcEndpoints")
+        return response
+
+    def run(self):
+        """Delete every discovered resource and return the number of failures."""
+        failures = 0
+        for level, tasks in enumerate(self.plan()):
+            if not tasks:
+                continue
+            print(f"Level {level}: deleting {len(tasks)} resource(s)...")
+            if self.dry_run:
+                for name, _ in tasks:
+                    print(f"  [dry-run] would delete {name}")
+                continue
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(with_backoff, func): name for name, func in tasks}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        future.result()
+                        print(f"  Deleted {name}")
+                    except ClientError as e:
+                        failures += 1
+                        print(f"  Error deleting {name}: {e}", file=sys.stderr)
+        return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete the project's tagged AWS resources in dependency order.")
+    parser.add_argument("--region", default="eu-west-1", help="AWS region (default: eu-west-1)")
+    parser.add_argument("--tag", action="append", default=[], metavar="KEY=VALUE",
+                        help="Tag to match, may be repeated (default: the project tags)")
+    parser.add_argument("--endpoint-url", help="Override the AWS endpoint, e.g. http://localhost:5000 for moto")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent API calls per level (default: 16)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be deleted")
+    args = parser.parse_args(argv)
+
+    tags = parse_tags(args.tag) if args.tag else DEFAULT_TAGS
+    print("Beginning resource cleanup for tags: " + ", ".join(f"{k}={v}" for k, v in tags.items()))
+    cleaner = ResourceCleaner(args.region, tags, endpoint_url=args.endpoint_url,
+                              workers=args.workers, dry_run=args.dry_run)
+    failures = cleaner.run()
+    if failures:
+        print(f"Cleanup finished with {failures} error(s).", file=sys.stderr)
+        return 1
+    print("Cleanup completed. Now try running terraform destroy again.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+Local stand-ins for the ALB, API Gateway stages and httpbin backend used by this project.
+
+The routing behaviour is driven by the same routing manifest that Terraform exports
+(`terraform output -raw routing_manifest`), so local runs exercise the rules that are deployed.
+"""
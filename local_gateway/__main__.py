@@ -0,0 +1,92 @@
+"""
+Run the local stack: ALB stand-in -> API Gateway stage stand-ins -> httpbin stand-in.
+
+    python -m local_gateway --manifest-out local_manifest.json
+    python smoke_test.py --manifest local_manifest.json
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+
+from .stack import LocalStack, run_loop
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m local_gateway", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--alb-port", type=int, default=8080)
+    parser.add_argument("--stage-base-port", type=int, default=8081,
+                        help="First API Gateway stage port; stages use consecutive ports (default: 8081)")
+    parser.add_argument("--backend-port", type=int, default=8090)
+    parser.add_argument("--alb-mode", choices=("redirect", "forward"), default="redirect")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected backend latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random backend latency (uniform)")
+    parser.add_argument("--tail-ms", type=float, default=0.0, help="Extra latency for the tail fraction of requests")
+    parser.add_argument("--tail-fraction", type=float, default=0.0,
+                        help="Fraction of backend requests that get --tail-ms on top (e.g. 0.01)")
+    parser.add_argument("--rate-limit", type=float, default=50.0, help="Stage throttling_rate_limit")
+    parser.add_argument("--burst-limit", type=int, default=100, help="Stage throttling_burst_limit")
+    parser.add_argument("--no-throttle", action="store_true", help="Disable stage throttling")
+    parser.add_argument("--cache-ttl", type=float, default=0.0, help="Response cache TTL in seconds (0 disables)")
+    parser.add_argument("--cache-entries", type=int, default=10_000)
+    parser.add_argument("--cache-bytes", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--cache-key-header", action="append", default=[],
+                        help="Extra request header to include in the cache key (x-env is always included)")
+    parser.add_argument("--cache-key-query", action="append", default=[],
+                        help="Query parameter to include in the cache key")
+    parser.add_argument("--payload-bytes", type=int, default=0,
+                        help="Backend returns a payload of this size instead of the httpbin echo")
+    parser.add_argument("--no-splice", action="store_true",
+                        help="Relay proxied bodies through pooled buffers even where os.splice exists")
+    parser.add_argument("--naive-proxy", action="store_true",
+                        help="Buffer proxied bodies with the plain HTTP client (for comparison)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing every port via SO_REUSEPORT (default: 1)")
+    parser.add_argument("--report-interval", type=float, default=0.0,
+                        help="With --workers, print merged counters every N seconds")
+    parser.add_argument("--terraform-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="Directory with main.tf to read header_routes from (default: this repository)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Recompile the listener rules whenever the Terraform files change")
+    parser.add_argument("--manifest-out", help="Write the local routing manifest to this file")
+    parser.add_argument("--metrics-port", type=int, default=9464,
+                        help="Serve OpenMetrics on http://HOST:PORT/metrics (0 disables; default: 9464)")
+    parser.add_argument("--trace-out", metavar="PREFIX",
+                        help="Record per-hop spans and write PREFIX.chrome.json and PREFIX.otlp.json on exit")
+    parser.add_argument("--trace-sample", type=float, default=1.0,
+                        help="Fraction of new requests to trace (incoming trace headers are always honoured)")
+    return parser
+
+
+async def run(options):
+    stack = LocalStack(options)
+    if options.manifest_out:
+        stack.write_manifest(options.manifest_out)
+    servers = await stack.start()
+    print(stack.describe())
+    # Shut down cleanly on SIGTERM too, so counters and traces are still written
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        stack.close()
+        if options.trace_out:
+            stack.write_traces()
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    if options.workers > 1:
+        from .workers import run_workers
+        run_workers(options)
+        return
+    try:
+        run_loop(run(options))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Stand-in for the ALB listener configured by `modules/alb_header_routing`.
+
+Requests are matched against the compiled listener rules. In `redirect` mode (what the
+module deploys) the matching rule's redirect is returned; in `forward` mode the request
+is proxied to the target stage instead, which is handy for end-to-end latency runs.
+"""
+
+import time
+from typing import NamedTuple
+
+from .http import Response, json_response, serve
+from .metrics import RULE_EVAL_BUCKETS
+from .tracing import TRACE_HEADER, finish_hop, unsampled_header
+
+STATS_PATH = "/_local/stats"
+
+
+class AlbMetrics(NamedTuple):
+    requests: object
+    duration: object
+    rule_evaluation: object
+
+
+class Alb:
+    """Listener rule evaluation plus redirect/forward actions."""
+
+    def __init__(self, table, port, mode="redirect", client=None, scheme="http", tracer=None, metrics=None):
+        if mode not in ("redirect", "forward"):
+            raise ValueError(f"Unknown ALB mode '{mode}'")
+        if mode == "forward" and client is None:
+            raise ValueError("forward mode needs an HTTP client")
+        self.table = table
+        self.port = port
+        self.mode = mode
+        self.client = client
+        self.scheme = scheme
+        self.matched = {}
+        self.rule_evals = 0
+        self.rule_eval_ns = 0
+        self.reloader = None
+        self.tracer = tracer
+        self.metrics = None
+        if metrics is not None:
+            self.metrics = AlbMetrics(
+                metrics.counter("gateway_alb_requests", "Requests handled by the ALB listener",
+                                ("rule", "route_key", "status")),
+                metrics.histogram("gateway_alb_request_duration_seconds",
+                                  "ALB time to response head, including the forwarded request",
+                                  ("rule", "route_key")),
+                metrics.histogram("gateway_alb_rule_evaluation_seconds", "Listener rule evaluation time",
+                                  (), RULE_EVAL_BUCKETS),
+            )
+
+    async def handle(self, request):
+        if request.path == STATS_PATH:
+            return json_response(200, self.snapshot())
+
+        trace = self.tracer.begin("alb", request.headers) if self.tracer is not None else None
+
+        # `table` may be swapped by the reloader between requests; read it exactly once
+        start = time.perf_counter_ns()
+        rule = self.table.match(request.path, request.headers)
+        elapsed = time.perf_counter_ns() - start
+        self.rule_eval_ns += elapsed
+        self.rule_evals += 1
+        key = (rule.kind, rule.route_key)
+        self.matched[key] = self.matched.get(key, 0) + 1
+        if trace is not None:
+            trace.span("rule_evaluation", trace.start_ns, trace.start_ns + elapsed,
+                       rule=rule.kind, route_key=rule.route_key, priority=rule.priority)
+
+        # The ALB keeps the original query string on redirects (#{query})
+        location = f"{self.scheme}://{rule.target_host}{rule.path}"
+        if request.query:
+            location += f"?{request.query}"
+        if self.mode == "redirect":
+            response = Response(rule.status_code, {"Location": location})
+            if trace is not None:
+                trace.span("redirect", time.time_ns(), location=location)
+                response.headers[TRACE_HEADER] = trace.header()
+                finish_hop(trace, response, route_key=rule.route_key)
+            elif self.tracer is not None:
+                response.headers[TRACE_HEADER] = unsampled_header(request.headers)
+            if self.metrics is not None:
+                self._record(rule, response.status, start, elapsed)
+            return response
+
+        headers = request.headers
+        if trace is not None:
+            headers = {**headers, TRACE_HEADER: trace.header()}
+            forward_start = time.time_ns()
+        elif self.tracer is not None:
+            headers = {**headers, TRACE_HEADER: unsampled_header(headers)}
+        try:
+            response = await self.client.request(request.method, location, headers, request.body, trace=trace)
+        except (OSError, TimeoutError, EOFError) as e:
+            # Like the ALB: 503 when nothing listens on the target, 502 when the target fails
+            if isinstance(e, ConnectionRefusedError):
+                response = json_response(503, {"message": "Service Unavailable", "error": str(e)})
+            else:
+                response = json_response(502, {"message": "Bad Gateway", "error": str(e)})
+        if trace is not None:
+            trace.span("forward", forward_start, target=location, status=response.status)
+            finish_hop(trace, response, route_key=rule.route_key)
+        if self.metrics is not None:
+            self._record(rule, response.status, start, elapsed)
+        return response
+
+    def _record(self, rule, status, start_ns, eval_ns):
+        self.metrics.requests.inc(rule.kind, rule.route_key, status)
+        self.metrics.duration.observe((time.perf_counter_ns() - start_ns) / 1e9, rule.kind, rule.route_key)
+        self.metrics.rule_evaluation.observe(eval_ns / 1e9)
+
+    def snapshot(self):
+        return {
+            "matched": {f"{kind}:{route_key}": n for (kind, route_key), n in self.matched.items()},
+            "rule_evals": self.rule_evals,
+            "rule_eval_ns": self.rule_eval_ns,
+            "rule_eval_avg_ns": self.rule_eval_ns / self.rule_evals if self.rule_evals else 0.0,
+            "reload": self.reloader.stats.as_dict() if self.reloader is not None else None,
+        }
+
+    async def start(self, host="127.0.0.1", reuse_port=False):
+        return await serve(self.handle, host, self.port, reuse_port)
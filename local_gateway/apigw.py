@@ -0,0 +1,170 @@
+"""
+Stand-in for the HTTP APIs created by `modules/api_gateway_mock`.
+
+Each stage is a separate API in that module, so each stage gets its own listener here.
+Every stage exposes `GET /hello`, applies the `$default` stage throttling
+(`throttling_rate_limit` / `throttling_burst_limit`) and proxies to its HTTP_PROXY
+integration URI.
+"""
+
+import time
+from typing import NamedTuple
+
+from .http import HOP_BY_HOP, json_response, serve
+from .tracing import TRACE_HEADER, finish_hop, unsampled_header
+
+ROUTE_KEY = ("GET", "/hello")
+STATS_PATH = "/_local/stats"
+
+
+class StageConfig(NamedTuple):
+    name: str
+    port: int
+    integration_uri: str
+    throttling_rate_limit: float = 50.0
+    throttling_burst_limit: int = 100
+
+
+class TokenBucket:
+    """Token bucket matching API Gateway's rate/burst throttling semantics."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "clock")
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+
+    def allow(self):
+        """Take one token if available."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class StageStats:
+    __slots__ = ("requests", "throttled", "not_found", "upstream_errors")
+
+    def __init__(self):
+        self.requests = self.throttled = self.not_found = self.upstream_errors = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StageMetrics(NamedTuple):
+    requests: object
+    duration: object
+    throttled: object
+    upstream_errors: object
+
+
+class ApiGateway:
+    """All stages of the API Gateway stand-in, sharing one upstream client and optional cache."""
+
+    def __init__(self, stages, client, cache=None, throttle=True, buckets=None, tracer=None, metrics=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.client = client
+        self.cache = cache
+        self.tracer = tracer
+        self.metrics = None
+        if metrics is not None:
+            self.metrics = StageMetrics(
+                metrics.counter("gateway_apigw_requests", "Requests handled by each stage", ("stage", "status")),
+                metrics.histogram("gateway_apigw_request_duration_seconds",
+                                  "Stage time to response head, including the integration", ("stage",)),
+                metrics.counter("gateway_apigw_throttled", "Requests rejected by stage throttling", ("stage",)),
+                metrics.counter("gateway_apigw_upstream_errors", "HTTP_PROXY integration failures", ("stage",)),
+            )
+        # `buckets` lets several worker processes share throttle state (see workers.py)
+        if not throttle:
+            self.buckets = {}
+        elif buckets is not None:
+            self.buckets = buckets
+        else:
+            self.buckets = {
+                stage.name: TokenBucket(stage.throttling_rate_limit, stage.throttling_burst_limit)
+                for stage in stages
+            }
+        self.stats = {stage.name: StageStats() for stage in stages}
+
+    def handler(self, stage_name):
+        """Return the request handler for one stage's listener."""
+        stage = self.stages[stage_name]
+        bucket = self.buckets.get(stage_name)
+        stats = self.stats[stage_name]
+
+        async def handle(request):
+            if request.path == STATS_PATH:
+                return json_response(200, self.snapshot())
+            start = time.perf_counter()
+            trace = self.tracer.begin(f"apigw-{stage_name}", request.headers) if self.tracer is not None else None
+            response = await respond(request, trace)
+            if trace is not None:
+                finish_hop(trace, response, stage=stage_name)
+            if self.metrics is not None:
+                self.metrics.requests.inc(stage_name, response.status)
+                self.metrics.duration.observe(time.perf_counter() - start, stage_name)
+            return response
+
+        async def respond(request, trace):
+            stats.requests += 1
+            if (request.method, request.path) != ROUTE_KEY:
+                stats.not_found += 1
+                return json_response(404, {"message": "Not Found"})
+            if bucket is not None:
+                start = time.time_ns() if trace is not None else 0
+                allowed = bucket.allow()
+                if trace is not None:
+                    trace.span("throttle_check", start, allowed=allowed)
+                if not allowed:
+                    stats.throttled += 1
+                    if self.metrics is not None:
+                        self.metrics.throttled.inc(stage_name)
+                    return json_response(429, {"message": "Too Many Requests"})
+
+            async def fetch():
+                return await self._proxy(stage, request, stats, trace)
+
+            if self.cache is not None:
+                return await self.cache.get_or_fetch(self.cache.key(stage_name, request), fetch)
+            return await fetch()
+
+        return handle
+
+    async def _proxy(self, stage, request, stats, trace=None):
+        """HTTP_PROXY integration: relay the request to the integration URI unchanged."""
+        headers = {k: v for k, v in request.headers.items() if k not in HOP_BY_HOP}
+        headers["x-forwarded-for"] = headers.get("x-forwarded-for", "127.0.0.1")
+        if trace is not None:
+            headers[TRACE_HEADER] = trace.header()
+        elif self.tracer is not None:
+            headers[TRACE_HEADER] = unsampled_header(headers)
+        uri = stage.integration_uri + (f"?{request.query}" if request.query else "")
+        try:
+            # Cached/coalesced responses are shared, so only stream bodies when nothing is cached
+            upstream = await self.client.request(request.method, uri, headers, request.body,
+                                                 stream=self.cache is None, trace=trace)
+        except (OSError, TimeoutError) as e:
+            stats.upstream_errors += 1
+            if self.metrics is not None:
+                self.metrics.upstream_errors.inc(stage.name)
+            return json_response(502, {"message": "Bad Gateway", "error": str(e)})
+        headers = {k: v for k, v in upstream.headers.items() if k not in HOP_BY_HOP}
+        headers["apigw-requestid"] = f"{stage.name}-{stats.requests}"
+        return upstream._replace(headers=headers)
+
+    def snapshot(self):
+        stats = {name: s.as_dict() for name, s in self.stats.items()}
+        return {"stages": stats, "cache": self.cache.snapshot() if self.cache is not None else None}
+
+    async def start(self, host="127.0.0.1", reuse_port=False):
+        """Start one listener per stage and return the servers."""
+        return [await serve(self.handler(stage.name), host, stage.port, reuse_port)
+                for stage in self.stages.values()]
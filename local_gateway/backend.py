@@ -0,0 +1,79 @@
+"""
+Stand-in for the `https://httpbin.org/anything` backend behind the HTTP_PROXY integrations.
+
+Echoes the request like httpbin does, with optional injected latency so the proxy path
+and anything in front of it can be measured without leaving the machine. A tail fraction of
+requests can be made much slower, like the occasional stalls of the real external backend. With a payload
+file it returns that file instead (sent with sendfile), for large-body relay runs.
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+from urllib.parse import parse_qs
+
+from .http import FileBody, Response, json_response
+from .tracing import finish_hop
+
+
+def make_payload_file(size, directory=None):
+    """Write `size` pseudo-random bytes to a temporary file and return its path."""
+    fd, path = tempfile.mkstemp(prefix="payload-", suffix=".bin", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        block = os.urandom(min(size, 1024 * 1024)) if size else b""
+        written = 0
+        while written < size:
+            written += f.write(block[:size - written])
+    return path
+
+
+class Backend:
+    """httpbin-style echo handler with configurable latency."""
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=None, payload_path=None, tracer=None, metrics=None,
+                 tail_latency=0.0, tail_fraction=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_latency = tail_latency
+        self.tail_fraction = tail_fraction
+        self.payload_path = payload_path
+        self.tracer = tracer
+        self.metrics = None
+        if metrics is not None:
+            self.metrics = metrics.counter("gateway_backend_requests", "Requests served by the backend", ("status",))
+        self.requests = 0
+        self._random = random.Random(seed)
+
+    async def handle(self, request):
+        trace = self.tracer.begin("backend", request.headers) if self.tracer is not None else None
+        response = await self._respond(request, trace)
+        if trace is not None:
+            finish_hop(trace, response, path=request.path)
+        if self.metrics is not None:
+            self.metrics.inc(response.status)
+        return response
+
+    async def _respond(self, request, trace):
+        self.requests += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.tail_fraction and self._random.random() < self.tail_fraction:
+            delay += self.tail_latency
+        if delay > 0:
+            start = time.time_ns()
+            await asyncio.sleep(delay)
+            if trace is not None:
+                trace.span("injected_latency", start, delay_ms=round(delay * 1000, 3))
+
+        if not request.path.startswith("/anything"):
+            return json_response(404, {"message": "Not Found"})
+        if self.payload_path:
+            return Response(200, {"Content-Type": "application/octet-stream"}, FileBody(self.payload_path))
+        return json_response(200, {
+            "args": {k: v if len(v) > 1 else v[0] for k, v in parse_qs(request.query).items()},
+            "data": request.body.decode("utf-8", "replace"),
+            "headers": {k.title(): v for k, v in request.headers.items()},
+            "method": request.method,
+            "url": f"http://{request.headers.get('host', '')}{request.target}",
+        })
@@ -0,0 +1,156 @@
+"""
+Response cache for the API Gateway stand-in.
+
+`GET /hello` responses are idempotent per stage, so they are cached by
+(stage, path, `x-env` and any configured headers, configured query parameters).
+The cache is an LRU bounded by entry count and body bytes, entries expire after a TTL
+and concurrent misses for the same key share one upstream fetch.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from urllib.parse import parse_qsl
+
+
+class _Entry(NamedTuple):
+    response: object
+    size: int
+    expires: float
+
+
+class CacheStats:
+    """Counters exported by the cache."""
+
+    __slots__ = ("hits", "misses", "coalesced", "expired", "evictions",
+                 "fetches", "fetch_seconds", "fetch_seconds_max")
+
+    def __init__(self):
+        self.hits = self.misses = self.coalesced = self.expired = self.evictions = 0
+        self.fetches = 0
+        self.fetch_seconds = self.fetch_seconds_max = 0.0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "upstream_fetches": self.fetches,
+            "upstream_latency_total_ms": 1000 * self.fetch_seconds,
+            "upstream_latency_avg_ms": 1000 * self.fetch_seconds / self.fetches if self.fetches else 0.0,
+            "upstream_latency_max_ms": 1000 * self.fetch_seconds_max,
+        }
+
+
+def merge_snapshots(snapshots):
+    """Combine cache snapshots from several workers, recomputing the derived ratios."""
+    merged = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            merged[key] = max(merged.get(key, 0), value) if key.endswith("_max_ms") else merged.get(key, 0) + value
+    lookups = merged.get("hits", 0) + merged.get("misses", 0) + merged.get("coalesced", 0)
+    fetches = merged.get("upstream_fetches", 0)
+    merged["hit_rate"] = (merged.get("hits", 0) + merged.get("coalesced", 0)) / lookups if lookups else 0.0
+    merged["upstream_latency_avg_ms"] = merged.get("upstream_latency_total_ms", 0) / fetches if fetches else 0.0
+    return merged
+
+
+class ResponseCache:
+    """LRU + TTL response cache with request coalescing."""
+
+    def __init__(self, ttl=30.0, max_entries=10_000, max_bytes=64 * 1024 * 1024,
+                 key_headers=("x-env",), key_query=(), clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.key_headers = tuple(h.lower() for h in key_headers)
+        self.key_query = frozenset(key_query)
+        self.clock = clock
+        self.stats = CacheStats()
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, stage, request):
+        """Build the cache key for a request to a stage."""
+        query = tuple(sorted(kv for kv in parse_qsl(request.query, keep_blank_values=True)
+                             if kv[0] in self.key_query)) if self.key_query else ()
+        headers = tuple(request.headers.get(h) for h in self.key_headers)
+        return stage, request.path, headers, query
+
+    def get(self, key):
+        """Return a fresh cached response or None (does not touch the stats)."""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires <= self.clock():
+            return None
+        return entry.response
+
+    async def get_or_fetch(self, key, fetch, cacheable=lambda response: response.status == 200):
+        """Return the cached response for key, calling `await fetch()` at most once per miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > self.clock():
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry.response
+            self.stats.expired += 1
+            self._remove(key)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        start = self.clock()
+        try:
+            response = await fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+            elapsed = self.clock() - start
+            self.stats.fetches += 1
+            self.stats.fetch_seconds += elapsed
+            self.stats.fetch_seconds_max = max(self.stats.fetch_seconds_max, elapsed)
+
+        if self.ttl > 0 and cacheable(response):
+            self._store(key, response)
+        future.set_result(response)
+        return response
+
+    def _store(self, key, response):
+        size = len(response.body) + sum(len(k) + len(v) for k, v in response.headers.items())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(response, size, self.clock() + self.ttl)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self.stats.evictions += 1
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def snapshot(self):
+        """Return the counters plus current occupancy."""
+        return {**self.stats.as_dict(), "entries": len(self._entries), "bytes": self.bytes}
@@ -0,0 +1,232 @@
+"""
+Hedged, retry-aware requests against the API Gateway stage endpoints.
+
+An idempotent request that has not been answered within the hedge delay (the recent p95
+latency of its target) gets a second copy on another connection. The first answer that is
+not a 429 wins and the other copy is cancelled, which closes its connection. Hedges and
+retries draw on a retry budget that earns a fraction of a token per request, so a slow
+upstream cannot turn every request into two.
+
+A 429 means the stage is over its `throttling_rate_limit` / `throttling_burst_limit`, and
+more copies would only be throttled too. It starts an exponential backoff with full jitter
+for that target, and honours Retry-After when it is sent. Until a request to the target
+succeeds again, requests wait out the backoff and nothing is hedged. The throttled request
+is retried after the backoff if the budget allows it.
+
+    client = HedgedClient(HttpClient())
+    response = await client.request("GET", "http://127.0.0.1:8081/hello")
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class LatencyWindow:
+    """Recent latencies of one target; the hedge delay is a quantile of them."""
+
+    __slots__ = ("samples", "quantile", "min_samples", "delay", "_since_update")
+
+    def __init__(self, quantile=0.95, size=1000, min_samples=20, initial_delay=0.05):
+        self.samples = deque(maxlen=size)
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.delay = initial_delay
+        self._since_update = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self._since_update += 1
+        # Re-sort every min_samples requests rather than on every request
+        if self._since_update >= self.min_samples:
+            ordered = sorted(self.samples)
+            self.delay = ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+            self._since_update = 0
+
+
+class RetryBudget:
+    """Token bucket for extra attempts: `ratio` tokens per request plus `min_per_second`."""
+
+    __slots__ = ("ratio", "min_per_second", "cap", "tokens", "updated", "clock")
+
+    def __init__(self, ratio=0.1, min_per_second=10.0, cap=100.0, clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        self.tokens = 0.0
+        self.clock = clock
+        self.updated = clock()
+
+    def deposit(self):
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Take one token for a hedge or retry if available."""
+        now = self.clock()
+        self.tokens = min(self.cap, self.tokens + (now - self.updated) * self.min_per_second)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class Backoff:
+    """Exponential backoff with full jitter for one target, started by 429s.
+
+    Every request to a throttled target waits its own random delay, so waiting callers do not
+    return together. 429s for requests sent before the last escalation belong to the same
+    overload and do not escalate again.
+    """
+
+    __slots__ = ("base", "cap", "attempts", "escalated", "retry_until", "_random")
+
+    def __init__(self, base=0.05, cap=2.0, seed=None):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+        self.escalated = self.retry_until = 0.0
+        self._random = random.Random(seed)
+
+    @property
+    def throttled(self):
+        return self.attempts > 0
+
+    def start(self, sent_at, retry_after=None):
+        now = time.monotonic()
+        if sent_at >= self.escalated:
+            self.attempts += 1
+            self.escalated = now
+        if retry_after is not None:
+            self.retry_until = max(self.retry_until, now + retry_after)
+
+    def delay(self):
+        """Seconds to wait before the next request to this target."""
+        if not self.attempts:
+            return 0.0
+        jittered = self._random.uniform(0, min(self.cap, self.base * 2 ** (self.attempts - 1)))
+        return max(jittered, self.retry_until - time.monotonic())
+
+    def reset(self):
+        self.attempts = 0
+
+
+class HedgeStats:
+    __slots__ = ("requests", "hedges", "hedge_wins", "cancelled", "budget_exhausted",
+                 "throttled", "retries", "backoff_seconds")
+
+    def __init__(self):
+        self.requests = self.hedges = self.hedge_wins = self.cancelled = self.budget_exhausted = 0
+        self.throttled = self.retries = 0
+        self.backoff_seconds = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _retry_after(headers):
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class HedgedClient:
+    """Wraps an `HttpClient` (or `relay.ProxyClient`) with hedging, backoff and a retry budget."""
+
+    def __init__(self, client, quantile=0.95, budget=None, max_throttle_retries=2, hedge=True,
+                 backoff_base=0.05, backoff_cap=2.0):
+        self.client = client
+        self.quantile = quantile
+        self.budget = budget if budget is not None else RetryBudget()
+        self.max_throttle_retries = max_throttle_retries
+        self.hedge = hedge
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = HedgeStats()
+        self._targets = {}  # netloc -> (LatencyWindow, Backoff)
+
+    def _target(self, url):
+        netloc = urlsplit(url).netloc
+        target = self._targets.get(netloc)
+        if target is None:
+            target = self._targets[netloc] = (LatencyWindow(self.quantile),
+                                              Backoff(self.backoff_base, self.backoff_cap))
+        return target
+
+    async def request(self, method, url, headers=None, body=b""):
+        """Send a request, hedging idempotent ones; returns the winning Response."""
+        window, backoff = self._target(url)
+        stats = self.stats
+        stats.requests += 1
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            wait = backoff.delay()
+            if wait > 0:
+                stats.backoff_seconds += wait
+                await asyncio.sleep(wait)
+            hedgeable = self.hedge and method in IDEMPOTENT_METHODS and not backoff.throttled
+            start = time.monotonic()
+            response = await self._attempt(method, url, headers, body, window.delay if hedgeable else None)
+            if response.status != 429:
+                backoff.reset()
+                window.add(time.monotonic() - start)
+                return response
+            # Throttled before reaching the integration, so any method is safe to resend
+            stats.throttled += 1
+            backoff.start(start, _retry_after(response.headers))
+            if attempt >= self.max_throttle_retries or not self.budget.withdraw():
+                return response
+            attempt += 1
+            stats.retries += 1
+
+    async def _attempt(self, method, url, headers, body, hedge_delay):
+        if hedge_delay is None:
+            return await self.client.request(method, url, headers, body)
+        primary = asyncio.ensure_future(self.client.request(method, url, headers, body))
+        try:
+            done, _ = await asyncio.wait((primary,), timeout=hedge_delay)
+        except BaseException:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+        if not self.budget.withdraw():
+            self.stats.budget_exhausted += 1
+            return await primary
+
+        self.stats.hedges += 1
+        hedge = asyncio.ensure_future(self.client.request(method, url, headers, body))
+        pending = {primary, hedge}
+        throttled = None
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                # A 429 loses to any attempt still in flight; it is the answer only if every attempt got one
+                winners = [task for task in succeeded if task.result().status != 429]
+                if winners:
+                    winner = winners[0]
+                    break
+                if succeeded:
+                    throttled = succeeded[0]
+                if not pending:
+                    if throttled is not None:
+                        return throttled.result()
+                    raise done.pop().exception()
+        finally:
+            # The loser's connection is closed by the cancellation, so the upstream stops too
+            for task in pending:
+                task.cancel()
+                self.stats.cancelled += 1
+        if winner is hedge:
+            self.stats.hedge_wins += 1
+        return winner.result()
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,242 @@
+"""
+Minimal HTTP/1.1 server and keep-alive client on asyncio streams.
+
+Only what the stand-ins need: Content-Length bodies (or read-to-close responses),
+persistent connections and a small idle connection pool per upstream.
+
+A response body is either a bytes-like object or a streamed body: any object with a
+`__len__` and an `async send(writer)` method (see `FileBody` and `relay.RelayBody`).
+"""
+
+import asyncio
+import json
+import os
+import time
+from http import HTTPStatus
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+MAX_HEAD_BYTES = 64 * 1024
+
+# Headers that describe a single connection and must not be relayed by a proxy
+HOP_BY_HOP = frozenset({
+    "connection", "keep-alive", "proxy-connection", "te", "trailer",
+    "transfer-encoding", "upgrade", "content-length", "host",
+})
+
+
+class Request(NamedTuple):
+    method: str
+    target: str
+    path: str
+    query: str
+    headers: dict       # lower-case names
+    body: bytes = b""
+    version: str = "HTTP/1.1"
+
+
+class Response(NamedTuple):
+    status: int
+    headers: dict
+    body: bytes = b""
+
+
+def is_buffered(body):
+    """True if the body is held in memory (as opposed to streamed)."""
+    return isinstance(body, (bytes, bytearray, memoryview))
+
+
+class FileBody:
+    """File contents sent with `loop.sendfile` (os.sendfile where available)."""
+
+    def __init__(self, path, offset=0, count=None):
+        self.path = path
+        self.offset = offset
+        self.count = os.path.getsize(path) - offset if count is None else count
+
+    def __len__(self):
+        return self.count
+
+    async def send(self, writer):
+        # One file object per send: the sendfile fallback path seeks and reads
+        with open(self.path, "rb") as f:
+            await asyncio.get_running_loop().sendfile(writer.transport, f, self.offset, self.count)
+
+
+def json_response(status, payload, headers=None):
+    """Build a JSON response."""
+    body = json.dumps(payload).encode()
+    return Response(status, {"Content-Type": "application/json", **(headers or {})}, body)
+
+
+def _parse_head(head):
+    """Split a request/status line and header block into (first line parts, headers)."""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return lines[0].split(" ", 2), headers
+
+
+async def read_request(reader):
+    """Read one request from the stream, or return None on a clean close."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise ValueError("truncated request head")
+    except asyncio.LimitOverrunError:
+        raise ValueError("request head too large")
+
+    (method, target, version), headers = _parse_head(head)
+    length = int(headers.get("content-length", 0) or 0)
+    body = await reader.readexactly(length) if length else b""
+    path, _, query = target.partition("?")
+    return Request(method, target, path, query, headers, body, version)
+
+
+def encode_head(response, keep_alive=True):
+    """Serialise the status line and headers, always framed with Content-Length."""
+    reason = HTTPStatus(response.status).phrase if response.status in HTTPStatus._value2member_map_ else ""
+    lines = [f"HTTP/1.1 {response.status} {reason}"]
+    lines.extend(f"{k}: {v}" for k, v in response.headers.items() if k.lower() not in ("content-length", "connection"))
+    lines.append(f"Content-Length: {len(response.body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def encode_response(response, keep_alive=True):
+    """Serialise a buffered response into one bytes object."""
+    return encode_head(response, keep_alive) + bytes(response.body)
+
+
+async def write_response(writer, response, keep_alive=True):
+    """Write a response without joining head and body; streamed bodies send themselves."""
+    head = encode_head(response, keep_alive)
+    body = response.body
+    if is_buffered(body):
+        writer.writelines((head, body) if len(body) else (head,))
+        await writer.drain()
+    else:
+        writer.write(head)
+        await body.send(writer)
+
+
+async def serve(handler, host, port, reuse_port=False):
+    """Start a server calling `await handler(request)` for every request on every connection."""
+
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ValueError:
+                    writer.write(encode_response(json_response(400, {"message": "Bad Request"}), False))
+                    break
+                if request is None:
+                    break
+                response = await handler(request)
+                keep_alive = (request.version == "HTTP/1.1"
+                              and request.headers.get("connection", "").lower() != "close")
+                await write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Loop shutdown with the client still connected; nothing left to clean up
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(on_connection, host, port, reuse_port=reuse_port or None,
+                                      limit=MAX_HEAD_BYTES)
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 client with a small idle connection pool per (host, port)."""
+
+    def __init__(self, max_idle_per_host=64, timeout=30.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+
+    async def _connect(self, host, port):
+        pool = self._idle.get((host, port))
+        while pool:
+            reader, writer = pool.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_HEAD_BYTES)
+        return reader, writer, False
+
+    def _release(self, host, port, reader, writer):
+        pool = self._idle.setdefault((host, port), [])
+        if len(pool) < self.max_idle_per_host:
+            pool.append((reader, writer))
+        else:
+            writer.close()
+
+    async def request(self, method, url, headers=None, body=b"", stream=False, trace=None):
+        """Send a request to an absolute http:// URL and return the buffered Response.
+
+        `stream` is accepted for compatibility with `relay.ProxyClient` and ignored; `trace`
+        records the same upstream spans as there.
+        """
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        head = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        head.extend(f"{k}: {v}" for k, v in (headers or {}).items() if k.lower() not in HOP_BY_HOP)
+        head.append(f"Content-Length: {len(body)}")
+        data = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+        for attempt in (0, 1):
+            start = time.time_ns() if trace is not None else 0
+            reader, writer, reused = await self._connect(host, port)
+            if trace is not None:
+                trace.span("upstream_connect", start, upstream=parts.netloc, reused=reused)
+            try:
+                writer.write(data)
+                return await asyncio.wait_for(self._read_response(host, port, reader, writer, trace),
+                                              self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # A pooled connection may have been closed by the server; retry once on a fresh one
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                writer.close()
+                raise
+
+    async def _read_response(self, host, port, reader, writer, trace=None):
+        start = time.time_ns() if trace is not None else 0
+        head = await reader.readuntil(b"\r\n\r\n")
+        (_, status, *_), headers = _parse_head(head)
+        if trace is not None:
+            first_byte = time.time_ns()
+            trace.span("upstream_first_byte", start, first_byte, status=int(status))
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+            keep_alive = headers.get("connection", "").lower() != "close"
+        else:
+            body = await reader.read()
+            keep_alive = False
+        if keep_alive:
+            self._release(host, port, reader, writer)
+        else:
+            writer.close()
+        if trace is not None:
+            trace.span("body_relay", first_byte, bytes=len(body), streamed=False, ok=True)
+        return Response(int(status), headers, body)
+
+    def close(self):
+        """Close every pooled connection."""
+        for pool in self._idle.values():
+            for _, writer in pool:
+                writer.close()
+        self._idle.clear()
@@ -0,0 +1,293 @@
+"""
+Closed-loop HTTP load generator for the local stack (or a deployed endpoint over plain HTTP).
+
+Each connection sends one keep-alive request at a time; connections are spread across
+several processes so the generator can keep up with a multi-worker stack.
+
+With `--metrics-port` the client-side view is served as OpenMetrics while the run is in
+progress. Every generator process writes its counters into its own slice of a shared array
+(one writer per slice, so no locks) and a scrape sums the slices.
+
+With `--hedge` every virtual user sends its GETs through `hedging.HedgedClient`: a slow
+request is hedged after the target's recent p95, 429s back off instead, and the summary
+reports the extra load the hedges and retries added.
+
+    python -m local_gateway.loadgen http://127.0.0.1:8081/hello -c 256 -d 10 -p 4
+    python -m local_gateway.loadgen http://127.0.0.1:8081/hello -c 64 -d 10 --hedge
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from urllib.parse import urlsplit
+
+from .hedging import HedgedClient, RetryBudget
+from .http import HttpClient
+from .metrics import LATENCY_BUCKETS, serve_metrics_thread
+from .stack import run_loop
+
+ERROR_KINDS = ("connect", "io")
+
+
+class LoadMetrics:
+    """Per-process counter slices in shared memory: statuses, errors, latency histogram, sum."""
+
+    STATUSES = 600
+    ERRORS = STATUSES
+    BUCKETS = ERRORS + len(ERROR_KINDS)
+    SUM = BUCKETS + len(LATENCY_BUCKETS) + 1
+    WIDTH = SUM + 1
+
+    def __init__(self, processes, url, context=multiprocessing):
+        self.processes = processes
+        self.url = url
+        self.state = context.RawArray("d", processes * self.WIDTH)
+
+    def writer(self, index):
+        return _MetricsWriter(self.state, index * self.WIDTH)
+
+    def collect(self):
+        """Registry.collect()-shaped families summed over every process slice."""
+        width = self.WIDTH
+        totals = [sum(self.state[i * width + j] for i in range(self.processes)) for j in range(width)]
+        target = (self.url,)
+        return [
+            {"type": "counter", "name": "loadgen_requests", "help": "Responses received, by status",
+             "labels": ("target", "status"),
+             "samples": {(*target, status): int(totals[status]) for status in range(self.STATUSES)
+                         if totals[status]}},
+            {"type": "counter", "name": "loadgen_errors", "help": "Connections that failed, by kind",
+             "labels": ("target", "kind"),
+             "samples": {(*target, kind): int(totals[self.ERRORS + i]) for i, kind in enumerate(ERROR_KINDS)}},
+            {"type": "histogram", "name": "loadgen_request_duration_seconds",
+             "help": "Client-side request latency", "labels": ("target",), "buckets": LATENCY_BUCKETS,
+             "samples": {target: [int(n) for n in totals[self.BUCKETS:self.SUM]] + [totals[self.SUM]]}},
+        ]
+
+
+class _MetricsWriter:
+    __slots__ = ("state", "offset")
+
+    def __init__(self, state, offset):
+        self.state = state
+        self.offset = offset
+
+    def record(self, status, seconds):
+        state, offset = self.state, self.offset
+        state[offset + status] += 1
+        state[offset + LoadMetrics.BUCKETS + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        state[offset + LoadMetrics.SUM] += seconds
+
+    def error(self, kind):
+        self.state[self.offset + LoadMetrics.ERRORS + ERROR_KINDS.index(kind)] += 1
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def encode_request(url, headers):
+    parts = urlsplit(url)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    lines = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc}"]
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"), parts.hostname, parts.port or 80
+
+
+async def _connection(host, port, payload, deadline, latencies, statuses, errors, metrics):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        errors["connect"] += 1
+        if metrics is not None:
+            metrics.error("connect")
+        return
+    clock = time.perf_counter
+    try:
+        while clock() < deadline:
+            start = clock()
+            writer.write(payload)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            lower = head.lower()
+            at = lower.find(b"\r\ncontent-length:")
+            if at >= 0:
+                length = int(lower[at + 17:lower.index(b"\r\n", at + 2)])
+            if length:
+                await reader.readexactly(length)
+            elapsed = clock() - start
+            status = int(head[9:12])
+            latencies.append(elapsed)
+            statuses[status] += 1
+            if metrics is not None:
+                metrics.record(status, elapsed)
+            if b"\r\nconnection: close" in lower:
+                break
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        errors["io"] += 1
+        if metrics is not None:
+            metrics.error("io")
+    finally:
+        writer.close()
+
+
+async def _hedged_user(client, url, headers, deadline, latencies, statuses, errors, metrics):
+    clock = time.perf_counter
+    try:
+        while clock() < deadline:
+            start = clock()
+            response = await client.request("GET", url, headers)
+            elapsed = clock() - start
+            latencies.append(elapsed)
+            statuses[response.status] += 1
+            if metrics is not None:
+                metrics.record(response.status, elapsed)
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+        errors["io"] += 1
+        if metrics is not None:
+            metrics.error("io")
+
+
+def _hedged_client(connections, hedging):
+    options = dict(hedging)
+    budget = RetryBudget(ratio=options.pop("retry_budget", 0.1))
+    # A hedge needs a second connection while the first one is still busy
+    return HedgedClient(HttpClient(max_idle_per_host=2 * connections), budget=budget, **options)
+
+
+async def _run(url, headers, connections, duration, metrics=None, hedging=None):
+    latencies, statuses, errors = array("d"), Counter(), Counter()
+    deadline = time.perf_counter() + duration
+    if hedging is not None:
+        client = _hedged_client(connections, hedging)
+        try:
+            await asyncio.gather(*(_hedged_user(client, url, headers, deadline, latencies, statuses, errors, metrics)
+                                   for _ in range(connections)))
+        finally:
+            client.close()
+        return latencies, statuses, errors, client.stats.as_dict()
+    payload, host, port = encode_request(url, headers)
+    await asyncio.gather(*(_connection(host, port, payload, deadline, latencies, statuses, errors, metrics)
+                           for _ in range(connections)))
+    return latencies, statuses, errors, None
+
+
+def _process_main(url, headers, connections, duration, queue, metrics, hedging):
+    latencies, statuses, errors, hedge_stats = run_loop(_run(url, headers, connections, duration, metrics, hedging))
+    queue.put((latencies.tobytes(), dict(statuses), dict(errors), hedge_stats))
+
+
+def run_load(url, headers=None, connections=64, duration=10.0, processes=1, metrics_port=0, host="127.0.0.1",
+             hedging=None):
+    """Generate load and return a summary dict (latencies in milliseconds).
+
+    With a metrics_port, OpenMetrics for the run are served on it until the run ends.
+    `hedging` is a dict of `HedgedClient` options (plus `retry_budget`, the budget ratio) to
+    send hedged, retry-aware requests instead of plain ones.
+    """
+    headers = headers or {}
+    processes = max(1, min(processes, connections))
+    metrics = metrics_server = None
+    if metrics_port:
+        metrics = LoadMetrics(processes, url)
+        metrics_server = serve_metrics_thread(metrics.collect, host, metrics_port)
+    try:
+        return _run_load(url, headers, connections, duration, processes, metrics, hedging)
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+
+def _run_load(url, headers, connections, duration, processes, metrics, hedging=None):
+    start = time.perf_counter()
+    if processes <= 1:
+        writer = metrics.writer(0) if metrics is not None else None
+        latencies, statuses, errors, hedge_stats = run_loop(_run(url, headers, connections, duration, writer,
+                                                                 hedging))
+    else:
+        queue = multiprocessing.Queue()
+        shares = [connections // processes + (i < connections % processes) for i in range(processes)]
+        workers = [multiprocessing.Process(target=_process_main,
+                                           args=(url, headers, n, duration, queue,
+                                                 metrics.writer(i) if metrics is not None else None, hedging))
+                   for i, n in enumerate(shares)]
+        for worker in workers:
+            worker.start()
+        latencies, statuses, errors = array("d"), Counter(), Counter()
+        hedge_stats = Counter() if hedging is not None else None
+        for _ in workers:
+            raw, worker_statuses, worker_errors, worker_hedge_stats = queue.get()
+            latencies.frombytes(raw)
+            statuses.update(worker_statuses)
+            errors.update(worker_errors)
+            if worker_hedge_stats is not None:
+                hedge_stats.update(worker_hedge_stats)
+        for worker in workers:
+            worker.join()
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, statuses, errors, elapsed, hedge_stats)
+
+
+def summarize(latencies, statuses, errors, elapsed, hedge_stats=None):
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "seconds": elapsed,
+        "rps": len(ordered) / elapsed if elapsed else 0.0,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "errors": dict(errors),
+        "latency_ms": {
+            "p50": 1000 * percentile(ordered, 0.50),
+            "p90": 1000 * percentile(ordered, 0.90),
+            "p99": 1000 * percentile(ordered, 0.99),
+            "p99.9": 1000 * percentile(ordered, 0.999),
+            "max": 1000 * (ordered[-1] if ordered else 0.0),
+        },
+    }
+    if hedge_stats is not None:
+        requests = hedge_stats["requests"]
+        # Upstream attempts beyond one per request, whether or not they were cancelled
+        extra = hedge_stats["hedges"] + hedge_stats["retries"]
+        summary["hedging"] = {**hedge_stats, "extra_load": extra / requests if requests else 0.0}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_gateway.loadgen", description="HTTP load generator")
+    parser.add_argument("url")
+    parser.add_argument("-c", "--connections", type=int, default=64)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds (default: 10)")
+    parser.add_argument("-p", "--processes", type=int, default=1, help="Generator processes (default: 1)")
+    parser.add_argument("-H", "--header", action="append", default=[], metavar="NAME:VALUE")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve OpenMetrics for the run on http://127.0.0.1:PORT/metrics (default: off)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Hedge slow GETs after the recent p95 latency and back off on 429s")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95, help="Latency quantile to hedge at")
+    parser.add_argument("--retry-budget", type=float, default=0.1,
+                        help="Hedges and retries allowed per request, on average (default: 0.1)")
+    parser.add_argument("--max-throttle-retries", type=int, default=2, help="Retries of a 429 after backoff")
+    args = parser.parse_args(argv)
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    hedging = None
+    if args.hedge:
+        hedging = {"quantile": args.hedge_quantile, "retry_budget": args.retry_budget,
+                   "max_throttle_retries": args.max_throttle_retries}
+    summary = run_load(args.url, headers, args.connections, args.duration, args.processes, args.metrics_port,
+                       hedging=hedging)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Build routing manifests for the local stack.
+
+Mirrors the `routing_manifest` output in outputs.tf and the `routing_rules` output of
+`modules/alb_header_routing`, so the local stand-ins and `smoke_test.py` consume exactly the
+same document shape as a deployed stack.
+"""
+
+from .splits import split_rules
+
+# Same routes as `module "alb_routing"` in main.tf
+DEFAULT_HEADER_ROUTES = {
+    "uat1": {"header_name": "x-env", "header_values": ["uat1"], "priority": 100},
+    "uat2": {"header_name": "x-env", "header_values": ["uat2"], "priority": 200},
+}
+DEFAULT_ROUTE_KEY = "uat1"
+
+
+def routing_manifest(header_routes, default_route_key, load_balancer_url, stage_endpoints,
+                     path_priority_offset=1000, path_pattern="/{key}/*", traffic_splits=None):
+    """Return the manifest dict for header_routes (each with a `target_host`) and stage endpoints."""
+    def action(k, v):
+        return {"route_key": k, "target_host": v["target_host"], "path": "/hello", "status_code": 302}
+
+    return {
+        "load_balancer_url": load_balancer_url,
+        "stages": {
+            k: {"api_endpoint": v, "hello_url": f"{v}/hello"} for k, v in stage_endpoints.items()
+        },
+        "listener": {
+            "default": action(default_route_key, header_routes[default_route_key]),
+            "header_rules": [
+                {**action(k, v), "priority": v["priority"], "header_name": v["header_name"],
+                 "header_values": list(v["header_values"])}
+                for k, v in header_routes.items() if k != default_route_key
+            ],
+            "path_rules": [
+                {**action(k, v), "priority": v["priority"] + path_priority_offset,
+                 "path_patterns": [path_pattern.format(key=k)]}
+                for k, v in header_routes.items()
+            ],
+            "split_rules": split_rules(header_routes, traffic_splits or {}, default_route_key),
+        },
+    }
+
+
+def local_manifest(host, alb_port, stage_ports, header_routes=None, default_route_key=DEFAULT_ROUTE_KEY,
+                   path_priority_offset=1000, path_pattern="/{key}/*", traffic_splits=None):
+    """Return a manifest whose targets are the local API Gateway stage listeners.
+
+    Routes to stages without a local listener are sent to port 0 (connection refused).
+    """
+    header_routes = header_routes or DEFAULT_HEADER_ROUTES
+    routes = {k: {**v, "target_host": f"{host}:{stage_ports.get(k, 0)}"} for k, v in header_routes.items()}
+    endpoints = {k: f"http://{host}:{port}" for k, port in stage_ports.items()}
+    return routing_manifest(routes, default_route_key, f"http://{host}:{alb_port}", endpoints,
+                            path_priority_offset, path_pattern, traffic_splits)
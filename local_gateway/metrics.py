@@ -0,0 +1,187 @@
+"""
+OpenMetrics counters and latency histograms for the local stack and the load generator.
+
+Every process keeps its own `Registry`. Families are only touched from that process's event
+loop thread, so recording is a dict lookup and an integer add, with no locks. A scrape
+collects each process's families as plain data (over the worker pipes in multi-process
+mode), sums them and renders the OpenMetrics text format that Prometheus and the
+CloudWatch agent read.
+"""
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .http import Response
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds; request latencies from sub-millisecond local hops up to API Gateway's 30 s timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds; listener rule evaluation is measured in microseconds
+RULE_EVAL_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+
+
+class CounterFamily:
+    """Monotonic counters keyed by label values."""
+
+    __slots__ = ("name", "help", "labels", "values")
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def collect(self):
+        return {"type": "counter", "name": self.name, "help": self.help, "labels": self.labels,
+                "samples": dict(self.values)}
+
+
+class HistogramFamily:
+    """Fixed-bucket histograms keyed by label values; each sample is [bucket counts..., sum]."""
+
+    __slots__ = ("name", "help", "labels", "buckets", "values")
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        sample = self.values.get(label_values)
+        if sample is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            sample = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        sample[bisect_left(self.buckets, value)] += 1
+        sample[-1] += value
+
+    def collect(self):
+        return {"type": "histogram", "name": self.name, "help": self.help, "labels": self.labels,
+                "buckets": self.buckets, "samples": {k: list(v) for k, v in self.values.items()}}
+
+
+class Registry:
+    """The metric families of one process."""
+
+    def __init__(self):
+        self.families = {}
+
+    def _register(self, family):
+        if family.name in self.families:
+            raise ValueError(f"metric '{family.name}' is already registered")
+        self.families[family.name] = family
+        return family
+
+    def counter(self, name, help, labels=()):
+        return self._register(CounterFamily(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(HistogramFamily(name, help, labels, buckets))
+
+    def collect(self):
+        """Plain (picklable) copy of every family."""
+        return [family.collect() for family in self.families.values()]
+
+
+def merge(collections):
+    """Sum Registry.collect() results from several processes, family by family."""
+    merged = {}
+    for collection in collections:
+        for family in collection:
+            into = merged.get(family["name"])
+            if into is None:
+                merged[family["name"]] = {**family, "samples": {k: (list(v) if isinstance(v, list) else v)
+                                                               for k, v in family["samples"].items()}}
+                continue
+            samples = into["samples"]
+            for key, value in family["samples"].items():
+                if key not in samples:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                else:
+                    samples[key] += value
+    return list(merged.values())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return "+Inf" if value == float("inf") else repr(value)
+    return str(value)
+
+
+def render(collection):
+    """OpenMetrics text exposition of a (merged) collection."""
+    lines = []
+    for family in sorted(collection, key=lambda f: f["name"]):
+        name, names = family["name"], family["labels"]
+        lines.append(f"# TYPE {name} {family['type']}")
+        lines.append(f"# HELP {name} {family['help']}")
+        for key, value in sorted(family["samples"].items()):
+            if family["type"] == "counter":
+                lines.append(f"{name}_total{_labels(names, key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*family["buckets"], float("inf")), value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, key, [('le', _number(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(value[-1])}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_handler(collect):
+    """Request handler for `http.serve` answering GET /metrics with render(collect())."""
+
+    async def handle(request):
+        if request.path != METRICS_PATH:
+            return Response(404, {"Content-Type": "text/plain"}, b"Not Found\n")
+        return Response(200, {"Content-Type": CONTENT_TYPE}, render(collect()).encode())
+
+    return handle
+
+
+def serve_metrics_thread(collect, host, port):
+    """Serve /metrics from a daemon thread, for supervisors that aggregate over pipes.
+
+    `collect` is called on the server thread and must be thread-safe.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != METRICS_PATH:
+                self.send_error(404)
+                return
+            body = render(collect()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,287 @@
+"""
+Copy-avoiding body relay for the HTTP_PROXY path.
+
+The naive path reads a whole upstream body into a new `bytes`, joins it onto the response
+head and hands the result to the transport, which is at least three copies of every
+payload. Here upstream connections are raw non-blocking sockets read with `recv_into`
+into preallocated, pooled buffers, and large bodies are streamed to the client either:
+
+- with `os.splice` (Linux): upstream socket -> pipe -> client socket, never entering Python, or
+- with `memoryview` slices of a pooled buffer written straight to the client transport.
+
+Small bodies are received directly into one exactly-sized `bytearray`.
+"""
+
+import asyncio
+import os
+import socket
+import time
+from urllib.parse import urlsplit
+
+from .http import HOP_BY_HOP, MAX_HEAD_BYTES, Response, _parse_head
+
+HAS_SPLICE = hasattr(os, "splice")
+CHUNK_SIZE = 256 * 1024
+
+
+class BufferPool:
+    """Free list of equally sized bytearrays, reused across requests."""
+
+    def __init__(self, size=CHUNK_SIZE, max_free=64):
+        self.size = size
+        self.max_free = max_free
+        self.allocated = 0
+        self._free = []
+
+    def acquire(self):
+        if self._free:
+            return self._free.pop()
+        self.allocated += 1
+        return bytearray(self.size)
+
+    def release(self, buffer):
+        if len(self._free) < self.max_free:
+            self._free.append(buffer)
+
+
+async def _wait_readable(loop, fd):
+    """Wait until a raw (transport-less) fd is readable."""
+    future = loop.create_future()
+    loop.add_reader(fd, lambda: future.done() or future.set_result(None))
+    try:
+        await future
+    finally:
+        loop.remove_reader(fd)
+
+
+class _Connection:
+    __slots__ = ("sock", "host", "port")
+
+    def __init__(self, sock, host, port):
+        self.sock = sock
+        self.host = host
+        self.port = port
+
+
+class RelayBody:
+    """Response body still sitting in an upstream socket; sent with `await body.send(writer)`."""
+
+    def __init__(self, client, conn, prefix, length, buffer, keep_alive, trace=None):
+        self.client = client
+        self.conn = conn
+        self.prefix = prefix            # body bytes that arrived together with the head
+        self.length = length
+        self.buffer = buffer
+        self.keep_alive = keep_alive
+        self.trace = trace
+        self.on_sent = None             # set by tracing.finish_hop to close the hop after the relay
+        self._sent = False
+
+    def __len__(self):
+        return self.length
+
+    async def send(self, writer):
+        if self._sent:
+            raise RuntimeError("relay body can only be sent once")
+        self._sent = True
+        start = time.time_ns()
+        transport = writer.transport
+        limits = transport.get_write_buffer_limits()
+        # With a zero high-water mark drain() only returns once the transport has flushed
+        # everything, so no queued write can still reference the pooled buffer we reuse.
+        transport.set_write_buffer_limits(high=0, low=0)
+        ok = False
+        try:
+            if len(self.prefix):
+                writer.write(self.prefix)
+                await writer.drain()
+            remaining = self.length - len(self.prefix)
+            if remaining:
+                dst = transport.get_extra_info("socket")
+                if self.client.use_splice and HAS_SPLICE and dst is not None:
+                    await self._splice(writer, dst.fileno(), remaining)
+                else:
+                    await self._copy(writer, remaining)
+            ok = True
+        finally:
+            transport.set_write_buffer_limits(high=limits[1], low=limits[0])
+            self.client._finish(self.conn, self.buffer, ok and self.keep_alive)
+            if self.trace is not None:
+                self.trace.span("body_relay", start, bytes=self.length, streamed=True, ok=ok)
+            if self.on_sent is not None:
+                self.on_sent()
+
+    async def _copy(self, writer, remaining):
+        loop = asyncio.get_running_loop()
+        view = memoryview(self.buffer)
+        sock = self.conn.sock
+        while remaining:
+            n = await loop.sock_recv_into(sock, view[:min(remaining, len(view))])
+            if not n:
+                raise ConnectionError("upstream closed mid-body")
+            writer.write(view[:n])
+            await writer.drain()
+            remaining -= n
+            self.client.relayed_bytes += n
+
+    async def _splice(self, writer, dst_fd, remaining):
+        loop = asyncio.get_running_loop()
+        src_fd = self.conn.sock.fileno()
+        view = memoryview(self.buffer)
+        flags = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK
+        pipe_r, pipe_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        try:
+            while remaining:
+                try:
+                    n = os.splice(src_fd, pipe_w, min(remaining, CHUNK_SIZE), flags=flags)
+                except BlockingIOError:
+                    await _wait_readable(loop, src_fd)
+                    continue
+                if not n:
+                    raise ConnectionError("upstream closed mid-body")
+                remaining -= n
+                self.client.relayed_bytes += n
+                while n:
+                    if writer.transport.get_write_buffer_size() == 0:
+                        try:
+                            n -= os.splice(pipe_r, dst_fd, n, flags=flags)
+                            continue
+                        except BlockingIOError:
+                            pass
+                    # Client socket is full: move what is in the pipe through the transport,
+                    # which waits for writability for us.
+                    got = os.readv(pipe_r, [view[:n]])
+                    writer.write(view[:got])
+                    await writer.drain()
+                    n -= got
+        finally:
+            os.close(pipe_r)
+            os.close(pipe_w)
+
+
+class ProxyClient:
+    """HTTP/1.1 upstream client on raw sockets with pooled connections and receive buffers.
+
+    `request()` has the same shape as `HttpClient.request()`; with `stream=True` bodies larger
+    than `stream_threshold` come back as a `RelayBody` instead of being buffered.
+    """
+
+    def __init__(self, max_idle_per_host=64, timeout=30.0, stream_threshold=64 * 1024,
+                 use_splice=True, buffers=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.stream_threshold = stream_threshold
+        self.use_splice = use_splice
+        self.buffers = buffers or BufferPool()
+        self.relayed_bytes = 0
+        self._idle = {}
+
+    async def _connect(self, host, port):
+        pool = self._idle.get((host, port))
+        if pool:
+            return pool.pop(), True
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            await loop.sock_connect(sock, (host, port))
+        except BaseException:
+            sock.close()
+            raise
+        return _Connection(sock, host, port), False
+
+    def _finish(self, conn, buffer, reusable):
+        self.buffers.release(buffer)
+        pool = self._idle.setdefault((conn.host, conn.port), [])
+        if reusable and len(pool) < self.max_idle_per_host:
+            pool.append(conn)
+        else:
+            conn.sock.close()
+
+    async def request(self, method, url, headers=None, body=b"", stream=True, trace=None):
+        """Send a request to an absolute http:// URL and return the Response.
+
+        With a `trace` context, connect, time-to-first-byte and body relay spans are recorded on it.
+        """
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        head = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        head.extend(f"{k}: {v}" for k, v in (headers or {}).items() if k.lower() not in HOP_BY_HOP)
+        head.append(f"Content-Length: {len(body)}")
+        head = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1")
+
+        loop = asyncio.get_running_loop()
+        for attempt in (0, 1):
+            start = time.time_ns() if trace is not None else 0
+            conn, reused = await self._connect(host, port)
+            if trace is not None:
+                trace.span("upstream_connect", start, upstream=parts.netloc, reused=reused)
+            buffer = self.buffers.acquire()
+            try:
+                await loop.sock_sendall(conn.sock, head)
+                if body:
+                    await loop.sock_sendall(conn.sock, body)
+                return await asyncio.wait_for(self._read_response(conn, buffer, stream, trace), self.timeout)
+            except (ConnectionError, EOFError):
+                self._finish(conn, buffer, False)
+                # A pooled connection may have been closed by the server; retry once on a fresh one
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                self._finish(conn, buffer, False)
+                raise
+
+    async def _read_response(self, conn, buffer, stream, trace=None):
+        loop = asyncio.get_running_loop()
+        start = time.time_ns() if trace is not None else 0
+        view = memoryview(buffer)
+        filled = 0
+        while True:
+            n = await loop.sock_recv_into(conn.sock, view[filled:])
+            if not n:
+                raise EOFError("upstream closed before response head")
+            filled += n
+            end = buffer.find(b"\r\n\r\n", 0, filled)
+            if end >= 0:
+                break
+            if filled >= min(len(buffer), MAX_HEAD_BYTES):
+                raise ConnectionError("upstream response head too large")
+
+        end += 4
+        (_, status, *_), headers = _parse_head(bytes(view[:end]))
+        if "content-length" not in headers:
+            raise ConnectionError("upstream response without Content-Length")
+        length = int(headers["content-length"])
+        keep_alive = headers.get("connection", "").lower() != "close"
+        prefix = view[end:min(filled, end + length)]
+        if trace is not None:
+            first_byte = time.time_ns()
+            trace.span("upstream_first_byte", start, first_byte, status=int(status))
+
+        if stream and length > self.stream_threshold:
+            relay = RelayBody(self, conn, prefix, length, buffer, keep_alive, trace)
+            return Response(int(status), headers, relay)
+
+        # Buffered: receive straight into one exactly sized bytearray
+        body = bytearray(length)
+        body[:len(prefix)] = prefix
+        got = len(prefix)
+        target = memoryview(body)
+        while got < length:
+            n = await loop.sock_recv_into(conn.sock, target[got:])
+            if not n:
+                raise EOFError("upstream closed mid-body")
+            got += n
+        self._finish(conn, buffer, keep_alive)
+        if trace is not None:
+            trace.span("body_relay", first_byte, bytes=length, streamed=False, ok=True)
+        return Response(int(status), headers, body)
+
+    def close(self):
+        """Close every pooled connection."""
+        for pool in self._idle.values():
+            for conn in pool:
+                conn.sock.close()
+        self._idle.clear()
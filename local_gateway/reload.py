@@ -0,0 +1,113 @@
+"""
+Hot reload of the ALB stand-in's listener rules from the Terraform files.
+
+A background thread polls main.tf and the routing module for changes, re-reads
+`header_routes` and recompiles a new immutable `RuleTable`. The table is then swapped into
+the ALB on the event loop thread with a single attribute assignment, so the request path
+reads `alb.table` once per request and never takes a lock, and open connections are never
+touched. A broken edit keeps the previous table live and is reported in the stats.
+"""
+
+import os
+import threading
+import time
+
+from .manifest import local_manifest
+from .rules import RuleTable
+from .tfconfig import load_routing_config, watched_files
+
+
+class ReloadStats:
+    __slots__ = ("reloads", "failures", "last_error", "compile_ms", "change_to_live_ms", "version")
+
+    def __init__(self):
+        self.reloads = self.failures = self.version = 0
+        self.last_error = None
+        self.compile_ms = self.change_to_live_ms = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def compile_table(root, host, alb_port, stage_ports):
+    """Read the Terraform routing config and compile it into a RuleTable."""
+    config = load_routing_config(root)
+    manifest = local_manifest(host, alb_port, stage_ports, **config)
+    return RuleTable.from_manifest(manifest), config
+
+
+class RuleReloader:
+    """Watches the Terraform files and swaps recompiled rule tables into an Alb."""
+
+    def __init__(self, alb, root, host, stage_ports, interval=0.5, log=print):
+        self.alb = alb
+        self.root = root
+        self.host = host
+        self.stage_ports = dict(stage_ports)
+        self.interval = interval
+        self.log = log
+        self.stats = ReloadStats()
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._mtimes = self._read_mtimes()
+
+    def _read_mtimes(self):
+        mtimes = {}
+        for path in watched_files(self.root):
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                mtimes[path] = None
+        return mtimes
+
+    def start(self, loop):
+        self._loop = loop
+        self._thread = threading.Thread(target=self._run, name="rule-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2 + 1)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            mtimes = self._read_mtimes()
+            if mtimes != self._mtimes:
+                self._mtimes = mtimes
+                # None when every watched file is gone (the reload then fails and is reported)
+                changed_ns = max((t for t in mtimes.values() if t is not None), default=None)
+                self.reload(changed_ns)
+
+    def reload(self, changed_ns=None):
+        """Recompile now (on the calling thread) and schedule the swap on the event loop."""
+        start = time.perf_counter()
+        try:
+            table, config = compile_table(self.root, self.host, self.alb.port, self.stage_ports)
+        except Exception as e:
+            # Any error, not only ConfigError/OSError, must not kill the watcher thread
+            self.stats.failures += 1
+            self.stats.last_error = str(e)
+            self.log(f"Rule reload failed, keeping the current rules: {e}")
+            return
+        self.stats.compile_ms = 1000 * (time.perf_counter() - start)
+
+        missing = sorted(set(config["header_routes"]) - set(self.stage_ports))
+        if missing:
+            self.log(f"Stages without a local listener (restart to add them): {', '.join(missing)}")
+
+        def swap():
+            self.alb.table = table
+            self.stats.reloads += 1
+            self.stats.version += 1
+            self.stats.last_error = None
+            if changed_ns is not None:
+                self.stats.change_to_live_ms = (time.time_ns() - changed_ns) / 1e6
+            self.log(f"Rules reloaded (v{self.stats.version}): {len(table.rules)} rules, "
+                     f"compile {self.stats.compile_ms:.2f} ms, change to live {self.stats.change_to_live_ms:.1f} ms")
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(swap)
+        else:
+            swap()
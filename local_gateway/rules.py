@@ -0,0 +1,158 @@
+"""
+ALB listener rule evaluation for the routing manifest.
+
+Rules are evaluated the way the ALB does it: lowest priority number first, header names
+matched case-insensitively, header values case-insensitively with `*`/`?` wildcards and
+path patterns case-sensitively with `*`/`?` wildcards. The first matching rule wins and the
+listener's default action applies when nothing matches.
+
+Split rules (`traffic_splits`) add a second header condition on the client id; the default
+route's split rules have only that one.
+"""
+
+import json
+import re
+from typing import NamedTuple, Optional, Pattern, Tuple
+
+
+def _wildcard_regex(patterns, ignore_case=False):
+    """Compile ALB wildcard patterns (`*` and `?`) into one anchored alternation regex."""
+    bodies = (
+        "".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern)
+        for pattern in patterns
+    )
+    flags = re.DOTALL | (re.IGNORECASE if ignore_case else 0)
+    return re.compile("^(?:" + "|".join(bodies) + ")$", flags)
+
+
+class Rule(NamedTuple):
+    """One compiled listener rule (or the default action)."""
+
+    kind: str                       # "header", "path", "split" or "default"
+    route_key: str                  # stage the rule sends traffic to
+    priority: int
+    target_host: str
+    path: str = "/hello"
+    status_code: int = 302
+    header_name: Optional[str] = None
+    values: Tuple[str, ...] = ()    # raw header values or path patterns
+    matcher: Optional[Pattern] = None
+    client_id_header: Optional[str] = None
+    client_id_values: Tuple[str, ...] = ()    # client id suffix patterns of a split rule
+    client_id_matcher: Optional[Pattern] = None
+
+    def matches(self, path, headers):
+        """Return True if the request path/headers satisfy this rule's conditions."""
+        if self.kind == "header":
+            value = headers.get(self.header_name)
+            return value is not None and self.matcher.match(value) is not None
+        if self.kind == "split":
+            client_id = headers.get(self.client_id_header)
+            if client_id is None or self.client_id_matcher.match(client_id) is None:
+                return False
+            if self.header_name is None:
+                return True
+            value = headers.get(self.header_name)
+            return value is not None and self.matcher.match(value) is not None
+        if self.kind == "path":
+            return self.matcher.match(path) is not None
+        return True
+
+
+class RuleTable:
+    """Immutable, priority-ordered set of listener rules."""
+
+    __slots__ = ("rules", "default")
+
+    def __init__(self, rules, default):
+        self.rules: Tuple[Rule, ...] = tuple(sorted(rules, key=lambda r: r.priority))
+        self.default: Rule = default
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        """Build a table from the `listener` section of a routing manifest (dict or JSON string)."""
+        if isinstance(manifest, str):
+            manifest = json.loads(manifest)
+        listener = manifest.get("listener", manifest)
+
+        rules = []
+        for rule in listener.get("header_rules", []):
+            rules.append(Rule(
+                kind="header",
+                route_key=rule["route_key"],
+                priority=int(rule["priority"]),
+                target_host=rule["target_host"],
+                path=rule.get("path", "/hello"),
+                status_code=int(rule.get("status_code", 302)),
+                header_name=rule["header_name"].lower(),
+                values=tuple(rule["header_values"]),
+                matcher=_wildcard_regex(rule["header_values"], ignore_case=True),
+            ))
+        for rule in listener.get("path_rules", []):
+            rules.append(Rule(
+                kind="path",
+                route_key=rule["route_key"],
+                priority=int(rule["priority"]),
+                target_host=rule["target_host"],
+                path=rule.get("path", "/hello"),
+                status_code=int(rule.get("status_code", 302)),
+                values=tuple(rule["path_patterns"]),
+                matcher=_wildcard_regex(rule["path_patterns"]),
+            ))
+        for rule in listener.get("split_rules", []):
+            header_name = rule.get("header_name")
+            rules.append(Rule(
+                kind="split",
+                route_key=rule["route_key"],
+                priority=int(rule["priority"]),
+                target_host=rule["target_host"],
+                path=rule.get("path", "/hello"),
+                status_code=int(rule.get("status_code", 302)),
+                header_name=header_name.lower() if header_name else None,
+                values=tuple(rule.get("header_values") or ()),
+                matcher=_wildcard_regex(rule["header_values"], ignore_case=True) if header_name else None,
+                client_id_header=rule["client_id_header"].lower(),
+                client_id_values=tuple(rule["client_id_suffixes"]),
+                client_id_matcher=_wildcard_regex(rule["client_id_suffixes"], ignore_case=True),
+            ))
+
+        default = listener["default"]
+        return cls(rules, Rule(
+            kind="default",
+            route_key=default["route_key"],
+            priority=2 ** 31,
+            target_host=default["target_host"],
+            path=default.get("path", "/hello"),
+            status_code=int(default.get("status_code", 302)),
+        ))
+
+    def match(self, path, headers=None):
+        """Return the first rule matching the request; `headers` must have lower-case names."""
+        headers = headers or {}
+        for rule in self.rules:
+            if rule.matches(path, headers):
+                return rule
+        return self.default
+
+    def header_values(self):
+        """Return {header name: set of values} referenced by the header rules."""
+        values = {}
+        for rule in self.rules:
+            if rule.kind == "header":
+                values.setdefault(rule.header_name, set()).update(rule.values)
+        return values
+
+    def client_id_suffixes(self):
+        """Return {client id header: set of suffix patterns} referenced by the split rules."""
+        suffixes = {}
+        for rule in self.rules:
+            if rule.kind == "split":
+                suffixes.setdefault(rule.client_id_header, set()).update(rule.client_id_values)
+        return suffixes
+
+    def stages(self):
+        """Return {route key: target host} for every stage the table can route to."""
+        stages = {self.default.route_key: self.default.target_host}
+        for rule in self.rules:
+            stages.setdefault(rule.route_key, rule.target_host)
+        return stages
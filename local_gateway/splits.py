@@ -0,0 +1,260 @@
+"""
+Weighted, sticky traffic splits between stages, and a simulator for them.
+
+`traffic_splits` in `modules/alb_header_routing` buckets a route's requests on the last hex
+digit of a client id header. The 16 buckets are handed out to the weighted route keys in
+cumulative order (keys sorted), with one redirect rule per chunk of buckets sent elsewhere.
+`bucket_targets` and `split_rules` reproduce that allocation exactly, so the local ALB
+stand-in routes like the deployed listener.
+
+The simulator places client ids on a consistent-hash ring and reports two things: how
+closely the ids follow the weights, and what fraction of ids change stage when the weights
+change (remap churn). Two rings are available: the 16-slot ring the listener rules
+implement, and for comparison a classic ring with virtual nodes per unit of weight. Every id,
+random or read from a file, goes through the ring's `slot`, at roughly 1-2M ids per second.
+
+The 16-slot ring is only even when the last hex digit of the ids is uniformly distributed,
+as for UUIDs. Decimal ids never end in a-f, so 10 buckets take all the traffic and the
+stages owning them get about 60% more than their weight (`--id-format numeric` shows it):
+
+    python -m local_gateway.splits --weights uat2=16 --to uat2=12,uat1=4 --keys 5000000
+    python -m local_gateway.splits --weights uat2=12,uat1=4 --to uat2=8,uat1=8 --ring vnodes
+    python -m local_gateway.splits --weights uat2=12,uat1=4 --keys-file client_ids.txt
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import zlib
+from array import array
+from collections import Counter
+from hashlib import blake2b
+
+SUFFIXES = "0123456789abcdef"
+BUCKETS = len(SUFFIXES)
+RING_SLOTS = 1 << 16
+RULE_CONDITION_VALUES = 5  # ALB limit on condition values per listener rule
+DEFAULT_SPLIT_PRIORITY = 50000
+
+def bucket_targets(weights):
+    """Route key of each client id bucket, assigned like the Terraform module does."""
+    keys = sorted(weights)
+    total = sum(weights.values())
+    bounds, running = [], 0.0
+    for key in keys:
+        running += weights[key]
+        bounds.append(math.floor(BUCKETS * running / total))
+    return [keys[sum(1 for bound in bounds if bound <= i)] for i in range(BUCKETS)]
+
+
+def split_rules(header_routes, traffic_splits, default_route_key):
+    """Manifest `split_rules` for traffic_splits; header_routes entries carry `target_host`."""
+    rules = []
+    for route, split in sorted(traffic_splits.items()):
+        is_default = route == default_route_key
+        header = None if is_default else header_routes[route]
+        size = max(1, RULE_CONDITION_VALUES - (0 if is_default else len(header["header_values"])))
+        base = (DEFAULT_SPLIT_PRIORITY if is_default else header["priority"]) - BUCKETS
+        targets = bucket_targets(split["weights"])
+        for target in sorted(set(targets) - {route}):
+            buckets = [i for i, key in enumerate(targets) if key == target]
+            for n in range(0, len(buckets), size):
+                chunk = buckets[n:n + size]
+                rules.append({
+                    "route_key": target,
+                    "split_of": route,
+                    "priority": base + chunk[0],
+                    "header_name": None if is_default else header["header_name"],
+                    "header_values": [] if is_default else list(header["header_values"]),
+                    "client_id_header": split["client_id_header"],
+                    "client_id_suffixes": [f"*{SUFFIXES[i]}" for i in chunk],
+                    "target_host": header_routes[target]["target_host"],
+                    "path": "/hello",
+                    "status_code": 302,
+                })
+    return rules
+
+
+class SuffixRing:
+    """The listener rules' ring: 16 slots, a key's slot is the last hex digit of its client id."""
+
+    name = "suffix"
+    slots = BUCKETS
+
+    def __init__(self, weights):
+        self.weights = dict(weights)
+        self.table = bucket_targets(weights)
+
+    @staticmethod
+    def slot(key):
+        """Slot of a client id, or -1 when it does not end in a hex digit (the route keeps it)."""
+        return SUFFIXES.find(key[-1:].lower()) if key else -1
+
+
+class VnodeRing:
+    """Classic consistent-hash ring with `vnodes` points per unit of weight on 16-bit positions."""
+
+    name = "vnodes"
+    slots = RING_SLOTS
+
+    def __init__(self, weights, vnodes=64):
+        self.weights = dict(weights)
+        # A key's points do not depend on its weight, so raising a weight only adds points. crc32
+        # is linear, so near-identical point names would cluster; blake2b spreads them evenly.
+        points = sorted((int.from_bytes(blake2b(f"{key}#{i}".encode(), digest_size=2).digest(), "big"), key)
+                        for key, weight in weights.items() for i in range(round(weight * vnodes)))
+        if not points:
+            raise ValueError("every weight is zero")
+        # Each slot belongs to the first point at or after it, wrapping round
+        table, j = [], 0
+        for slot in range(RING_SLOTS):
+            while j < len(points) and points[j][0] < slot:
+                j += 1
+            table.append(points[j % len(points)][1])
+        self.table = table
+
+    @staticmethod
+    def slot(key):
+        return zlib.crc32(key.encode()) >> 16
+
+
+def random_client_ids(n, id_format="uuid"):
+    """`n` random client ids: 32 hex digit UUIDs, or decimal account numbers."""
+    if id_format == "numeric":
+        return [str(i) for i in array("Q", os.urandom(8 * n))]
+    text = os.urandom(16 * n).hex()
+    return [text[i:i + 32] for i in range(0, 32 * n, 32)]
+
+
+def random_slot_counts(ring, keys, id_format="uuid", chunk=1 << 18):
+    """(keys per slot, keys without a slot) for `keys` random client ids placed by `ring.slot`."""
+    counts = [0] * ring.slots
+    unslotted = done = 0
+    while done < keys:
+        n = min(chunk, keys - done)
+        for slot, count in Counter(map(ring.slot, random_client_ids(n, id_format))).items():
+            if slot < 0:
+                unslotted += count
+            else:
+                counts[slot] += count
+        done += n
+    return counts, unslotted
+
+
+def file_slot_counts(ring, path):
+    """(keys per slot, keys without a slot) for the client ids in a file, one per line."""
+    counts = [0] * ring.slots
+    unslotted = 0
+    slot = ring.slot
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            key = line.strip()
+            if key:
+                s = slot(key)
+                if s < 0:
+                    unslotted += 1
+                else:
+                    counts[s] += 1
+    return counts, unslotted
+
+
+def _loads(ring, counts):
+    loads = dict.fromkeys(ring.weights, 0)
+    for slot, count in enumerate(counts):
+        if count:
+            loads[ring.table[slot]] += count
+    return loads
+
+
+def evaluate(before, after, counts):
+    """Balance of both weightings and the churn between them for keys counted per slot."""
+    total = sum(counts) or 1
+    result = {"keys": sum(counts), "balance": {}}
+    for label, ring in (("before", before), ("after", after)):
+        weight_total = sum(ring.weights.values())
+        loads = _loads(ring, counts)
+        result["balance"][label] = {
+            key: {
+                "weight_share": ring.weights[key] / weight_total,
+                "key_share": loads[key] / total,
+                "error": loads[key] / total / (ring.weights[key] / weight_total) - 1 if ring.weights[key] else 0.0,
+            }
+            for key in sorted(ring.weights)
+        }
+    moved = sum(count for slot, count in enumerate(counts) if before.table[slot] != after.table[slot])
+    keys = set(before.weights) | set(after.weights)
+    share = {label: {k: v["weight_share"] for k, v in result["balance"][label].items()}
+             for label in ("before", "after")}
+    result["churn"] = moved / total
+    # No scheme can move fewer keys than the weight that changed hands
+    result["minimum_churn"] = sum(abs(share["after"].get(k, 0.0) - share["before"].get(k, 0.0)) for k in keys) / 2
+    return result
+
+
+def parse_weights(text):
+    """'uat2=12,uat1=4' -> {'uat2': 12.0, 'uat1': 4.0}"""
+    weights = {}
+    for part in text.split(","):
+        key, _, value = part.partition("=")
+        weights[key.strip()] = float(value)
+    return weights
+
+
+def format_report(result):
+    lines = [f"{result['ring']} ring, {result['keys']:,} keys counted in {result['seconds']:.2f} s "
+             f"({result['keys_per_second'] / 1e6:.1f}M keys/s)"]
+    if result.get("unslotted"):
+        lines.append(f"{result['unslotted']:,} client ids do not end in a hex digit and stay on the route's own stage")
+    lines.append(f"{'stage':<10} {'weight':>8} {'keys':>8} {'error':>8}   {'weight':>8} {'keys':>8} {'error':>8}")
+    before, after = result["balance"]["before"], result["balance"]["after"]
+    empty = {"weight_share": 0.0, "key_share": 0.0, "error": 0.0}
+    for key in sorted(set(before) | set(after)):
+        b, a = before.get(key, empty), after.get(key, empty)
+        lines.append(f"{key:<10} {b['weight_share']:>8.2%} {b['key_share']:>8.2%} {b['error']:>+8.2%}   "
+                     f"{a['weight_share']:>8.2%} {a['key_share']:>8.2%} {a['error']:>+8.2%}")
+    lines.append(f"Remapped keys: {result['churn']:.2%} (the weight change alone needs {result['minimum_churn']:.2%})")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_gateway.splits",
+                                     description="Simulate weighted, sticky stage splits on a consistent-hash ring")
+    parser.add_argument("--weights", required=True, type=parse_weights, help="Current weights, e.g. uat2=16")
+    parser.add_argument("--to", type=parse_weights, help="New weights, e.g. uat2=12,uat1=4 (default: unchanged)")
+    parser.add_argument("--ring", choices=("suffix", "vnodes"), default="suffix",
+                        help="suffix: the 16 listener rule buckets (default); vnodes: classic ring for comparison")
+    parser.add_argument("--vnodes", type=int, default=64, help="Ring points per unit of weight (default: 64)")
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Random client ids to place (default: 1M)")
+    parser.add_argument("--id-format", choices=("uuid", "numeric"), default="uuid",
+                        help="Random ids as UUID hex (default) or decimal numbers, which only end in 0-9")
+    parser.add_argument("--keys-file", help="Place the client ids in this file (one per line) instead")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args(argv)
+
+    def ring(weights):
+        return SuffixRing(weights) if args.ring == "suffix" else VnodeRing(weights, args.vnodes)
+
+    try:
+        before, after = ring(args.weights), ring(args.to or args.weights)
+    except (ValueError, ZeroDivisionError) as e:
+        print(f"Invalid weights: {e}", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    unslotted = 0
+    if args.keys_file:
+        counts, unslotted = file_slot_counts(before, args.keys_file)
+    else:
+        counts, unslotted = random_slot_counts(before, args.keys, args.id_format)
+    seconds = time.perf_counter() - start
+
+    result = {"ring": args.ring, **evaluate(before, after, counts), "unslotted": unslotted, "seconds": seconds}
+    result["keys_per_second"] = (result["keys"] + unslotted) / seconds if seconds else 0.0
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
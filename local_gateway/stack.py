@@ -0,0 +1,134 @@
+"""
+Assembly of the local stack: ALB stand-in -> API Gateway stage stand-ins -> httpbin stand-in.
+"""
+
+import asyncio
+import json
+import os
+
+from .alb import Alb
+from .apigw import ApiGateway, StageConfig
+from .backend import Backend, make_payload_file
+from .cache import ResponseCache
+from .http import HttpClient, serve
+from .manifest import DEFAULT_HEADER_ROUTES, DEFAULT_ROUTE_KEY, local_manifest
+from .metrics import Registry, metrics_handler
+from .relay import ProxyClient
+from .reload import RuleReloader
+from .rules import RuleTable
+from .tfconfig import ConfigError, load_routing_config
+from .tracing import Tracer, write_traces
+
+
+class LocalStack:
+    """Builds every component from parsed command line options and starts their listeners."""
+
+    def __init__(self, options, buckets=None):
+        self.options = options
+        self.routing = self._routing_config(options.terraform_dir)
+        self.stage_ports = {name: options.stage_base_port + i
+                            for i, name in enumerate(self.routing["header_routes"])}
+        self.manifest = local_manifest(options.host, options.alb_port, self.stage_ports, **self.routing)
+        self.client = HttpClient()
+        # The HTTP_PROXY integration relays bodies through pooled buffers / splice
+        self.proxy_client = self.client if options.naive_proxy else ProxyClient(use_splice=not options.no_splice)
+
+        self.cache = None
+        if options.cache_ttl > 0:
+            self.cache = ResponseCache(ttl=options.cache_ttl, max_entries=options.cache_entries,
+                                       max_bytes=options.cache_bytes,
+                                       key_headers=["x-env", *options.cache_key_header],
+                                       key_query=options.cache_key_query)
+
+        # One tracer per process, shared by every hop so a request's spans end up together
+        self.tracer = Tracer(sample_rate=options.trace_sample) if options.trace_out else None
+        self.metrics = Registry()
+
+        self.integration_uri = f"http://{options.host}:{options.backend_port}/anything"
+        self.stages = [StageConfig(name, port, self.integration_uri, options.rate_limit, options.burst_limit)
+                       for name, port in self.stage_ports.items()]
+        self.payload_path = make_payload_file(options.payload_bytes) if options.payload_bytes else None
+        self.backend = Backend(options.latency_ms / 1000, options.jitter_ms / 1000,
+                               payload_path=self.payload_path, tracer=self.tracer, metrics=self.metrics,
+                               tail_latency=options.tail_ms / 1000, tail_fraction=options.tail_fraction)
+        self.apigw = ApiGateway(self.stages, self.proxy_client, cache=self.cache,
+                                throttle=not options.no_throttle, buckets=buckets, tracer=self.tracer,
+                                metrics=self.metrics)
+        self.alb = Alb(RuleTable.from_manifest(self.manifest), options.alb_port,
+                       mode=options.alb_mode, client=self.proxy_client, tracer=self.tracer,
+                       metrics=self.metrics)
+        self.servers = []
+
+    @staticmethod
+    def _routing_config(terraform_dir):
+        """Routes from the Terraform files, or the built-in copy of them when unreadable."""
+        if terraform_dir:
+            try:
+                return load_routing_config(terraform_dir)
+            except (ConfigError, OSError) as e:
+                print(f"Using built-in routes, could not read Terraform config: {e}")
+        return {"header_routes": DEFAULT_HEADER_ROUTES, "default_route_key": DEFAULT_ROUTE_KEY}
+
+    def write_manifest(self, path):
+        with open(path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+    async def start(self, reuse_port=False, serve_metrics=True):
+        """Start every listener; worker processes leave /metrics to the supervisor."""
+        host = self.options.host
+        self.servers.append(await serve(self.backend.handle, host, self.options.backend_port, reuse_port))
+        self.servers.extend(await self.apigw.start(host, reuse_port))
+        self.servers.append(await self.alb.start(host, reuse_port))
+        if serve_metrics and self.options.metrics_port:
+            self.servers.append(await serve(metrics_handler(self.metrics.collect), host, self.options.metrics_port))
+        if self.options.watch and self.options.terraform_dir:
+            self.alb.reloader = RuleReloader(self.alb, self.options.terraform_dir, host, self.stage_ports)
+            self.alb.reloader.start(asyncio.get_running_loop())
+        return self.servers
+
+    def describe(self):
+        lines = [f"ALB ({self.alb.mode}) on http://{self.options.host}:{self.options.alb_port}"]
+        lines.extend(f"Stage {s.name} on http://{self.options.host}:{s.port}/hello -> {s.integration_uri}"
+                     for s in self.stages)
+        lines.append(f"Backend on {self.integration_uri}")
+        if self.options.metrics_port:
+            lines.append(f"Metrics on http://{self.options.host}:{self.options.metrics_port}/metrics")
+        return "\n".join(lines)
+
+    def snapshot(self):
+        """Counters of every component in this process."""
+        return {
+            "alb": self.alb.snapshot(),
+            **self.apigw.snapshot(),
+            "backend": {"requests": self.backend.requests},
+        }
+
+    def write_traces(self, spans=None):
+        """Write recorded spans (this process's, unless given) to --trace-out; return the paths."""
+        if spans is None:
+            spans = self.tracer.drain() if self.tracer is not None else []
+        paths = write_traces(spans, self.options.trace_out)
+        print(f"Wrote {len(spans)} spans to {', '.join(paths)}")
+        return paths
+
+    def close(self):
+        if self.alb.reloader is not None:
+            self.alb.reloader.stop()
+        for server in self.servers:
+            server.close()
+        self.client.close()
+        if self.proxy_client is not self.client:
+            self.proxy_client.close()
+        if self.payload_path:
+            os.unlink(self.payload_path)
+            self.payload_path = None
+
+
+def run_loop(main):
+    """Run a coroutine on uvloop when it is installed, else on the default asyncio loop."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(main)
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
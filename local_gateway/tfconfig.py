@@ -0,0 +1,191 @@
+"""
+Read the routing configuration straight from the Terraform files.
+
+Only the pieces the local stand-ins need are extracted: `header_routes`, `default_route_key`
+and `traffic_splits` from `module "alb_routing"` in main.tf (or the local it refers to), and
+the shape of the path rules (priority offset and path pattern) from
+`modules/alb_header_routing/main.tf`. This is a small targeted reader for these files, not a
+general HCL parser.
+"""
+
+import os
+import re
+
+MAIN_TF = "main.tf"
+ROUTING_MODULE_TF = os.path.join("modules", "alb_header_routing", "main.tf")
+
+DEFAULT_PATH_PRIORITY_OFFSET = 1000
+DEFAULT_PATH_PATTERN = "/{key}/*"
+
+
+class ConfigError(ValueError):
+    """The Terraform files could not be read into a routing configuration."""
+
+
+_ENTRY = re.compile(r"([A-Za-z0-9_-]+)\s*=\s*\{")
+_TOKENS = re.compile(r'"(?:[^"\\\n]|\\.)*"|#[^\n]*|//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+
+def _strip_comments(text):
+    """Drop `#`, `//` and `/* */` comments, leaving string literals (e.g. "https://") alone."""
+    return _TOKENS.sub(lambda m: m.group(0) if m.group(0).startswith('"') else "", text)
+
+
+def _block(text, start):
+    """Return the text between the `{` at or after `start` and its matching `}`."""
+    open_at = text.index("{", start)
+    depth = 0
+    for i in range(open_at, len(text)):
+        if text[i] == "{":
+            depth += 1
+        elif text[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return text[open_at + 1:i]
+    raise ConfigError("unbalanced braces")
+
+
+def _named_block(text, pattern, what):
+    match = re.search(pattern, text)
+    if not match:
+        raise ConfigError(f"{what} not found")
+    return _block(text, match.end() - 1)
+
+
+def parse_header_routes(text):
+    """Return (header_routes, default_route_key) from the root main.tf text."""
+    module = _named_block(_strip_comments(text), r'module\s+"alb_routing"\s*\{', 'module "alb_routing"')
+
+    default = re.search(r'default_route_key\s*=\s*"([^"]+)"', module)
+    if not default:
+        raise ConfigError("default_route_key not found")
+    routes_block = _named_block(module, r"header_routes\s*=\s*\{", "header_routes")
+
+    routes = {}
+    for entry in re.finditer(r"([A-Za-z0-9_-]+)\s*=\s*\{", routes_block):
+        body = _block(routes_block, entry.end() - 1)
+        name = re.search(r'header_name\s*=\s*"([^"]+)"', body)
+        values = re.search(r"header_values\s*=\s*\[([^\]]*)\]", body)
+        priority = re.search(r"priority\s*=\s*(\d+)", body)
+        if not (name and values and priority):
+            raise ConfigError(f"header route '{entry.group(1)}' is missing header_name, header_values or priority")
+        routes[entry.group(1)] = {
+            "header_name": name.group(1),
+            "header_values": re.findall(r'"([^"]*)"', values.group(1)),
+            "priority": int(priority.group(1)),
+        }
+    if not routes:
+        raise ConfigError("header_routes is empty")
+    if default.group(1) not in routes:
+        raise ConfigError(f"default_route_key '{default.group(1)}' is not a header route")
+    return routes, default.group(1)
+
+
+def _entries(block):
+    """Yield (name, body) for the top-level `name = { ... }` entries of a map block."""
+    pos = 0
+    while True:
+        entry = _ENTRY.search(block, pos)
+        if not entry:
+            return
+        body = _block(block, entry.end() - 1)
+        yield entry.group(1), body
+        pos = entry.end() + len(body) + 1
+
+
+def parse_traffic_splits(text, header_routes, default_route_key=None):
+    """Return the `traffic_splits` map of `module "alb_routing"` ({} when it is not set).
+
+    The map may be set inline or as `local.traffic_splits` from a `locals` block.
+
+    Applies the module's validations and split rule preconditions, so the local stack
+    rejects what `terraform plan` would.
+    """
+    text = _strip_comments(text)
+    module = _named_block(text, r'module\s+"alb_routing"\s*\{', 'module "alb_routing"')
+    if re.search(r"traffic_splits\s*=\s*local\.traffic_splits\b", module):
+        # Kept in a local so the response cache can key on the client id headers too
+        module = "".join(_block(text, m.end() - 1) for m in re.finditer(r"\blocals\s*\{", text))
+    if not re.search(r"traffic_splits\s*=\s*\{", module):
+        return {}
+    splits = {}
+    for route, body in _entries(_named_block(module, r"traffic_splits\s*=\s*\{", "traffic_splits")):
+        header = re.search(r'client_id_header\s*=\s*"([^"]+)"', body)
+        weights = re.search(r"weights\s*=\s*\{([^}]*)\}", body)
+        if not (header and weights):
+            raise ConfigError(f"traffic split '{route}' is missing client_id_header or weights")
+        parsed = {k: float(v) for k, v in re.findall(r"([A-Za-z0-9_-]+)\s*=\s*([0-9.]+)", weights.group(1))}
+        unknown = sorted(set(parsed) - set(header_routes)) + ([route] if route not in header_routes else [])
+        if unknown:
+            raise ConfigError(f"traffic split '{route}' refers to unknown routes: {', '.join(unknown)}")
+        if not parsed or sum(parsed.values()) <= 0:
+            raise ConfigError(f"traffic split '{route}' needs a positive weight")
+        if route != default_route_key:
+            _check_split_route(route, header_routes, default_route_key)
+        splits[route] = {"client_id_header": header.group(1), "weights": parsed}
+    return splits
+
+
+def _check_split_route(route, header_routes, default_route_key):
+    """The split rules take the 16 priorities below the route's header rule, plus one condition value."""
+    priority = header_routes[route]["priority"]
+    if priority <= 16:
+        raise ConfigError(f"traffic split '{route}' needs a route priority above 16, not {priority}")
+    clashes = sorted(k for k, v in header_routes.items()
+                     if k not in (route, default_route_key) and abs(v["priority"] - priority) < 16)
+    if clashes:
+        raise ConfigError(f"traffic split '{route}' needs priorities at least 16 away from {', '.join(clashes)}")
+    if len(header_routes[route]["header_values"]) > 4:
+        raise ConfigError(f"traffic split '{route}' route can have at most 4 header_values")
+
+
+def parse_path_rule_shape(text):
+    """Return (priority offset, path pattern template) of the module's path_rules resource."""
+    body = _named_block(_strip_comments(text), r'resource\s+"aws_lb_listener_rule"\s+"path_rules"\s*\{',
+                        "path_rules resource")
+    offset = re.search(r"priority\s*=\s*each\.value\.priority\s*\+\s*(\d+)", body)
+    pattern = re.search(r'path_pattern\s*\{[^}]*values\s*=\s*\[\s*"([^"]+)"', body)
+    return (
+        int(offset.group(1)) if offset else DEFAULT_PATH_PRIORITY_OFFSET,
+        pattern.group(1).replace("${each.key}", "{key}") if pattern else DEFAULT_PATH_PATTERN,
+    )
+
+
+def parse_variable_default(text, name):
+    """Return the default of `variable "<name>"` (a string, number, bool or list of strings)."""
+    body = _named_block(_strip_comments(text), rf'variable\s+"{re.escape(name)}"\s*\{{', f'variable "{name}"')
+    match = re.search(r'default\s*=\s*(\[[^\]]*\]|"[^"]*"|true|false|[0-9.]+)', body)
+    if not match:
+        raise ConfigError(f'variable "{name}" has no simple default')
+    value = match.group(1)
+    if value.startswith("["):
+        return re.findall(r'"([^"]*)"', value)
+    if value.startswith('"'):
+        return value[1:-1]
+    if value in ("true", "false"):
+        return value == "true"
+    return float(value) if "." in value else int(value)
+
+
+def watched_files(root):
+    return [os.path.join(root, MAIN_TF), os.path.join(root, ROUTING_MODULE_TF)]
+
+
+def load_routing_config(root):
+    """Return {"header_routes", "default_route_key", "traffic_splits", "path_priority_offset", "path_pattern"}."""
+    main_path, module_path = watched_files(root)
+    with open(main_path) as f:
+        text = f.read()
+    header_routes, default_route_key = parse_header_routes(text)
+    traffic_splits = parse_traffic_splits(text, header_routes, default_route_key)
+    offset, pattern = DEFAULT_PATH_PRIORITY_OFFSET, DEFAULT_PATH_PATTERN
+    if os.path.exists(module_path):
+        with open(module_path) as f:
+            offset, pattern = parse_path_rule_shape(f.read())
+    return {
+        "header_routes": header_routes,
+        "default_route_key": default_route_key,
+        "traffic_splits": traffic_splits,
+        "path_priority_offset": offset,
+        "path_pattern": pattern,
+    }
@@ -0,0 +1,197 @@
+"""
+Per-hop tracing for the local stack.
+
+Each hop (ALB, API Gateway stage, backend) opens a trace context from the incoming
+`X-Amzn-Trace-Id` header (`Root=1-<time>-<id>;Parent=<span>;Sampled=1`, as the ALB and
+API Gateway use) or starts a new trace, records spans for its steps and passes the header on
+with itself as the parent. The sampling decision is made once, by the first hop: a hop that
+does not sample still passes on `Sampled=0`, so later hops do not roll again. Components hold
+`tracer = None` when tracing is off, so the disabled cost is one `is not None` check per request.
+
+Spans can be written as Chrome `trace_event` JSON (chrome://tracing, Perfetto) and as
+OTLP/JSON (`ExportTraceServiceRequest`), which OpenTelemetry collectors can ingest.
+"""
+
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import NamedTuple
+
+TRACE_HEADER = "x-amzn-trace-id"
+
+_random = random.Random()
+# Workers are forked from the supervisor; without a reseed they would all draw the same
+# trace ids, span ids and sampling decisions (only the global `random` is reseeded)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_random.seed)
+
+
+class Span(NamedTuple):
+    trace_id: str       # X-Ray style root, "1-<8 hex>-<24 hex>"
+    span_id: str        # 16 hex
+    parent_id: str      # 16 hex or ""
+    name: str
+    service: str
+    start_ns: int
+    end_ns: int
+    attrs: dict
+
+
+def new_trace_id():
+    return f"1-{int(time.time()):08x}-{_random.getrandbits(96):024x}"
+
+
+def new_span_id():
+    return f"{_random.getrandbits(64):016x}"
+
+
+def parse_trace_header(value):
+    """Return (root, parent, sampled) from an X-Amzn-Trace-Id header value."""
+    fields = dict(part.strip().partition("=")[::2] for part in value.split(";") if "=" in part)
+    return fields.get("Root"), fields.get("Parent", ""), fields.get("Sampled", "1") != "0"
+
+
+class TraceContext:
+    """Spans of one hop of one request; the hop itself is the span `span_id`."""
+
+    __slots__ = ("tracer", "service", "trace_id", "parent_id", "span_id", "start_ns")
+
+    def __init__(self, tracer, service, trace_id, parent_id):
+        self.tracer = tracer
+        self.service = service
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.span_id = new_span_id()
+        self.start_ns = time.time_ns()
+
+    def span(self, name, start_ns, end_ns=None, **attrs):
+        """Record a child span of this hop that started at start_ns (time.time_ns())."""
+        self.tracer.spans.append(Span(self.trace_id, new_span_id(), self.span_id, f"{self.service}.{name}",
+                                      self.service, start_ns, end_ns or time.time_ns(), attrs))
+
+    def finish(self, **attrs):
+        """Record the hop span itself."""
+        self.tracer.spans.append(Span(self.trace_id, self.span_id, self.parent_id, f"{self.service}.request",
+                                      self.service, self.start_ns, time.time_ns(), attrs))
+
+    def header(self):
+        """Header value to send downstream, with this hop as the parent."""
+        return f"Root={self.trace_id};Parent={self.span_id};Sampled=1"
+
+
+class Tracer:
+    """Bounded in-memory span buffer for one process."""
+
+    def __init__(self, max_spans=200_000, sample_rate=1.0):
+        self.spans = deque(maxlen=max_spans)
+        self.sample_rate = sample_rate
+
+    def begin(self, service, headers):
+        """Open a hop context for a request, or None when the request is not sampled."""
+        value = headers.get(TRACE_HEADER)
+        if value:
+            root, parent, sampled = parse_trace_header(value)
+            if not sampled:
+                return None
+            if root:
+                return TraceContext(self, service, root, parent)
+        if self.sample_rate < 1.0 and _random.random() >= self.sample_rate:
+            return None
+        return TraceContext(self, service, new_trace_id(), "")
+
+    def drain(self):
+        """Return and forget every recorded span."""
+        spans = list(self.spans)
+        self.spans.clear()
+        return spans
+
+
+def unsampled_header(headers):
+    """Header value to send downstream for a request this hop did not sample."""
+    value = headers.get(TRACE_HEADER)
+    root, _, sampled = parse_trace_header(value) if value else (None, "", True)
+    if not sampled:
+        return value
+    return f"Root={root or new_trace_id()};Sampled=0"
+
+
+def finish_hop(trace, response, **attrs):
+    """Finish the hop span now, or once a streamed (relayed) body has been sent."""
+    attrs["status"] = response.status
+    if hasattr(response.body, "on_sent"):
+        response.body.on_sent = lambda: trace.finish(**attrs)
+    else:
+        trace.finish(**attrs)
+
+
+def to_chrome_trace(spans):
+    """Chrome trace_event JSON: one process row per service, one thread row per trace."""
+    services = {}
+    traces = {}
+    events = []
+    for span in sorted(spans, key=lambda s: s.start_ns):
+        pid = services.setdefault(span.service, len(services) + 1)
+        tid = traces.setdefault(span.trace_id, len(traces) + 1)
+        events.append({
+            "name": span.name,
+            "cat": span.service,
+            "ph": "X",
+            "ts": span.start_ns / 1000,
+            "dur": max(0, span.end_ns - span.start_ns) / 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": {"trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+                     **{k: str(v) for k, v in span.attrs.items()}},
+        })
+    for service, pid in services.items():
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": service}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    """OTLP/JSON ExportTraceServiceRequest with one resource per service."""
+    by_service = {}
+    for span in spans:
+        by_service.setdefault(span.service, []).append({
+            # X-Ray root "1-5759e988-bd862e3fe1be46a994272793" -> 32 hex OTLP trace id
+            "traceId": span.trace_id[2:].replace("-", ""),
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id,
+            "name": span.name,
+            "kind": 2 if span.name.endswith(".request") else 1,  # SERVER for hops, INTERNAL for steps
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attrs.items()],
+        })
+    return {"resourceSpans": [
+        {
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+            "scopeSpans": [{"scope": {"name": "local_gateway"}, "spans": otlp_spans}],
+        }
+        for service, otlp_spans in by_service.items()
+    ]}
+
+
+def write_traces(spans, prefix):
+    """Write <prefix>.chrome.json and <prefix>.otlp.json; return the paths."""
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    paths = (f"{prefix}.chrome.json", f"{prefix}.otlp.json")
+    with open(paths[0], "w") as f:
+        json.dump(to_chrome_trace(spans), f)
+    with open(paths[1], "w") as f:
+        json.dump(to_otlp(spans), f)
+    return paths
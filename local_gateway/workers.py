@@ -0,0 +1,230 @@
+"""
+Multi-process local stack.
+
+Every worker process runs the whole stack and binds the same ports with SO_REUSEPORT, so the
+kernel spreads connections across all cores. Stage throttling stays global: the token bucket
+state lives in shared memory and every worker takes tokens from the same buckets. The
+supervisor collects per-worker counters over a pipe and merges them into one report.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import signal
+import threading
+import time
+
+from . import cache as cache_module
+from . import metrics as metrics_module
+from .stack import LocalStack, run_loop
+
+
+class SharedTokenBucket:
+    """TokenBucket whose (tokens, last update) pair lives in shared memory."""
+
+    __slots__ = ("rate", "burst", "state", "offset", "lock", "clock")
+
+    def __init__(self, rate, burst, state, offset, lock, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.state = state
+        self.offset = offset
+        self.lock = lock
+        self.clock = clock
+
+    def allow(self):
+        """Take one token if available (CLOCK_MONOTONIC is shared by all processes)."""
+        state, i = self.state, self.offset
+        with self.lock:
+            now = self.clock()
+            tokens = min(self.burst, state[i] + (now - state[i + 1]) * self.rate)
+            state[i + 1] = now
+            if tokens >= 1.0:
+                state[i] = tokens - 1.0
+                return True
+            state[i] = tokens
+            return False
+
+
+class SharedThrottle:
+    """One shared token bucket per stage, created by the supervisor before forking."""
+
+    def __init__(self, limits, context=multiprocessing):
+        # limits: {stage name: (rate, burst)}
+        self.limits = dict(limits)
+        self.state = context.RawArray("d", 2 * len(self.limits))
+        self.locks = [context.Lock() for _ in self.limits]
+        now = time.monotonic()
+        for i, (_, burst) in enumerate(self.limits.values()):
+            self.state[2 * i] = float(burst)
+            self.state[2 * i + 1] = now
+
+    def buckets(self):
+        return {
+            name: SharedTokenBucket(rate, burst, self.state, 2 * i, self.locks[i])
+            for i, (name, (rate, burst)) in enumerate(self.limits.items())
+        }
+
+
+def _sum_counters(dicts):
+    """Sum {name: number} dicts key by key."""
+    total = {}
+    for d in dicts:
+        for key, value in d.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def _merge_alb(snapshots):
+    evals = sum(s["rule_evals"] for s in snapshots)
+    eval_ns = sum(s["rule_eval_ns"] for s in snapshots)
+    return {
+        "matched": _sum_counters(s["matched"] for s in snapshots),
+        "rule_evals": evals,
+        "rule_eval_ns": eval_ns,
+        "rule_eval_avg_ns": eval_ns / evals if evals else 0.0,
+        # Every worker watches the same files; report the least up-to-date one
+        "reload": min((s["reload"] for s in snapshots if s.get("reload")),
+                      key=lambda r: r["version"], default=None),
+    }
+
+
+def merge_snapshots(snapshots):
+    """Merge LocalStack.snapshot() results from every worker into one report."""
+    stage_names = sorted({name for s in snapshots for name in s["stages"]})
+    caches = [s["cache"] for s in snapshots if s.get("cache") is not None]
+    return {
+        "workers": len(snapshots),
+        "alb": _merge_alb([s["alb"] for s in snapshots]),
+        "stages": {name: _sum_counters(s["stages"][name] for s in snapshots if name in s["stages"])
+                   for name in stage_names},
+        "cache": cache_module.merge_snapshots(caches) if caches else None,
+        "backend": _sum_counters(s["backend"] for s in snapshots),
+    }
+
+
+def _worker_main(options, throttle, conn):
+    # Ctrl-C goes to the whole process group; let the supervisor coordinate shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def serve_worker():
+        stack = LocalStack(options, buckets=throttle.buckets() if throttle else None)
+        await stack.start(reuse_port=True, serve_metrics=False)
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+
+        def on_message():
+            message = conn.recv()
+            if message == "snapshot":
+                conn.send(stack.snapshot())
+            elif message == "metrics":
+                conn.send(stack.metrics.collect())
+            elif message == "spans":
+                conn.send(stack.tracer.drain() if stack.tracer is not None else [])
+            elif message == "stop" and not stopped.done():
+                stopped.set_result(None)
+
+        loop.add_reader(conn.fileno(), on_message)
+        conn.send("ready")
+        try:
+            await stopped
+        finally:
+            loop.remove_reader(conn.fileno())
+            stack.close()
+
+    run_loop(serve_worker())
+
+
+class WorkerPool:
+    """Starts N stack workers on shared ports and merges their counters."""
+
+    def __init__(self, options, workers, stage_names):
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods()
+                                              else "spawn")
+        throttle = None
+        if not options.no_throttle:
+            throttle = SharedThrottle({name: (options.rate_limit, options.burst_limit)
+                                       for name in stage_names}, context)
+        self.connections = []
+        self.processes = []
+        # Serialises pipe round-trips between the report loop and the metrics server thread
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker_main, args=(options, throttle, child), daemon=True)
+            process.start()
+            # Only the worker may hold the other end, so its exit shows up here as EOFError
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        for i, conn in enumerate(self.connections):
+            try:
+                conn.recv()
+            except EOFError:
+                self.stop()
+                raise RuntimeError(f"worker {i} failed to start (exit code {self.processes[i].exitcode}); "
+                                   f"are the ports already in use?") from None
+
+    def _ask(self, message):
+        with self._lock:
+            for conn in self.connections:
+                conn.send(message)
+            return [conn.recv() for conn in self.connections]
+
+    def snapshot(self):
+        return merge_snapshots(self._ask("snapshot"))
+
+    def metrics(self):
+        """Every worker's metric families, summed."""
+        return metrics_module.merge(self._ask("metrics"))
+
+    def spans(self):
+        """Drain and concatenate the recorded trace spans of every worker."""
+        return [span for spans in self._ask("spans") for span in spans]
+
+    def stop(self):
+        for conn in self.connections:
+            try:
+                conn.send("stop")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def run_workers(options):
+    """Run the stack in options.workers processes until interrupted, printing merged counters."""
+    stack = LocalStack(options)
+    try:
+        pool = WorkerPool(options, options.workers, list(stack.stage_ports))
+    except RuntimeError as e:
+        stack.close()
+        raise SystemExit(str(e)) from None
+    # Treat SIGTERM like Ctrl-C so the final counters and traces are still collected
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    metrics_server = None
+    if options.metrics_port:
+        metrics_server = metrics_module.serve_metrics_thread(pool.metrics, options.host, options.metrics_port)
+    if options.manifest_out:
+        stack.write_manifest(options.manifest_out)
+    print(stack.describe())
+    print(f"{options.workers} workers sharing each port (SO_REUSEPORT)")
+    try:
+        while True:
+            time.sleep(options.report_interval or 3600)
+            if options.report_interval:
+                print(json.dumps(pool.snapshot()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            print(json.dumps(pool.snapshot(), indent=2))
+            if options.trace_out:
+                stack.write_traces(pool.spans())
+        finally:
+            if metrics_server is not None:
+                metrics_server.shutdown()
+            pool.stop()
+            stack.close()
@@ -34,8 +34,11 @@ module "vpc" {
   private_subnets = var.private_subnet_cidrs
   public_subnets  = var.public_subnet_cidrs
 
-  enable_nat_gateway = true
-  single_nat_gateway = true
+  # One shared NAT (cheapest) or one per AZ (no cross-AZ egress hops, NAT capacity scales
+  # with the AZ count). See nat_planner.py for sizing the choice from access logs.
+  enable_nat_gateway     = true
+  single_nat_gateway     = !var.nat_gateway_per_az
+  one_nat_gateway_per_az = var.nat_gateway_per_az
 
   tags = var.tags
 }
@@ -167,6 +170,33 @@ module "api_gateway" {
   tags = var.tags
 }
 
+locals {
+  # Weighted, sticky splits between stages, e.g. to shed load from a throttled stage:
+  #   uat2 = { client_id_header = "x-client-id", weights = { uat2 = 12, uat1 = 4 } }
+  # Check balance and churn of a weight change first with `python -m local_gateway.splits`.
+  traffic_splits = {}
+
+  stage_hosts = { for k, v in module.api_gateway.api_endpoints : k => replace(v, "https://", "") }
+  # With the response cache on, the listener redirects to each stage's distribution instead
+  route_hosts = var.enable_response_cache ? module.response_cache[0].domain_names : local.stage_hosts
+}
+
+# Optional response cache: one CloudFront distribution per stage in front of its API Gateway
+# endpoint, keyed on path, x-env, the split client id headers and selected query strings
+module "response_cache" {
+  source = "./modules/response_cache"
+  count  = var.enable_response_cache ? 1 : 0
+
+  name        = var.project_name
+  origins     = local.stage_hosts
+  default_ttl = var.response_cache_ttl
+  # Only headers in the cache key reach the stages, and the split rules match on the client id
+  cache_key_headers       = distinct(concat(["x-env"], [for s in values(local.traffic_splits) : s.client_id_header]))
+  cache_key_query_strings = var.response_cache_query_strings
+
+  tags = var.tags
+}
+
 # ALB Header-Based Routing
 module "alb_routing" {
   source = "./modules/alb_header_routing"
@@ -180,15 +210,17 @@ module "alb_routing" {
       header_name       = "x-env"
       header_values     = ["uat1"]
       priority          = 100
-      target_host       = replace(module.api_gateway.uat1_api_endpoint, "https://", "")
+      target_host       = local.route_hosts["uat1"]
     },
     uat2 = {
       header_name       = "x-env"
       header_values     = ["uat2"]
       priority          = 200
-      target_host       = replace(module.api_gateway.uat2_api_endpoint, "https://", "")
+      target_host       = local.route_hosts["uat2"]
     }
   }
+
+  traffic_splits = local.traffic_splits
   
   tags = var.tags
-} 
\ No newline at end of file
+}
@@ -23,12 +23,78 @@ variable "default_route_key" {
   type        = string
 }
 
+variable "traffic_splits" {
+  description = <<-EOT
+    Weighted, sticky splits of a route's traffic across stages, keyed by route key. Requests are
+    bucketed on the last hex digit of the client_id_header value (16 buckets, so weights take
+    effect in 1/16 steps) and each bucket is redirected to one of the weighted route keys. The
+    same client id always lands on the same stage until the weights change, and then only the
+    buckets between the old and new boundaries move. Requests without the header keep the
+    route's own target. Client ids must end in uniformly distributed hex digits (e.g. UUIDs):
+    decimal ids never end in a-f, which leaves 6 buckets empty and skews the split by up to
+    +60%. Split rules take the 16 priorities just below their route's priority, so header
+    route priorities must be at least 16 apart and above 16.
+  EOT
+  type = map(object({
+    client_id_header = string
+    weights          = map(number)
+  }))
+  default = {}
+
+  validation {
+    condition = alltrue([
+      for split in values(var.traffic_splits) : sum(concat([0], values(split.weights))) > 0
+    ])
+    error_message = "Every traffic split needs weights summing to more than 0."
+  }
+
+  validation {
+    condition = alltrue(flatten([
+      for split in values(var.traffic_splits) : [for weight in values(split.weights) : weight >= 0]
+    ]))
+    error_message = "Traffic split weights must not be negative."
+  }
+}
+
 variable "tags" {
   description = "Tags to apply to all resources"
   type        = map(string)
   default     = {}
 }
 
+locals {
+  split_suffixes = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "a", "b", "c", "d", "e", "f"]
+  split_keys     = { for route, split in var.traffic_splits : route => sort(keys(split.weights)) }
+
+  # Cumulative bucket boundary of each weighted key (in sorted key order); bucket i goes to
+  # the first key whose boundary is above i, so a weight change only moves boundary buckets
+  split_bounds = {
+    for route, split in var.traffic_splits : route => [
+      for j, key in local.split_keys[route] :
+      floor(16 * sum([for k in slice(local.split_keys[route], 0, j + 1) : split.weights[k]]) / sum(values(split.weights)))
+    ]
+  }
+
+  # One rule per chunk of buckets sent elsewhere; an ALB rule allows 5 condition values in total
+  split_rules = merge({}, [
+    for route, split in var.traffic_splits : merge({}, [
+      for j, target in local.split_keys[route] : {
+        for buckets in chunklist([
+          for i, suffix in local.split_suffixes : i
+          if length([for bound in local.split_bounds[route] : bound if bound <= i]) == j
+          ], route == var.default_route_key ? 5 : max(1, 5 - length(var.header_routes[route].header_values))) :
+        "${route}/${target}/${local.split_suffixes[buckets[0]]}" => {
+          split_of         = route
+          route_key        = target
+          priority         = (route == var.default_route_key ? 50000 : var.header_routes[route].priority) - 16 + buckets[0]
+          client_id_header = split.client_id_header
+          suffixes         = [for i in buckets : "*${local.split_suffixes[i]}"]
+        }
+      } if target != route
+    ]...)
+  ]...)
+}
+
 # Create HTTP listener
 resource "aws_lb_listener" "http" {
   load_balancer_arn = var.lb_arn
@@ -105,7 +171,110 @@ resource "aws_lb_listener_rule" "path_rules" {
   }
 }
 
+# Weighted, sticky splits: the client id suffix picks the stage for this route's requests
+resource "aws_lb_listener_rule" "split_rules" {
+  for_each = local.split_rules
+
+  listener_arn = aws_lb_listener.http.arn
+  priority     = each.value.priority
+
+  # The route's own header condition; the default route's split applies to everything left
+  dynamic "condition" {
+    for_each = each.value.split_of == var.default_route_key ? [] : [var.header_routes[each.value.split_of]]
+    content {
+      http_header {
+        http_header_name = condition.value.header_name
+        values           = condition.value.header_values
+      }
+    }
+  }
+
+  condition {
+    http_header {
+      http_header_name = each.value.client_id_header
+      values           = each.value.suffixes
+    }
+  }
+
+  action {
+    type = "redirect"
+    redirect {
+      host        = var.header_routes[each.value.route_key].target_host
+      path        = "/hello"
+      port        = "443"
+      protocol    = "HTTPS"
+      status_code = "HTTP_302"
+    }
+  }
+
+  # These span header_routes and traffic_splits, so they cannot be variable validations
+  lifecycle {
+    precondition {
+      condition     = each.value.split_of == var.default_route_key || var.header_routes[each.value.split_of].priority > 16
+      error_message = "A header route with traffic_splits needs a priority above 16: its split rules use the 16 priorities below it."
+    }
+    precondition {
+      condition = each.value.split_of == var.default_route_key || alltrue([
+        for k, v in var.header_routes : abs(v.priority - var.header_routes[each.value.split_of].priority) >= 16
+        if k != each.value.split_of && k != var.default_route_key
+      ])
+      error_message = "A header route with traffic_splits needs a priority at least 16 away from every other header route."
+    }
+    precondition {
+      condition     = each.value.split_of == var.default_route_key || length(var.header_routes[each.value.split_of].header_values) <= 4
+      error_message = "A header route with traffic_splits can have at most 4 header_values: a listener rule takes 5 condition values and the client id needs one."
+    }
+  }
+}
+
 output "listener_arn" {
   description = "ARN of the created listener"
   value       = aws_lb_listener.http.arn
-} 
\ No newline at end of file
+}
+
+output "routing_rules" {
+  description = "Listener rules as plain data (default action, header, path and split rules) for the routing manifest"
+  value = {
+    default = {
+      route_key   = var.default_route_key
+      target_host = var.header_routes[var.default_route_key].target_host
+      path        = "/hello"
+      status_code = 302
+    }
+    header_rules = [
+      for k, v in aws_lb_listener_rule.header_rules : {
+        route_key     = k
+        priority      = v.priority
+        header_name   = var.header_routes[k].header_name
+        header_values = var.header_routes[k].header_values
+        target_host   = var.header_routes[k].target_host
+        path          = "/hello"
+        status_code   = 302
+      }
+    ]
+    path_rules = [
+      for k, v in aws_lb_listener_rule.path_rules : {
+        route_key     = k
+        priority      = v.priority
+        path_patterns = ["/${k}/*"]
+        target_host   = var.header_routes[k].target_host
+        path          = "/hello"
+        status_code   = 302
+      }
+    ]
+    split_rules = [
+      for k, v in aws_lb_listener_rule.split_rules : {
+        route_key          = local.split_rules[k].route_key
+        split_of           = local.split_rules[k].split_of
+        priority           = v.priority
+        header_name        = local.split_rules[k].split_of == var.default_route_key ? null : var.header_routes[local.split_rules[k].split_of].header_name
+        header_values      = local.split_rules[k].split_of == var.default_route_key ? [] : var.header_routes[local.split_rules[k].split_of].header_values
+        client_id_header   = local.split_rules[k].client_id_header
+        client_id_suffixes = local.split_rules[k].suffixes
+        target_host        = var.header_routes[local.split_rules[k].route_key].target_host
+        path               = "/hello"
+        status_code        = 302
+      }
+    ]
+  }
+}
@@ -0,0 +1,130 @@
+variable "name" {
+  description = "Name prefix for the cache resources"
+  type        = string
+}
+
+variable "origins" {
+  description = "Map of stage name to the DNS name of its API Gateway endpoint; each stage gets its own distribution"
+  type        = map(string)
+}
+
+variable "default_ttl" {
+  description = "Default TTL in seconds for cached responses"
+  type        = number
+  default     = 30
+
+  validation {
+    condition     = var.default_ttl >= 0
+    error_message = "default_ttl must not be negative."
+  }
+}
+
+variable "max_ttl" {
+  description = "Maximum TTL in seconds for cached responses (raised to default_ttl when lower)"
+  type        = number
+  default     = 300
+}
+
+variable "cache_key_headers" {
+  description = "Request headers included in the cache key and forwarded to the stages"
+  type        = list(string)
+  default     = ["x-env"]
+}
+
+variable "cache_key_query_strings" {
+  description = "Query string parameters included in the cache key"
+  type        = list(string)
+  default     = []
+}
+
+variable "tags" {
+  description = "Tags to apply to all resources"
+  type        = map(string)
+  default     = {}
+}
+
+# Cache key: path + configured headers + configured query strings. CloudFront rejects a
+# default TTL above the maximum, so the maximum never drops below the default.
+resource "aws_cloudfront_cache_policy" "this" {
+  name        = "${var.name}-cache-policy"
+  default_ttl = var.default_ttl
+  max_ttl     = max(var.max_ttl, var.default_ttl)
+  min_ttl     = 0
+
+  parameters_in_cache_key_and_forwarded_to_origin {
+    enable_accept_encoding_gzip   = true
+    enable_accept_encoding_brotli = true
+
+    cookies_config {
+      cookie_behavior = "none"
+    }
+
+    headers_config {
+      header_behavior = length(var.cache_key_headers) > 0 ? "whitelist" : "none"
+
+      dynamic "headers" {
+        for_each = length(var.cache_key_headers) > 0 ? [1] : []
+        content {
+          items = var.cache_key_headers
+        }
+      }
+    }
+
+    query_strings_config {
+      query_string_behavior = length(var.cache_key_query_strings) > 0 ? "whitelist" : "none"
+
+      dynamic "query_strings" {
+        for_each = length(var.cache_key_query_strings) > 0 ? [1] : []
+        content {
+          items = var.cache_key_query_strings
+        }
+      }
+    }
+  }
+}
+
+# One distribution per stage in front of its HTTP API, so cache hits never reach the
+# HTTP_PROXY integration; only GET/HEAD are cached
+resource "aws_cloudfront_distribution" "this" {
+  for_each = var.origins
+
+  enabled = true
+  comment = "${var.name} ${each.key} response cache"
+
+  origin {
+    domain_name = each.value
+    origin_id   = "apigw-${each.key}"
+
+    custom_origin_config {
+      http_port              = 80
+      https_port             = 443
+      origin_protocol_policy = "https-only"
+      origin_ssl_protocols   = ["TLSv1.2"]
+    }
+  }
+
+  default_cache_behavior {
+    target_origin_id       = "apigw-${each.key}"
+    viewer_protocol_policy = "redirect-to-https"
+    allowed_methods        = ["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"]
+    cached_methods         = ["GET", "HEAD"]
+    cache_policy_id        = aws_cloudfront_cache_policy.this.id
+  }
+
+  restrictions {
+    geo_restriction {
+      restriction_type = "none"
+    }
+  }
+
+  viewer_certificate {
+    cloudfront_default_certificate = true
+  }
+
+  tags = merge(var.tags, { Environment = each.key })
+}
+
+output "domain_names" {
+  description = "DNS name of each stage's CloudFront distribution"
+  value       = { for k, v in aws_cloudfront_distribution.this : k => v.domain_name }
+}
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Plan the NAT layout of `module "vpc"` from ALB and API Gateway access logs.
+
+Traffic volumes are read from ALB access logs (the standard space-separated format, plain or
+.gz) and API Gateway access logs (one JSON object per line). Requests whose upstream address
+falls in a private subnet are attributed to that subnet's AZ; the rest are split evenly
+across the AZs. For the single-NAT layout (`nat_gateway_per_az = false`) and the per-AZ
+layout the report gives:
+
+- headroom: how many times the busiest observed window can grow before a NAT gateway hits
+  its bandwidth, packet or per-destination connection limit, and which one it hits first
+- cross-AZ bytes and their cost, when private subnets in other AZs egress through one NAT
+- added latency from the extra cross-AZ hop
+- the monthly NAT bill for each layout
+
+The model applies to egress that starts in the private subnets (targets, VPC link
+integrations). API Gateway's own HTTP_PROXY integrations leave from AWS-managed networks.
+
+    terraform output -raw nat_layout > nat_layout.json
+    python3 nat_planner.py --layout nat_layout.json --alb-logs logs/alb/ --apigw-logs logs/apigw/
+"""
+
+import argparse
+import gzip
+import ipaddress
+import json
+import math
+import os
+import re
+import sys
+from datetime import datetime
+from typing import NamedTuple
+
+from local_gateway.tfconfig import ConfigError, parse_variable_default
+
+# NAT gateway quotas: bandwidth scales automatically from 5 to 100 Gbps, packets from 1M to
+# 10M per second, and each NAT IP allows 55,000 simultaneous connections to one destination.
+NAT_MAX_GBPS = 100
+NAT_MAX_PPS = 10_000_000
+NAT_CONNECTIONS_PER_DESTINATION = 55_000
+
+# eu-west-1 list prices (USD)
+NAT_HOURLY = 0.048
+NAT_PER_GB = 0.048
+CROSS_AZ_PER_GB = 0.02  # 0.01 out of one AZ plus 0.01 into the other
+HOURS_PER_MONTH = 730
+
+_ALB_TOKENS = re.compile(r'"[^"]*"|\S+')
+
+
+class LogRecord(NamedTuple):
+    timestamp: float   # epoch seconds
+    bytes: int         # request plus response bytes
+    latency: float     # seconds waiting on the upstream
+    source_ip: str     # upstream/caller address used for AZ attribution, "" if unknown
+
+
+def _epoch(iso):
+    return datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+
+
+def parse_alb_line(line):
+    """One ALB access log entry, or None for lines that are not requests."""
+    fields = _ALB_TOKENS.findall(line)
+    if len(fields) < 13:
+        return None
+    target = fields[4].rsplit(":", 1)[0] if fields[4] != "-" else ""
+    latency = float(fields[6])
+    return LogRecord(_epoch(fields[1]), int(fields[10]) + int(fields[11]), max(latency, 0.0), target)
+
+
+def parse_apigw_line(line):
+    """One API Gateway JSON access log entry (requestTimeEpoch or requestTime, responseLength...)."""
+    entry = json.loads(line)
+    if "requestTimeEpoch" in entry:
+        timestamp = float(entry["requestTimeEpoch"]) / 1000
+    else:
+        timestamp = datetime.strptime(entry["requestTime"], "%d/%b/%Y:%H:%M:%S %z").timestamp()
+
+    def number(*keys):
+        for key in keys:
+            value = entry.get(key)
+            if value not in (None, "", "-"):
+                return float(value)
+        return 0.0
+
+    size = number("responseLength") + number("requestLength")
+    latency = number("integrationLatency", "integration.latency", "responseLatency") / 1000
+    return LogRecord(timestamp, int(size), latency, entry.get("sourceIp") or entry.get("ip") or "")
+
+
+def _log_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    yield os.path.join(directory, name)
+        else:
+            yield path
+
+
+def read_records(paths, parse):
+    """Yield records from files/directories of logs, skipping lines that do not parse."""
+    for path in _log_files(paths):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    record = parse(line)
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if record is not None:
+                    yield record
+
+
+class Layout(NamedTuple):
+    availability_zones: list
+    private_subnet_cidrs: list
+    nat_gateway_per_az: bool = False
+    nat_public_ips: tuple = ()      # empty when read from variables.tf (nothing deployed yet)
+
+    @property
+    def nat_gateways(self):
+        return len(self.availability_zones) if self.nat_gateway_per_az else 1
+
+    def ips_per_nat(self):
+        """Public IPs per deployed NAT gateway, 1 when unknown."""
+        return max(1, len(self.nat_public_ips) // self.nat_gateways)
+
+
+def load_layout(path=None, terraform_dir="."):
+    """The `nat_layout` Terraform output, or the variables.tf defaults."""
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+        return Layout(data["availability_zones"], data["private_subnet_cidrs"],
+                      bool(data.get("nat_gateway_per_az", False)), tuple(data.get("nat_public_ips") or ()))
+    with open(os.path.join(terraform_dir, "variables.tf")) as f:
+        text = f.read()
+    return Layout(parse_variable_default(text, "availability_zones"),
+                  parse_variable_default(text, "private_subnet_cidrs"),
+                  parse_variable_default(text, "nat_gateway_per_az"))
+
+
+class TrafficProfile:
+    """Per-window request, byte and in-flight totals for each AZ."""
+
+    def __init__(self, layout, window=60.0):
+        self.azs = list(layout.availability_zones)
+        self.networks = [ipaddress.ip_network(cidr) for cidr in layout.private_subnet_cidrs]
+        self.window = window
+        self.windows = {}          # window index -> per AZ [requests, bytes, latency seconds]
+        self.requests = 0
+        self.attributed = 0
+        self.first = self.last = None
+
+    def _az_of(self, ip):
+        if ip:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                return None
+            for i, network in enumerate(self.networks[:len(self.azs)]):
+                if address in network:
+                    return i
+        return None
+
+    def add(self, record):
+        az = self._az_of(record.source_ip)
+        # Unattributed traffic is spread evenly across the AZs
+        shares = [(az, 1.0)] if az is not None else [(i, 1 / len(self.azs)) for i in range(len(self.azs))]
+        window = self.windows.setdefault(int(record.timestamp // self.window),
+                                         [[0.0, 0.0, 0.0] for _ in self.azs])
+        for i, share in shares:
+            window[i][0] += share
+            window[i][1] += record.bytes * share
+            window[i][2] += record.latency * share
+        self.requests += 1
+        self.attributed += az is not None
+        self.first = record.timestamp if self.first is None else min(self.first, record.timestamp)
+        self.last = record.timestamp if self.last is None else max(self.last, record.timestamp)
+
+    @property
+    def duration(self):
+        return max(self.window, (self.last - self.first) if self.requests else 0.0)
+
+    def az_bytes(self):
+        return [sum(w[i][1] for w in self.windows.values()) for i in range(len(self.azs))]
+
+    def peak(self, azs=None):
+        """(bytes/s, requests/s, in-flight requests) of the busiest window over the given AZs."""
+        azs = range(len(self.azs)) if azs is None else azs
+        busiest = [0.0, 0.0, 0.0]
+        for window in self.windows.values():
+            totals = [sum(window[i][k] for i in azs) for k in range(3)]
+            if totals[1] > busiest[1]:
+                busiest = totals
+        requests, size, latency = busiest
+        # Little's law: average requests in flight = total latency / window length
+        return size / self.window, requests / self.window, latency / self.window
+
+
+def headroom(peak_bytes_per_s, in_flight, nat_ips, destinations, packet_bytes):
+    """Growth factor before one NAT gateway hits each limit, and the first limit hit."""
+    limits = {
+        "bandwidth": NAT_MAX_GBPS * 1e9 / 8 / peak_bytes_per_s if peak_bytes_per_s else math.inf,
+        "packets": NAT_MAX_PPS * packet_bytes / peak_bytes_per_s if peak_bytes_per_s else math.inf,
+        # Keep-alive connections track requests in flight, spread over the destination IPs
+        "connections": (NAT_CONNECTIONS_PER_DESTINATION * nat_ips * destinations / in_flight
+                        if in_flight else math.inf),
+    }
+    first = min(limits, key=limits.get)
+    return limits, first
+
+
+def months_until(factor, monthly_growth):
+    if not monthly_growth or factor == math.inf:
+        return None
+    return 0.0 if factor <= 1 else math.log(factor) / math.log(1 + monthly_growth)
+
+
+def plan(profile, nat_az=0, nat_ips=1, destinations=1, packet_bytes=1000, cross_az_rtt_ms=1.0,
+         round_trips=1, monthly_growth=0.0, per_az_deployed=None):
+    """Compare the single-NAT and per-AZ layouts for a traffic profile.
+
+    `per_az_deployed` (the `nat_gateway_per_az` setting) marks the current layout.
+    """
+    n = len(profile.azs)
+    az_bytes = profile.az_bytes()
+    total_bytes = sum(az_bytes)
+    month_factor = HOURS_PER_MONTH * 3600 / profile.duration
+    az_requests = [sum(w[i][0] for w in profile.windows.values()) for i in range(n)]
+    cross_requests = sum(r for i, r in enumerate(az_requests) if i != nat_az)
+    processing = total_bytes * month_factor / 1e9 * NAT_PER_GB
+
+    def layout(name, nats, cross_bytes, added_ms, peaks):
+        # The busiest NAT decides when the layout runs out of room
+        worst = None
+        for peak_bytes, _, in_flight in peaks:
+            limits, first = headroom(peak_bytes, in_flight, nat_ips, destinations, packet_bytes)
+            if worst is None or limits[first] < worst[0][worst[1]]:
+                worst = (limits, first, peak_bytes, in_flight)
+        limits, first, peak_bytes, in_flight = worst
+        cross_gb_month = cross_bytes * month_factor / 1e9
+        return {
+            "layout": name,
+            "current": per_az_deployed is not None and per_az_deployed == (name == "per_az"),
+            "nat_gateways": nats,
+            "busiest_nat_peak_mbps": peak_bytes * 8 / 1e6,
+            "busiest_nat_in_flight": in_flight,
+            "headroom": limits,
+            "limit": first,
+            "headroom_factor": limits[first],
+            "months_until_limit": months_until(limits[first], monthly_growth),
+            "cross_az_bytes": cross_bytes,
+            "cross_az_gb_per_month": cross_gb_month,
+            "added_latency_ms_per_request": added_ms,
+            "monthly_cost": {
+                "hourly": nats * NAT_HOURLY * HOURS_PER_MONTH,
+                "processing": processing,
+                "cross_az": cross_gb_month * CROSS_AZ_PER_GB,
+                "total": nats * NAT_HOURLY * HOURS_PER_MONTH + processing + cross_gb_month * CROSS_AZ_PER_GB,
+            },
+        }
+
+    extra_ms = cross_az_rtt_ms * round_trips
+    return {
+        "requests": profile.requests,
+        "attributed_to_az": profile.attributed,
+        "seconds": profile.duration,
+        "window_seconds": profile.window,
+        "bytes": total_bytes,
+        "availability_zones": profile.azs,
+        "layouts": [
+            layout("single", 1, sum(b for i, b in enumerate(az_bytes) if i != nat_az),
+                   extra_ms * cross_requests / profile.requests if profile.requests else 0.0,
+                   [profile.peak()]),
+            layout("per_az", n, 0.0, 0.0, [profile.peak([i]) for i in range(n)]),
+        ],
+    }
+
+
+def format_report(result):
+    lines = [
+        f"{result['requests']} requests over {result['seconds'] / 3600:.1f} h "
+        f"({result['attributed_to_az']} attributed to an AZ, the rest split evenly across "
+        f"{', '.join(result['availability_zones'])}); peaks over {result['window_seconds']:g} s windows",
+        "",
+        f"{'layout':<8} {'NATs':>4} {'peak Mbps':>10} {'in flight':>10} {'headroom':>10} {'limit':<12} "
+        f"{'x-AZ GB/mo':>11} {'+ms/req':>8} {'$/month':>9}",
+    ]
+    for row in result["layouts"]:
+        months = row["months_until_limit"]
+        lines.append(
+            f"{row['layout'] + ('*' if row['current'] else ''):<8} {row['nat_gateways']:>4} {row['busiest_nat_peak_mbps']:>10.2f} "
+            f"{row['busiest_nat_in_flight']:>10.1f} {row['headroom_factor']:>9.0f}x {row['limit']:<12} "
+            f"{row['cross_az_gb_per_month']:>11.1f} {row['added_latency_ms_per_request']:>8.3f} "
+            f"{row['monthly_cost']['total']:>9.2f}"
+            + (f"  (limit in {months:.0f} months)" if months is not None else "")
+        )
+    single = result["layouts"][0]
+    if any(row["current"] for row in result["layouts"]):
+        lines.append("* current layout (nat_gateway_per_az)")
+    lines += ["", f"The single NAT becomes the scaling limit at {single['headroom_factor']:.0f}x today's "
+                  f"busiest window ({single['limit']})."]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare single-NAT and per-AZ NAT layouts from access logs")
+    parser.add_argument("--alb-logs", nargs="*", default=[], help="ALB access log files or directories")
+    parser.add_argument("--apigw-logs", nargs="*", default=[], help="API Gateway JSON access log files or directories")
+    parser.add_argument("--layout", help="`terraform output -raw nat_layout` JSON (default: variables.tf defaults)")
+    parser.add_argument("--terraform-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--window", type=float, default=60.0, help="Seconds per peak window (default: 60)")
+    parser.add_argument("--destinations", type=int, default=1,
+                        help="Unique destination IPs behind the egress traffic (default: 1)")
+    parser.add_argument("--nat-ips", type=int,
+                        help="Public IPs per NAT gateway (default: from nat_public_ips in --layout, else 1)")
+    parser.add_argument("--packet-bytes", type=int, default=1000, help="Average packet size (default: 1000)")
+    parser.add_argument("--cross-az-rtt-ms", type=float, default=1.0,
+                        help="Extra round-trip time of a cross-AZ hop (default: 1.0)")
+    parser.add_argument("--round-trips", type=float, default=1.0,
+                        help="Cross-AZ round trips per request; raise for new TLS connections (default: 1)")
+    parser.add_argument("--monthly-growth", type=float, default=0.0,
+                        help="Expected traffic growth per month, e.g. 0.1 for 10%%")
+    parser.add_argument("--json", action="store_true", help="Print the plan as JSON")
+    args = parser.parse_args(argv)
+    if not args.alb_logs and not args.apigw_logs:
+        parser.error("pass --alb-logs and/or --apigw-logs")
+
+    try:
+        layout = load_layout(args.layout, args.terraform_dir)
+    except (ConfigError, OSError, KeyError, ValueError) as e:
+        print(f"Could not read the NAT layout: {e}", file=sys.stderr)
+        return 2
+    profile = TrafficProfile(layout, args.window)
+    for record in read_records(args.alb_logs, parse_alb_line):
+        profile.add(record)
+    for record in read_records(args.apigw_logs, parse_apigw_line):
+        profile.add(record)
+    if not profile.requests:
+        print("No requests found in the logs", file=sys.stderr)
+        return 1
+
+    nat_ips = args.nat_ips or layout.ips_per_nat()
+    result = plan(profile, nat_ips=nat_ips, destinations=args.destinations, packet_bytes=args.packet_bytes,
+                  cross_az_rtt_ms=args.cross_az_rtt_ms, round_trips=args.round_trips,
+                  monthly_growth=args.monthly_growth, per_az_deployed=layout.nat_gateway_per_az)
+    print(json.dumps(result, indent=2, default=str) if args.json else format_report(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -61,4 +61,33 @@ output "public_subnet_ids" {
 output "private_subnet_ids" {
   description = "The IDs of the private subnets"
   value       = module.vpc.private_subnets
-} 
\ No newline at end of file
+}
+
+output "routing_manifest" {
+  description = "JSON description of every stage endpoint, header rule and path rule (read by smoke_test.py)"
+  value = jsonencode({
+    load_balancer_url = "http://${aws_lb.main.dns_name}"
+    stages = {
+      for k, v in module.api_gateway.api_endpoints : k => {
+        api_endpoint = v
+        hello_url    = "${v}/hello"
+      }
+    }
+    listener = module.alb_routing.routing_rules
+  })
+}
+
+output "response_cache_domains" {
+  description = "DNS name of each stage's CloudFront response cache (empty when disabled)"
+  value       = var.enable_response_cache ? module.response_cache[0].domain_names : {}
+}
+
+output "nat_layout" {
+  description = "JSON description of the NAT layout and private subnet AZs (read by nat_planner.py)"
+  value = jsonencode({
+    nat_gateway_per_az   = var.nat_gateway_per_az
+    availability_zones   = var.availability_zones
+    private_subnet_cidrs = var.private_subnet_cidrs
+    nat_public_ips       = module.vpc.nat_public_ips
+  })
+}
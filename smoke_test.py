@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Post-deploy smoke tests for the header- and path-based routing.
+
+Reads the `routing_manifest` Terraform output once, derives the expected route for a set of
+requests that exercises every listener rule (and every client id bucket, when traffic splits
+are set) and runs all requests concurrently.
+Each ALB case checks the redirect status and the `Location` (stage host and path); each
+direct stage case checks that `GET /hello` answers 200.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from local_gateway.rules import RuleTable
+
+
+class Case(NamedTuple):
+    name: str
+    url: str
+    headers: dict
+    expected_status: int
+    expected_host: Optional[str] = None
+    expected_path: Optional[str] = None
+
+
+class Result(NamedTuple):
+    case: Case
+    ok: bool
+    status: Optional[int]
+    detail: str
+    elapsed: float
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Surface 3xx responses instead of following them."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_OPENER = urllib.request.build_opener(_NoRedirect)
+
+
+def load_manifest(path=None):
+    """Load the manifest from a file, or from a single `terraform output` call."""
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    raw = subprocess.run(["terraform", "output", "-raw", "routing_manifest"],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(raw)
+
+
+def _concrete(pattern):
+    """A value matching a wildcard pattern: `*` becomes "hello", `?` becomes "x"."""
+    return pattern.replace("*", "hello").replace("?", "x")
+
+
+def build_cases(manifest):
+    """Return cases covering every rule once, plus one per stage endpoint.
+
+    The count grows linearly with the rules: each header value (wildcards made concrete), one value no rule
+    matches per header and no header at all on `/hello`; each path rule without a header and
+    with a header that has its own rule; and each split rule's client id suffixes (plus one
+    id no split takes) under the header value it splits.
+    """
+    table = RuleTable.from_manifest(manifest)
+    alb_url = manifest["load_balancer_url"].rstrip("/")
+
+    requests = [("/hello", {})]
+    overrides = []
+    for name, values in sorted(table.header_values().items()):
+        literals = [{name: v} for v in sorted({_concrete(v) for v in values})]
+        overrides.extend(literals)
+        requests.extend(("/hello", headers) for headers in literals + [{name: "no-such-env"}])
+
+    for rule in (r for r in table.rules if r.kind == "path"):
+        path = _concrete(rule.values[0])
+        requests.append((path, {}))
+        # A header value routed elsewhere shows which of the two rules wins
+        override = next((h for h in overrides if table.match("/hello", h).route_key != rule.route_key),
+                        overrides[0] if overrides else None)
+        if override is not None:
+            requests.append((path, override))
+
+    # Traffic splits: every suffix of each split route once, plus one id no split rule takes
+    splits = {}
+    for rule in (r for r in table.rules if r.kind == "split"):
+        headers = {rule.header_name: _concrete(rule.values[0])} if rule.header_name else {}
+        key = (rule.client_id_header, tuple(headers.items()))
+        splits.setdefault(key, set()).update(rule.client_id_values)
+    for (client_id_header, headers), suffixes in sorted(splits.items()):
+        client_ids = [f"client-{s.lstrip('*')}" for s in sorted(suffixes)] + ["client-x"]
+        requests.extend(("/hello", {**dict(headers), client_id_header: c}) for c in client_ids)
+
+    cases = []
+    for path, headers in requests:
+        rule = table.match(path, headers)
+        label = ", ".join(f"{k}: {v}" for k, v in headers.items()) or "no header"
+        cases.append(Case(
+            name=f"ALB {path} ({label}) -> {rule.route_key} via {rule.kind} rule",
+            url=alb_url + path,
+            headers=headers,
+            expected_status=rule.status_code,
+            expected_host=rule.target_host,
+            expected_path=rule.path,
+        ))
+
+    for stage, endpoints in sorted(manifest.get("stages", {}).items()):
+        cases.append(Case(name=f"API Gateway {stage} direct", url=endpoints["hello_url"],
+                          headers={}, expected_status=200))
+    return cases
+
+
+def run_case(case, timeout):
+    """Send one request and compare status/Location with the expectation."""
+    request = urllib.request.Request(case.url, headers=case.headers, method="GET")
+    start = time.perf_counter()
+    try:
+        with _OPENER.open(request, timeout=timeout) as response:
+            status, location = response.status, response.headers.get("Location")
+    except urllib.error.HTTPError as e:
+        status, location = e.code, e.headers.get("Location")
+    except (urllib.error.URLError, OSError) as e:
+        return Result(case, False, None, f"request failed: {e}", time.perf_counter() - start)
+    elapsed = time.perf_counter() - start
+
+    if status != case.expected_status:
+        return Result(case, False, status, f"expected status {case.expected_status}", elapsed)
+    if case.expected_host is not None:
+        target = urlsplit(location or "")
+        # Deployed targets are bare hosts (port 443 implied), local stand-ins are host:port
+        host = target.hostname if target.port in (None, 80, 443) else f"{target.hostname}:{target.port}"
+        if host != case.expected_host or target.path != case.expected_path:
+            return Result(case, False, status,
+                          f"expected Location host {case.expected_host}{case.expected_path}, got {location}",
+                          elapsed)
+    return Result(case, True, status, location or "", elapsed)
+
+
+def run_all(cases, workers=64, timeout=10.0):
+    """Run every case concurrently and return results in case order."""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(cases)))) as pool:
+        return list(pool.map(lambda c: run_case(c, timeout), cases))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run routing smoke tests against the deployed stack.")
+    parser.add_argument("--manifest", help="Routing manifest JSON file (default: terraform output routing_manifest)")
+    parser.add_argument("--workers", type=int, default=64, help="Concurrent requests (default: 64)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    args = parser.parse_args(argv)
+
+    cases = build_cases(load_manifest(args.manifest))
+    start = time.perf_counter()
+    results = run_all(cases, args.workers, args.timeout)
+    wall = time.perf_counter() - start
+
+    failures = 0
+    for result in results:
+        mark = "PASS" if result.ok else "FAIL"
+        failures += not result.ok
+        print(f"[{mark}] {result.case.name}: {result.status} {result.detail} ({result.elapsed * 1000:.0f} ms)")
+
+    print(f"\n{len(results) - failures}/{len(results)} passed in {wall:.2f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+import pytest
+
+from local_gateway.alb import Alb
+from local_gateway.http import Request
+from local_gateway.manifest import local_manifest
+from local_gateway.metrics import Registry
+from local_gateway.rules import RuleTable
+from local_gateway.tracing import Tracer
+
+TABLE = RuleTable.from_manifest(local_manifest("127.0.0.1", 8080, {"uat1": 8081, "uat2": 8082}))
+
+
+class FailingClient:
+    def __init__(self, error):
+        self.error = error
+
+    async def request(self, method, url, headers=None, body=b"", trace=None):
+        raise self.error
+
+
+@pytest.mark.parametrize("error, status", [
+    (ConnectionRefusedError("refused"), 503),
+    (ConnectionResetError("reset"), 502),
+    (TimeoutError("timed out"), 502),
+    (asyncio.IncompleteReadError(b"", 10), 502),
+])
+def test_forward_errors_become_json_responses(error, status):
+    registry, tracer = Registry(), Tracer()
+    alb = Alb(TABLE, 8080, mode="forward", client=FailingClient(error), tracer=tracer, metrics=registry)
+    request = Request("GET", "/hello", "/hello", "", {"x-env": "uat2"})
+
+    response = asyncio.run(alb.handle(request))
+
+    assert response.status == status
+    assert "error" in json.loads(response.body)
+    assert registry.families["gateway_alb_requests"].values == {("header", "uat2", status): 1}
+    spans = {span.name: span for span in tracer.drain()}
+    assert spans["alb.forward"].attrs["status"] == status
+    assert spans["alb.request"].attrs["status"] == status
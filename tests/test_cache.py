@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from local_gateway.cache import ResponseCache
+from local_gateway.http import Request, Response
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _response(body=b"ok", status=200):
+    return Response(status, {}, body)
+
+
+def _fetch(response, calls):
+    async def fetch():
+        calls.append(1)
+        return response
+    return fetch
+
+
+def test_key_uses_stage_path_headers_and_selected_query():
+    cache = ResponseCache(key_headers=("X-Env",), key_query=("page",))
+    request = Request("GET", "/hello?page=2&x=1", "/hello", "x=1&page=2", {"x-env": "uat2", "x-other": "a"})
+    assert cache.key("uat2", request) == ("uat2", "/hello", ("uat2",), (("page", "2"),))
+
+
+def test_hits_until_the_ttl_expires():
+    async def run():
+        clock, calls = Clock(), []
+        cache = ResponseCache(ttl=30, clock=clock)
+        fetch = _fetch(_response(), calls)
+        await cache.get_or_fetch("k", fetch)
+        clock.now = 29.9
+        await cache.get_or_fetch("k", fetch)
+        clock.now = 30.0
+        await cache.get_or_fetch("k", fetch)
+        return cache, calls
+
+    cache, calls = asyncio.run(run())
+    assert len(calls) == 2
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.expired) == (1, 2, 1)
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    async def run():
+        cache, calls = ResponseCache(max_entries=2), []
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_fetch(key, _fetch(_response(key.encode()), calls))
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"a" and cache.get("c").body == b"c"
+    assert cache.stats.evictions == 1
+
+
+def test_byte_bound_evicts_and_skips_oversized_bodies():
+    async def run():
+        cache, calls = ResponseCache(max_bytes=100), []
+        await cache.get_or_fetch("a", _fetch(_response(b"x" * 60), calls))
+        await cache.get_or_fetch("b", _fetch(_response(b"y" * 60), calls))
+        await cache.get_or_fetch("big", _fetch(_response(b"z" * 101), calls))
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.get("a") is None and cache.get("b") is not None
+    assert cache.get("big") is None
+    assert cache.bytes == 60 and len(cache) == 1
+
+
+def test_non_200_responses_are_not_cached():
+    async def run():
+        cache, calls = ResponseCache(), []
+        fetch = _fetch(_response(status=502), calls)
+        await cache.get_or_fetch("k", fetch)
+        await cache.get_or_fetch("k", fetch)
+        return calls
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache, calls = ResponseCache(), []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return _response()
+
+        waiters = [asyncio.ensure_future(cache.get_or_fetch("k", fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return cache, calls, await asyncio.gather(*waiters)
+
+    cache, calls, responses = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r.body == b"ok" for r in responses)
+    assert (cache.stats.misses, cache.stats.coalesced) == (1, 4)
+
+
+def test_failed_fetch_reaches_every_coalesced_waiter_and_is_not_cached():
+    async def run():
+        cache = ResponseCache()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise ConnectionResetError("upstream went away")
+
+        waiters = [asyncio.ensure_future(cache.get_or_fetch("k", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        retried = await cache.get_or_fetch("k", _fetch(_response(), []))
+        return cache, results, retried
+
+    cache, results, retried = asyncio.run(run())
+    assert all(isinstance(r, ConnectionResetError) for r in results)
+    assert retried.status == 200
+    assert cache.stats.misses == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_fetch():
+    async def run():
+        cache, calls = ResponseCache(), []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return _response()
+
+        first = asyncio.ensure_future(cache.get_or_fetch("k", fetch))
+        second = asyncio.ensure_future(cache.get_or_fetch("k", fetch))
+        await asyncio.sleep(0)
+        second.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        return await first, calls
+
+    response, calls = asyncio.run(run())
+    assert response.status == 200 and len(calls) == 1
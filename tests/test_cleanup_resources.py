@@ -0,0 +1,102 @@
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from cleanup_resources import DEFAULT_TAGS, ResourceCleaner
+
+REGION = "eu-west-1"
+ELB_TAGS = [{"Key": k, "Value": v} for k, v in DEFAULT_TAGS.items()]
+
+
+@pytest.fixture(autouse=True)
+def aws_credentials(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", REGION)
+
+
+def _create_stack():
+    ec2 = boto3.client("ec2", region_name=REGION)
+    elbv2 = boto3.client("elbv2", region_name=REGION)
+    apigw = boto3.client("apigatewayv2", region_name=REGION)
+
+    vpc_id = ec2.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+    subnets = [ec2.create_subnet(VpcId=vpc_id, CidrBlock=f"10.0.{i}.0/24",
+                                 AvailabilityZone=f"{REGION}{az}")["Subnet"]["SubnetId"]
+               for i, az in enumerate("ab", start=1)]
+
+    lb_arn = elbv2.create_load_balancer(Name="gateway-alb", Subnets=subnets, Scheme="internal",
+                                        Tags=ELB_TAGS)["LoadBalancers"][0]["LoadBalancerArn"]
+    tg_arn = elbv2.create_target_group(Name="gateway-tg", Protocol="HTTP", Port=80, VpcId=vpc_id,
+                                       Tags=ELB_TAGS)["TargetGroups"][0]["TargetGroupArn"]
+    listener_arn = elbv2.create_listener(
+        LoadBalancerArn=lb_arn, Protocol="HTTP", Port=80,
+        DefaultActions=[{"Type": "forward", "TargetGroupArn": tg_arn}],
+    )["Listeners"][0]["ListenerArn"]
+    elbv2.create_rule(
+        ListenerArn=listener_arn, Priority=100,
+        Conditions=[{"Field": "http-header",
+                     "HttpHeaderConfig": {"HttpHeaderName": "X-Stage", "Values": ["uat1"]}}],
+        Actions=[{"Type": "redirect",
+                  "RedirectConfig": {"Host": "uat1.example.com", "StatusCode": "HTTP_302"}}],
+    )
+
+    ec2.create_vpc_endpoint(
+        VpcId=vpc_id, ServiceName=f"com.amazonaws.{REGION}.execute-api", VpcEndpointType="Interface",
+        SubnetIds=subnets,
+        TagSpecifications=[{"ResourceType": "vpc-endpoint", "Tags": ELB_TAGS}],
+    )
+
+    for name in ("uat1", "uat2"):
+        api_id = apigw.create_api(Name=f"gateway-{name}", ProtocolType="HTTP",
+                                  Tags={**DEFAULT_TAGS, "Environment": name})["ApiId"]
+        integration_id = apigw.create_integration(ApiId=api_id, IntegrationType="HTTP_PROXY",
+                                                  IntegrationMethod="GET", IntegrationUri="https://httpbin.org/get",
+                                                  PayloadFormatVersion="1.0")["IntegrationId"]
+        apigw.create_route(ApiId=api_id, RouteKey="GET /hello", Target=f"integrations/{integration_id}")
+        apigw.create_stage(ApiId=api_id, StageName=name)
+    untagged_id = apigw.create_api(Name="someone-elses-api", ProtocolType="HTTP")["ApiId"]
+    return ec2, elbv2, apigw, untagged_id
+
+
+@mock_aws
+def test_run_deletes_only_tagged_resources():
+    ec2, elbv2, apigw, untagged_id = _create_stack()
+
+    cleaner = ResourceCleaner(REGION, DEFAULT_TAGS, workers=4)
+    assert cleaner.run() == 0
+
+    assert [api["ApiId"] for api in apigw.get_apis()["Items"]] == [untagged_id]
+    assert elbv2.describe_target_groups()["TargetGroups"] == []
+    for lb in elbv2.describe_load_balancers()["LoadBalancers"]:
+        assert elbv2.describe_listeners(LoadBalancerArn=lb["LoadBalancerArn"])["Listeners"] == []
+    endpoints = ec2.describe_vpc_endpoints()["VpcEndpoints"]
+    assert all(ep["State"].lower() in ("deleting", "deleted") for ep in endpoints)
+
+
+@mock_aws
+def test_unsuccessful_vpc_endpoint_delete_counts_as_failure(capsys):
+    cleaner = ResourceCleaner(REGION, DEFAULT_TAGS, workers=1)
+    cleaner.plan = lambda: [[("vpc endpoint vpce-missing", lambda: cleaner._delete_vpc_endpoint("vpce-0123"))]]
+    cleaner.ec2.delete_vpc_endpoints = lambda **_: {"Unsuccessful": [
+        {"ResourceId": "vpce-0123", "Error": {"Code": "OperationNotPermitted", "Message": "in use"}},
+    ]}
+    assert cleaner.run() == 1
+    assert "Deleted" not in capsys.readouterr().out
+
+
+@mock_aws
+def test_vanished_target_group_does_not_hide_the_rest_of_its_batch():
+    tagged, untagged, gone = "arn:tg/tagged", "arn:tg/untagged", "arn:tg/gone"
+
+    def describe_tags(ResourceArns):
+        if gone in ResourceArns:
+            raise ClientError({"Error": {"Code": "TargetGroupNotFound", "Message": gone}}, "DescribeTags")
+        return {"TagDescriptions": [{"ResourceArn": arn, "Tags": ELB_TAGS if arn == tagged else []}
+                                    for arn in ResourceArns]}
+
+    cleaner = ResourceCleaner(REGION, DEFAULT_TAGS, workers=1)
+    cleaner.elbv2.describe_tags = describe_tags
+    assert cleaner._elbv2_tagged([untagged, gone, tagged]) == {tagged}
+    assert cleaner._elbv2_tagged([gone]) == set()
@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+from local_gateway.hedging import Backoff, HedgedClient, RetryBudget
+from local_gateway.http import Response
+
+URL = "http://127.0.0.1:8081/hello"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedClient:
+    """Answers the n-th request with the n-th (delay, status, headers) entry."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.sent = 0
+        self.cancelled = 0
+
+    async def request(self, method, url, headers=None, body=b""):
+        delay, status, response_headers = self.script[self.sent]
+        self.sent += 1
+        index = self.sent
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return Response(status, response_headers, str(index).encode())
+
+    def close(self):
+        pass
+
+
+def _client(*script, budget_tokens=10.0, **options):
+    budget = RetryBudget(min_per_second=0, clock=Clock())
+    budget.tokens = budget_tokens
+    client = HedgedClient(ScriptedClient(*script), budget=budget, backoff_base=0.01, **options)
+    # Hedge after 20ms instead of waiting for the latency window to fill
+    client._target(URL)[0].delay = 0.02
+    return client
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    client = _client((1.0, 200, {}), (0.0, 200, {}))
+    response = asyncio.run(client.request("GET", URL))
+
+    assert response.body == b"2"
+    assert client.client.cancelled == 1
+    stats = client.stats
+    assert (stats.hedges, stats.hedge_wins, stats.cancelled) == (1, 1, 1)
+    assert client.budget.tokens == 10.1 - 1
+
+
+def test_fast_429_hedge_loses_to_a_slow_200_primary():
+    client = _client((0.1, 200, {}), (0.0, 429, {}))
+    response = asyncio.run(client.request("GET", URL))
+
+    assert (response.status, response.body) == (200, b"1")
+    assert client.client.cancelled == 0
+    assert (client.stats.hedge_wins, client.stats.throttled, client.stats.retries) == (0, 0, 0)
+
+
+def test_429_is_returned_only_when_every_attempt_was_throttled():
+    client = _client((0.05, 429, {}), (0.0, 429, {}), max_throttle_retries=0)
+    response = asyncio.run(client.request("GET", URL))
+
+    assert response.status == 429
+    assert client.client.sent == 2
+    assert (client.stats.hedges, client.stats.hedge_wins, client.stats.throttled) == (1, 0, 1)
+
+
+def test_no_hedge_without_budget():
+    client = _client((0.05, 200, {}), budget_tokens=0.0)
+    response = asyncio.run(client.request("GET", URL))
+
+    assert response.body == b"1"
+    assert client.client.sent == 1
+    assert (client.stats.hedges, client.stats.budget_exhausted) == (0, 1)
+
+
+def test_non_idempotent_requests_are_not_hedged():
+    client = _client((0.05, 200, {}))
+    asyncio.run(client.request("POST", URL))
+    assert client.client.sent == 1 and client.stats.hedges == 0
+
+
+def test_429_backs_off_and_retries_without_hedging():
+    client = _client((0.0, 429, {}), (0.05, 200, {}))
+    response = asyncio.run(client.request("GET", URL))
+
+    assert (response.status, response.body) == (200, b"2")
+    assert client.client.sent == 2          # the slow retry was not hedged while backing off
+    stats = client.stats
+    assert (stats.throttled, stats.retries, stats.hedges) == (1, 1, 0)
+    assert not client._target(URL)[1].throttled
+
+
+def test_throttle_retries_stop_at_the_limit_or_the_budget():
+    client = _client(*[(0.0, 429, {})] * 5, max_throttle_retries=2)
+    assert asyncio.run(client.request("GET", URL)).status == 429
+    assert (client.client.sent, client.stats.retries) == (3, 2)
+
+    client = _client(*[(0.0, 429, {})] * 5, budget_tokens=0.0)
+    assert asyncio.run(client.request("GET", URL)).status == 429
+    assert (client.client.sent, client.stats.retries) == (1, 0)
+
+
+def test_retry_budget_earns_per_request_and_per_second_up_to_the_cap():
+    clock = Clock()
+    budget = RetryBudget(ratio=0.5, min_per_second=1.0, cap=3.0, clock=clock)
+
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw() and not budget.withdraw()
+
+    clock.now += 1.0
+    assert budget.withdraw() and not budget.withdraw()
+
+    clock.now += 60
+    for _ in range(10):
+        budget.deposit()
+    assert sum(budget.withdraw() for _ in range(5)) == 3
+
+
+def test_backoff_escalates_once_per_overload_and_resets():
+    backoff = Backoff(base=0.1, cap=0.3, seed=1)
+    assert backoff.delay() == 0.0
+
+    sent = time.monotonic()
+    backoff.start(sent)
+    backoff.start(sent)                     # same overload: no second escalation
+    assert backoff.attempts == 1
+    assert all(0 <= backoff.delay() <= 0.1 for _ in range(100))
+
+    for _ in range(3):
+        backoff.start(time.monotonic())
+    assert backoff.attempts == 4
+    assert all(0 <= backoff.delay() <= 0.3 for _ in range(100))   # capped
+
+    backoff.reset()
+    assert not backoff.throttled and backoff.delay() == 0.0
+
+
+def test_backoff_honours_retry_after():
+    backoff = Backoff(base=0.01, cap=0.01)
+    backoff.start(time.monotonic(), retry_after=5)
+    assert 4.9 < backoff.delay() <= 5
@@ -0,0 +1,64 @@
+import json
+
+import nat_planner
+from nat_planner import Layout, LogRecord, TrafficProfile, load_layout, plan
+
+LAYOUT = Layout(["eu-west-1a", "eu-west-1b"], ["10.0.1.0/24", "10.0.2.0/24"])
+
+
+def _profile(records, window=60.0):
+    profile = TrafficProfile(LAYOUT, window)
+    for record in records:
+        profile.add(record)
+    return profile
+
+
+def test_peak_is_the_busiest_window_regardless_of_order():
+    # 6 MB in the first minute, 0.6 MB in the second
+    profile = _profile([
+        LogRecord(0.0, 6_000_000, 0.0, "10.0.1.5"),
+        LogRecord(60.0, 600_000, 0.0, "10.0.1.5"),
+    ])
+    bytes_per_s, requests_per_s, _ = profile.peak()
+    assert bytes_per_s == 100_000
+    assert requests_per_s == 1 / 60
+
+    reversed_profile = _profile([
+        LogRecord(0.0, 600_000, 0.0, "10.0.1.5"),
+        LogRecord(60.0, 6_000_000, 0.0, "10.0.1.5"),
+    ])
+    assert reversed_profile.peak()[0] == 100_000
+
+
+def test_peak_in_flight_follows_littles_law_and_az_filter():
+    profile = _profile([LogRecord(float(i), 1000, 0.5, "10.0.2.9") for i in range(60)]
+                       + [LogRecord(120.0, 50, 0.1, "10.0.1.1")])
+    assert profile.peak()[2] == 0.5           # 60 requests x 0.5 s / 60 s
+    assert profile.peak([0])[0] == 50 / 60    # AZ a only saw the small window
+
+
+def test_headroom_comes_from_the_busiest_window():
+    profile = _profile([
+        LogRecord(0.0, 6_000_000, 0.0, "10.0.1.5"),
+        LogRecord(60.0, 600_000, 0.0, "10.0.2.5"),
+    ])
+    single = plan(profile)["layouts"][0]
+    assert single["headroom"]["bandwidth"] == nat_planner.NAT_MAX_GBPS * 1e9 / 8 / 100_000
+    assert single["cross_az_bytes"] == 600_000
+
+
+def test_load_layout_uses_the_terraform_output(tmp_path):
+    path = tmp_path / "nat_layout.json"
+    path.write_text(json.dumps({
+        "nat_gateway_per_az": True,
+        "availability_zones": ["a", "b"],
+        "private_subnet_cidrs": ["10.0.1.0/24", "10.0.2.0/24"],
+        "nat_public_ips": ["1.1.1.1", "2.2.2.2", "3.3.3.3", "4.4.4.4"],
+    }))
+    layout = load_layout(str(path))
+    assert layout.nat_gateway_per_az
+    assert layout.nat_gateways == 2
+    assert layout.ips_per_nat() == 2
+
+    result = plan(_profile([LogRecord(0.0, 1000, 0.1, "10.0.1.5")]), per_az_deployed=layout.nat_gateway_per_az)
+    assert [row["current"] for row in result["layouts"]] == [False, True]
@@ -0,0 +1,82 @@
+import os
+import shutil
+import time
+from types import SimpleNamespace
+
+from local_gateway import reload
+from local_gateway.reload import RuleReloader
+from local_gateway.tfconfig import MAIN_TF, ROUTING_MODULE_TF
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _reloader(root):
+    alb = SimpleNamespace(port=8080, table=None)
+    return RuleReloader(alb, str(root), "127.0.0.1", {"uat1": 8081, "uat2": 8082}, interval=0.01,
+                        log=lambda message: None)
+
+
+def _copy_terraform(tmp_path):
+    for name in (MAIN_TF, ROUTING_MODULE_TF):
+        os.makedirs(os.path.dirname(tmp_path / name), exist_ok=True)
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+
+
+def test_unexpected_errors_count_as_failures(tmp_path, monkeypatch):
+    def broken(*args):
+        raise ValueError("unexpected")
+
+    monkeypatch.setattr(reload, "compile_table", broken)
+    reloader = _reloader(tmp_path)
+    reloader.reload()
+    assert reloader.stats.failures == 1
+    assert reloader.stats.last_error == "unexpected"
+    assert reloader.alb.table is None
+
+
+def test_watcher_survives_every_watched_file_disappearing(tmp_path):
+    _copy_terraform(tmp_path)
+    reloader = _reloader(tmp_path)
+    reloader.reload()
+    assert reloader.stats.reloads == 1
+
+    reloader.start(None)
+    try:
+        for name in (MAIN_TF, ROUTING_MODULE_TF):
+            os.remove(tmp_path / name)
+        deadline = time.monotonic() + 5
+        while not reloader.stats.failures and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert reloader.stats.failures >= 1
+        assert reloader._thread.is_alive()
+    finally:
+        reloader.stop()
+
+
+def test_header_route_edit_swaps_in_a_table_that_routes_the_new_value(tmp_path):
+    _copy_terraform(tmp_path)
+    reloader = _reloader(tmp_path)
+    reloader.reload()
+    assert reloader.alb.table.match("/hello", {"x-env": "staging"}).route_key == "uat1"   # default route
+
+    reloader.start(None)
+    try:
+        main_tf = tmp_path / MAIN_TF
+        text = main_tf.read_text()
+        assert 'header_values     = ["uat2"]' in text
+        edited = tmp_path / "main.tf.new"
+        edited.write_text(text.replace('header_values     = ["uat2"]', 'header_values     = ["uat2", "staging"]'))
+        # A later mtime even on coarse-grained filesystems, swapped in atomically so the watcher sees one change
+        stat = os.stat(main_tf)
+        os.utime(edited, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        os.replace(edited, main_tf)
+        deadline = time.monotonic() + 5
+        while reloader.stats.version < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        reloader.stop()
+
+    assert (reloader.stats.version, reloader.stats.reloads, reloader.stats.failures) == (2, 2, 0)
+    rule = reloader.alb.table.match("/hello", {"x-env": "staging"})
+    assert (rule.kind, rule.route_key) == ("header", "uat2")
+    assert reloader.alb.table.match("/hello", {"x-env": "uat2"}).route_key == "uat2"
@@ -0,0 +1,27 @@
+from local_gateway.manifest import local_manifest
+from local_gateway.rules import RuleTable
+from smoke_test import build_cases
+
+
+def _manifest(stages, traffic_splits=None):
+    routes = {name: {"header_name": "x-env", "header_values": [name], "priority": 100 * (i + 1)}
+              for i, name in enumerate(stages)}
+    ports = {name: 8081 + i for i, name in enumerate(stages)}
+    return local_manifest("127.0.0.1", 8080, ports, routes, stages[0], traffic_splits=traffic_splits)
+
+
+def test_every_rule_is_exercised():
+    splits = {
+        "uat1": {"client_id_header": "x-client-id", "weights": {"uat1": 8, "uat2": 8}},
+        "uat3": {"client_id_header": "x-client-id", "weights": {"uat3": 12, "uat2": 4}},
+    }
+    manifest = _manifest(["uat1", "uat2", "uat3"], splits)
+    table = RuleTable.from_manifest(manifest)
+    hit = {table.match(c.url[len("http://127.0.0.1:8080"):], c.headers)
+           for c in build_cases(manifest) if c.name.startswith("ALB")}
+    assert set(table.rules) | {table.default} <= hit
+
+
+def test_case_count_is_linear_in_stages():
+    counts = [len(build_cases(_manifest([f"uat{i}" for i in range(1, n + 1)]))) for n in (5, 10, 20)]
+    assert counts[2] - counts[1] == 2 * (counts[1] - counts[0])
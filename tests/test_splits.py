@@ -0,0 +1,125 @@
+import math
+import re
+
+import pytest
+
+from local_gateway.splits import SUFFIXES, SuffixRing, bucket_targets, random_slot_counts, split_rules
+from local_gateway.tfconfig import ConfigError, parse_header_routes, parse_traffic_splits
+
+HEADER_ROUTES = {
+    "uat1": {"header_name": "x-env", "header_values": ["uat1"], "priority": 100, "target_host": "uat1.example.com"},
+    "uat2": {"header_name": "x-env", "header_values": ["uat2", "stage2"], "priority": 200,
+             "target_host": "uat2.example.com"},
+    "uat3": {"header_name": "x-env", "header_values": ["uat3"], "priority": 300, "target_host": "uat3.example.com"},
+}
+
+
+def terraform_split_rules(header_routes, traffic_splits, default_route_key):
+    """Line-by-line transcription of the split_bounds/split_rules locals in modules/alb_header_routing."""
+    rules = {}
+    for route, split in traffic_splits.items():
+        keys = sorted(split["weights"])
+        total = sum(split["weights"].values())
+        bounds = [math.floor(16 * sum(split["weights"][k] for k in keys[:j + 1]) / total) for j in range(len(keys))]
+        size = 5 if route == default_route_key else max(1, 5 - len(header_routes[route]["header_values"]))
+        for j, target in enumerate(keys):
+            if target == route:
+                continue
+            buckets = [i for i in range(16) if len([b for b in bounds if b <= i]) == j]
+            for chunk in (buckets[n:n + size] for n in range(0, len(buckets), size)):
+                base = 50000 if route == default_route_key else header_routes[route]["priority"]
+                rules[f"{route}/{target}/{SUFFIXES[chunk[0]]}"] = {
+                    "split_of": route,
+                    "route_key": target,
+                    "priority": base - 16 + chunk[0],
+                    "suffixes": [f"*{SUFFIXES[i]}" for i in chunk],
+                }
+    return rules
+
+
+@pytest.mark.parametrize("weights, expected", [
+    ({"uat2": 12, "uat1": 4}, ["uat1"] * 4 + ["uat2"] * 12),
+    ({"uat1": 1, "uat2": 1, "uat3": 1}, ["uat1"] * 5 + ["uat2"] * 5 + ["uat3"] * 6),
+    ({"uat1": 0, "uat3": 10}, ["uat3"] * 16),
+    ({"uat1": 0.3, "uat2": 0.7}, ["uat1"] * 4 + ["uat2"] * 12),
+])
+def test_bucket_targets(weights, expected):
+    assert bucket_targets(weights) == expected
+
+
+@pytest.mark.parametrize("traffic_splits", [
+    {"uat2": {"client_id_header": "x-client-id", "weights": {"uat2": 12, "uat1": 4}}},
+    {"uat1": {"client_id_header": "x-client-id", "weights": {"uat1": 1, "uat2": 1, "uat3": 1}}},
+    {"uat3": {"client_id_header": "x-client-id", "weights": {"uat3": 3, "uat1": 7, "uat2": 5}},
+     "uat2": {"client_id_header": "x-user", "weights": {"uat2": 1, "uat3": 15}}},
+])
+def test_split_rules_match_the_terraform_allocation(traffic_splits):
+    expected = terraform_split_rules(HEADER_ROUTES, traffic_splits, "uat1")
+    rules = split_rules(HEADER_ROUTES, traffic_splits, "uat1")
+
+    assert len(rules) == len(expected)
+    for rule in rules:
+        tf = expected[f"{rule['split_of']}/{rule['route_key']}/{rule['client_id_suffixes'][0][1]}"]
+        assert rule["priority"] == tf["priority"]
+        assert rule["client_id_suffixes"] == tf["suffixes"]
+        assert len(rule["header_values"]) + len(rule["client_id_suffixes"]) <= 5
+
+
+def test_split_rule_chunks_leave_room_for_the_route_header_values():
+    splits = {"uat2": {"client_id_header": "x-client-id", "weights": {"uat2": 12, "uat1": 4}}}
+    rules = split_rules(HEADER_ROUTES, splits, "uat1")
+    assert [(r["priority"], r["client_id_suffixes"]) for r in rules] == [(184, ["*0", "*1", "*2"]), (187, ["*3"])]
+
+
+def test_random_ids_follow_the_weights():
+    ring = SuffixRing({"uat1": 4, "uat2": 12})
+    counts, unslotted = random_slot_counts(ring, 160_000)
+    assert unslotted == 0
+    assert all(abs(count - 10_000) < 600 for count in counts)
+
+    numeric, _ = random_slot_counts(ring, 16_000, id_format="numeric")
+    assert numeric[10:] == [0] * 6
+
+
+def _main_tf(priorities, values=('"uat2"',), splits='uat2 = { client_id_header = "x-client-id", weights = { uat2 = 8, uat1 = 8 } }'):
+    return f'''
+module "alb_routing" {{
+  default_route_key = "uat1"
+  header_routes = {{
+    uat1 = {{ header_name = "x-env", header_values = ["uat1"], priority = {priorities[0]}, target_host = "a" }}
+    uat2 = {{ header_name = "x-env", header_values = [{", ".join(values)}], priority = {priorities[1]}, target_host = "b" }}
+    uat3 = {{ header_name = "x-env", header_values = ["uat3"], priority = {priorities[2]}, target_host = "c" }}
+  }}
+  traffic_splits = {{
+    {splits}
+  }}
+}}
+'''
+
+
+@pytest.mark.parametrize("text, message", [
+    (_main_tf((100, 16, 300)), "above 16"),
+    (_main_tf((100, 200, 210)), "at least 16 away from uat3"),
+    (_main_tf((100, 200, 300), values=['"a"', '"b"', '"c"', '"d"', '"e"']), "at most 4"),
+    (_main_tf((100, 200, 300), splits="uat2 = { client_id_header = \"x\", weights = { uat2 = 0 } }"), "positive"),
+])
+def test_split_config_checks_match_the_module(text, message):
+    header_routes, default = parse_header_routes(text)
+    with pytest.raises(ConfigError, match=re.escape(message)):
+        parse_traffic_splits(text, header_routes, default)
+
+
+def test_default_route_priority_is_not_checked():
+    # The default route's split rules sit below priority 50000, not below its own priority
+    text = _main_tf((10, 20, 300), splits='uat1 = { client_id_header = "x", weights = { uat1 = 1, uat2 = 1 } }')
+    header_routes, default = parse_header_routes(text)
+    assert parse_traffic_splits(text, header_routes, default)["uat1"]["weights"] == {"uat1": 1.0, "uat2": 1.0}
+
+
+def test_splits_set_through_a_local_are_read_from_the_locals_block():
+    # main.tf keeps the splits in a local shared with the response cache
+    moved = "traffic_splits = local.traffic_splits\n}\n\nlocals {\n  traffic_splits = {"
+    text = _main_tf((100, 200, 300)).replace("traffic_splits = {", moved, 1)
+    header_routes, default = parse_header_routes(text)
+    assert parse_traffic_splits(text, header_routes, default) == {
+        "uat2": {"client_id_header": "x-client-id", "weights": {"uat2": 8.0, "uat1": 8.0}}}
@@ -0,0 +1,68 @@
+import asyncio
+import multiprocessing
+
+from local_gateway.alb import Alb
+from local_gateway.http import Request, Response
+from local_gateway.manifest import local_manifest
+from local_gateway.rules import RuleTable
+from local_gateway.tracing import TRACE_HEADER, Tracer, new_span_id, new_trace_id, parse_trace_header
+
+TABLE = RuleTable.from_manifest(local_manifest("127.0.0.1", 8080, {"uat1": 8081, "uat2": 8082}))
+
+
+class RecordingClient:
+    def __init__(self):
+        self.headers = []
+
+    async def request(self, method, url, headers=None, body=b"", trace=None):
+        self.headers.append(headers)
+        return Response(200, {}, b"ok")
+
+
+def _handle(alb, headers=None):
+    return asyncio.run(alb.handle(Request("GET", "/hello", "/hello", "", headers or {})))
+
+
+def test_unsampled_hop_passes_the_decision_on():
+    client = RecordingClient()
+    alb = Alb(TABLE, 8080, mode="forward", client=client, tracer=Tracer(sample_rate=0.0))
+    _handle(alb)
+
+    value = client.headers[0][TRACE_HEADER]
+    root, _, sampled = parse_trace_header(value)
+    assert root and not sampled
+    assert Tracer(sample_rate=1.0).begin("apigw-uat1", {TRACE_HEADER: value}) is None
+    assert not alb.tracer.spans
+
+
+def test_unsampled_redirect_carries_the_decision_and_keeps_incoming_headers():
+    alb = Alb(TABLE, 8080, tracer=Tracer(sample_rate=0.0))
+    assert "Sampled=0" in _handle(alb).headers[TRACE_HEADER]
+
+    incoming = "Root=1-00000000-000000000000000000000000;Sampled=0"
+    sampling = Alb(TABLE, 8080, tracer=Tracer(sample_rate=1.0))
+    assert _handle(sampling, {TRACE_HEADER: incoming}).headers[TRACE_HEADER] == incoming
+    assert not sampling.tracer.spans
+
+
+def test_tracing_off_adds_no_header():
+    client = RecordingClient()
+    _handle(Alb(TABLE, 8080, mode="forward", client=client))
+    assert TRACE_HEADER not in client.headers[0]
+
+
+def test_forked_processes_draw_different_ids():
+    context = multiprocessing.get_context("fork")
+    receivers = []
+    for _ in range(3):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=lambda conn: conn.send((new_trace_id(), new_span_id())), args=(sender,))
+        process.start()
+        sender.close()
+        receivers.append((receiver, process))
+    ids = [receiver.recv() for receiver, _ in receivers] + [(new_trace_id(), new_span_id())]
+    for _, process in receivers:
+        process.join()
+
+    assert len({trace_id for trace_id, _ in ids}) == len(ids)
+    assert len({span_id for _, span_id in ids}) == len(ids)
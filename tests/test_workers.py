@@ -0,0 +1,104 @@
+import multiprocessing
+import socket
+import time
+
+import pytest
+
+from local_gateway.__main__ import build_parser
+from local_gateway.workers import SharedThrottle, SharedTokenBucket, WorkerPool, merge_snapshots
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_shared_token_bucket_refills_at_the_rate_up_to_the_burst():
+    clock = Clock()
+    state = multiprocessing.RawArray("d", [2.0, clock.now])
+    bucket = SharedTokenBucket(rate=10, burst=2, state=state, offset=0, lock=multiprocessing.Lock(), clock=clock)
+
+    assert [bucket.allow() for _ in range(3)] == [True, True, False]
+    clock.now += 0.15
+    assert [bucket.allow(), bucket.allow()] == [True, False]
+    clock.now += 60
+    assert [bucket.allow() for _ in range(3)] == [True, True, False]
+
+
+def test_shared_throttle_buckets_share_state_across_processes():
+    context = multiprocessing.get_context("fork")
+    throttle = SharedThrottle({"uat1": (0.001, 10), "uat2": (0.001, 10)}, context)
+
+    def drain(name):
+        bucket = throttle.buckets()[name]
+        for _ in range(6):
+            bucket.allow()
+
+    processes = [context.Process(target=drain, args=("uat1",)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    buckets = throttle.buckets()
+    assert not buckets["uat1"].allow()        # 12 requests across processes used all 10 tokens
+    assert sum(buckets["uat2"].allow() for _ in range(11)) == 10
+
+
+def _snapshot(matched, evals, eval_ns, reload_version, stage, cache=None):
+    return {
+        "alb": {"matched": matched, "rule_evals": evals, "rule_eval_ns": eval_ns,
+                "reload": {"version": reload_version} if reload_version is not None else None},
+        "stages": stage,
+        "cache": cache,
+        "backend": {"requests": evals},
+    }
+
+
+def test_merge_snapshots_sums_counters_and_recomputes_ratios():
+    cache = {"hits": 3, "misses": 1, "coalesced": 0, "upstream_fetches": 1,
+             "upstream_latency_total_ms": 10.0, "upstream_latency_max_ms": 10.0}
+    merged = merge_snapshots([
+        _snapshot({"header:uat2": 3}, 4, 400, 2, {"uat1": {"requests": 1}}, cache),
+        _snapshot({"header:uat2": 1, "default:uat1": 2}, 6, 1600, 1,
+                  {"uat1": {"requests": 2}, "uat2": {"requests": 5}},
+                  {**cache, "hits": 0, "misses": 4, "upstream_fetches": 4, "upstream_latency_total_ms": 30.0,
+                   "upstream_latency_max_ms": 25.0}),
+    ])
+
+    assert merged["workers"] == 2
+    assert merged["alb"]["matched"] == {"header:uat2": 4, "default:uat1": 2}
+    assert merged["alb"]["rule_eval_avg_ns"] == 200
+    assert merged["alb"]["reload"] == {"version": 1}
+    assert merged["stages"] == {"uat1": {"requests": 3}, "uat2": {"requests": 5}}
+    assert merged["backend"] == {"requests": 10}
+    assert merged["cache"]["hit_rate"] == 3 / 8
+    assert merged["cache"]["upstream_latency_avg_ms"] == 8.0
+    assert merged["cache"]["upstream_latency_max_ms"] == 25.0
+
+
+def test_merge_snapshots_without_cache_or_reloader():
+    merged = merge_snapshots([_snapshot({}, 0, 0, None, {})])
+    assert merged["cache"] is None and merged["alb"]["reload"] is None
+    assert merged["alb"]["rule_eval_avg_ns"] == 0.0
+
+
+def test_worker_start_failure_is_reported_and_started_workers_stop():
+    # A socket without SO_REUSEPORT keeps every worker from binding the ALB port
+    blocker = socket.socket()
+    blocker.bind(("127.0.0.1", 0))
+    blocker.listen()
+    port = blocker.getsockname()[1]
+    options = build_parser().parse_args(["--alb-port", str(port), "--stage-base-port", "0", "--backend-port", "0",
+                                         "--metrics-port", "0", "--workers", "2"])
+    start = time.monotonic()
+    try:
+        with pytest.raises(RuntimeError, match="failed to start"):
+            WorkerPool(options, 2, ["uat1", "uat2"])
+    finally:
+        blocker.close()
+    assert time.monotonic() - start < 10
+    assert not multiprocessing.active_children()
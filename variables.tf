@@ -34,6 +34,12 @@ variable "public_subnet_cidrs" {
   default     = ["10.0.101.0/24", "10.0.102.0/24"]
 }
 
+variable "nat_gateway_per_az" {
+  description = "Create one NAT gateway per availability zone instead of a single shared one"
+  type        = bool
+  default     = false
+}
+
 variable "tags" {
   description = "Tags to apply to all resources"
   type        = map(string)
@@ -42,4 +48,27 @@ variable "tags" {
     Project     = "API-Gateway-LB"
     Terraform   = "true"
   }
-} 
\ No newline at end of file
+}
+
+variable "enable_response_cache" {
+  description = "Put a CloudFront response cache in front of each stage's API Gateway endpoint; the ALB redirects to it"
+  type        = bool
+  default     = false
+}
+
+variable "response_cache_ttl" {
+  description = "Default TTL in seconds for cached stage responses (the cache's max TTL is 300, or this when higher)"
+  type        = number
+  default     = 30
+
+  validation {
+    condition     = var.response_cache_ttl >= 0
+    error_message = "response_cache_ttl must not be negative."
+  }
+}
+
+variable "response_cache_query_strings" {
+  description = "Query string parameters included in the response cache key"
+  type        = list(string)
+  default     = []
+}